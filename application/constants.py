@@ -11,10 +11,85 @@ api_headers = {
                 "Api-Key": api_key,
                 "Api-Username": "shubhamg"
            }
-DISCOURSE_BASE_URL = "https://discourse.onlinedegree.iitm.ac.in"
+DISCOURSE_BASE_URL = os.environ.get("DISCOURSE_BASE_URL", "https://discourse.onlinedegree.iitm.ac.in")  # override to point at benchmarks/discourse_standin.py
 GROUP_NAME = "discourse_analytics"
 API_USERNAME = 'shubhamG'
 
+# HTTP client settings (shared keep-alive session used for every outgoing call, see core/http_client.py)
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("HTTP_CONNECT_TIMEOUT", 5))  # seconds to establish TCP+TLS
+HTTP_READ_TIMEOUT = float(os.environ.get("HTTP_READ_TIMEOUT", 90))  # seconds to wait for a response; query 103 pages can be slow
+HTTP_POOL_CONNECTIONS = int(os.environ.get("HTTP_POOL_CONNECTIONS", 4))  # number of hosts to keep pools for
+HTTP_POOL_MAXSIZE = int(os.environ.get("HTTP_POOL_MAXSIZE", 8))  # keep-alive connections kept per host
+
+# Discourse rate limiting (one token bucket shared by the whole process, see core/rate_limiter.py)
+DISCOURSE_RATE_LIMIT_RPS = float(os.environ.get("DISCOURSE_RATE_LIMIT_RPS", 1.0))  # sustained requests per second
+DISCOURSE_RATE_LIMIT_BURST = int(os.environ.get("DISCOURSE_RATE_LIMIT_BURST", 4))  # requests allowed back-to-back
+DISCOURSE_MAX_PAGES_IN_FLIGHT = int(os.environ.get("DISCOURSE_MAX_PAGES_IN_FLIGHT", 4))  # concurrent pages per paginated query
+DISCOURSE_MAX_429_RETRIES = 5  # retries per page before giving up on a rate-limited request
+DISCOURSE_DEFAULT_RETRY_AFTER = 5  # seconds to back off on a 429 without a Retry-After header
+USER_SUMMARY_MAX_WAIT_SECONDS = float(os.environ.get("USER_SUMMARY_MAX_WAIT_SECONDS", 3))  # longest a /user_details request waits for a rate-limiter token (503 beyond)
+DATA_LOAD_WORKERS = int(os.environ.get("DATA_LOAD_WORKERS", 4))  # (term, course) units crawled concurrently by the full load
+REFRESH_WORKERS = int(os.environ.get("REFRESH_WORKERS", 4))  # course units fetched and merged concurrently by the daily refresh
+DISCOURSE_ASYNC_MAX_CONNECTIONS = int(os.environ.get("DISCOURSE_ASYNC_MAX_CONNECTIONS", 32))  # sockets per aiohttp session (core/async_client.py)
+
+# On-disk cache of query pages (see core/query_cache.py)
+QUERY_CACHE_ENABLED = os.environ.get("QUERY_CACHE_ENABLED", "1") == "1"
+QUERY_CACHE_DIR = os.environ.get("QUERY_CACHE_DIR", os.path.join(".cache", "discourse_queries"))
+QUERY_CACHE_MAX_BYTES = int(os.environ.get("QUERY_CACHE_MAX_BYTES", 2 * 1024**3))  # LRU eviction above this size
+QUERY_CACHE_TTL_SECONDS = {  # Pages of closed trimesters (end_date before today) never expire
+    102: 6 * 3600,   # overall engagement
+    103: 6 * 3600,   # course-specific user actions
+    107: 24 * 3600,  # category list
+    108: 24 * 3600,  # id -> username mapping
+}
+
+# Checkpoints of the full data load (see core/reset_checkpoint.py)
+RESET_CHECKPOINT_ENABLED = os.environ.get("RESET_CHECKPOINT_ENABLED", "1") == "1"
+RESET_CHECKPOINT_DIR = os.environ.get("RESET_CHECKPOINT_DIR", os.path.join(".cache", "reset_checkpoint"))
+
+# Parquet snapshots of the loaded data for warm restarts (see core/snapshot.py)
+SNAPSHOT_ENABLED = os.environ.get("SNAPSHOT_ENABLED", "1") == "1"
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", os.path.join(".cache", "snapshots"))
+SNAPSHOT_KEEP = int(os.environ.get("SNAPSHOT_KEEP", 2))  # versions kept on disk
+
+# Multi-process serving (see core/arrow_store.py)
+# "standalone": this process fetches and serves (python app.py, single process)
+# "loader": this process fetches and publishes every change as a memory-mapped Arrow generation
+# "reader": web workers (e.g. gunicorn) that never fetch and serve the latest published generation
+DATA_ROLE = os.environ.get("DATA_ROLE", "standalone")
+ARROW_STORE_DIR = os.environ.get("ARROW_STORE_DIR", os.path.join(".cache", "arrow_store"))
+ARROW_STORE_POLL_SECONDS = float(os.environ.get("ARROW_STORE_POLL_SECONDS", 5))  # how often readers check for a new generation
+ARROW_STORE_RETAIN_SECONDS = int(os.environ.get("ARROW_STORE_RETAIN_SECONDS", 600))  # old generations kept for readers still on them
+# The loader as its own process (see core/loader_worker.py)
+# "spawn": a reader started with `python app.py` starts and supervises the loader worker; "external": it is run separately (python -m core.loader_worker);
+# "elect": the web workers of wsgi.py elect one leader that starts it (core/leader_election.py; wsgi.py's default)
+LOADER_PROCESS = os.environ.get("LOADER_PROCESS", "external")
+LOADER_POLL_SECONDS = float(os.environ.get("LOADER_POLL_SECONDS", 5))  # how often the worker checks for requests from the web processes
+LOADER_RESTART_DELAY_SECONDS = int(os.environ.get("LOADER_RESTART_DELAY_SECONDS", 30))  # before a spawned worker that exited is started again
+LEADER_POLL_SECONDS = float(os.environ.get("LEADER_POLL_SECONDS", 5))  # how often non-leader web workers try to take over leadership
+
+# Embedded SQL engine over the loaded data (see core/sql_engine.py)
+# "auto": DuckDB when installed, else SQLite (stdlib; holds a copy of the data); "duckdb"; "sqlite"; "off": pandas paths only
+SQL_ENGINE = os.environ.get("SQL_ENGINE", "auto")
+
+# Admin endpoints (routes/admin.py): Google accounts allowed to trigger them, and an optional token for scripts
+ADMIN_EMAILS = [email.strip().lower() for email in os.environ.get("ADMIN_EMAILS", "").split(",") if email.strip()]
+ADMIN_API_TOKEN = os.environ.get("ADMIN_API_TOKEN")  # sent as "Authorization: Bearer <token>"
+
+# Batched query 103: one paginated crawl for several categories instead of one crawl per category.
+# Requires query 103 to accept an int_list parameter QUERY_103_BATCH_PARAM and to return the (requested) category_id per row.
+COURSE_QUERY_BATCH_SIZE = int(os.environ.get("COURSE_QUERY_BATCH_SIZE", 0))  # categories per crawl; 0 or 1 keeps one crawl per category
+QUERY_103_BATCH_PARAM = "category_ids"
+
+# Incremental query 108: the daily refresh asks only for users with user_id above the highest one we hold.
+# Requires query 108 to accept an int parameter QUERY_108_MIN_USER_ID_PARAM (`WHERE u.id > :min_user_id`).
+QUERY_108_MIN_USER_ID_PARAM = "min_user_id"
+
+# Discourse webhooks (routes/webhooks.py, core/webhook_ingest.py)
+DISCOURSE_WEBHOOK_SECRET = os.environ.get("DISCOURSE_WEBHOOK_SECRET")  # the webhook's "Secret" in Discourse; the endpoint rejects everything while unset
+WEBHOOK_FLUSH_INTERVAL_SECONDS = int(os.environ.get("WEBHOOK_FLUSH_INTERVAL_SECONDS", 60))  # micro-batch interval for merging buffered events
+WEBHOOK_FLUSH_MAX_EVENTS = int(os.environ.get("WEBHOOK_FLUSH_MAX_EVENTS", 500))  # flush early once this many rows are buffered
+WEBHOOK_SEEN_EVENT_IDS = 10000  # recent X-Discourse-Event-Id values kept to drop redelivered events
 
 # COURSES LIST
 
@@ -67,6 +142,24 @@ action_to_description = {
 "17": "linked"
 }
 
+# Discourse user_actions codes by the action_name query 103 returns (stored user actions keep only the code)
+action_name_to_type = {
+"like": 1,
+"was_liked": 2,
+"bookmark": 3,
+"new_topic": 4,
+"reply": 5,
+"response": 6,
+"mention": 7,
+"quote": 9,
+"edit": 11,
+"new_private_message": 12,
+"got_private_message": 13,
+"solved": 15,
+"assigned": 16,
+"linked": 17
+}
+
 
 weights_dict_for_course_specific_engagement = { 'likes_given': 0.3, # 0.3
                 "likes_received": 0.8, # changed from 0.7
@@ -0,0 +1,405 @@
+"""
+Local stand-in for the Discourse endpoints the app uses.
+
+Serves
+    POST /g/<group>/reports/<query_id>/run   (queries 102, 103, 107, 108; paginated like Data Explorer;
+                                              103 also accepts a comma separated `category_ids` batch,
+                                              108 an optional `min_user_id`)
+    GET  /u/<username>/summary.json
+    GET  /_stats                             (request counters, for benchmarks)
+from synthetic data generated at configurable volumes, or from recorded results.
+429s (with Retry-After), a server-side quota and latency can be injected to
+exercise the client's rate limiting and retry paths.
+
+Run standalone:
+    python -m benchmarks.discourse_standin --port 8081 --categories 60 --actions-per-category 3000
+and point the app at it with DISCOURSE_BASE_URL=http://127.0.0.1:8081.
+
+Recorded data: --recorded DIR reads DIR/<query_id>.json files shaped like a single
+Data Explorer response ({"columns": [...], "rows": [...]}); rows are filtered by
+category_id / created_at when those columns exist and then paged like synthetic data.
+DIR/summary.json, if present, maps usernames to summary.json bodies.
+"""
+import argparse
+import bisect
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import chain
+from urllib.parse import parse_qs
+
+from application.constants import (
+    irrelevant_categories,
+    foundation_courses,
+    diploma_programming_courses,
+    diploma_data_science_courses,
+    core_degree_courses,
+    degree_level_courses,
+    L4_degree_courses,
+    L5_degree_courses,
+)
+
+# Discourse UserAction codes -> names, as returned in the action_name column of query 103
+ACTION_NAMES = {1: "like", 2: "was_liked", 4: "new_topic", 5: "reply", 6: "response", 7: "mention", 9: "quote", 11: "edit", 15: "solved", 17: "linked"}
+# Relative frequency of follow-up actions on a topic
+FOLLOW_UP_WEIGHTS = {1: 30, 2: 30, 5: 20, 6: 8, 7: 2, 9: 2, 11: 2, 15: 1, 17: 1}
+
+COLUMNS_103 = ["acting_username", "action_type", "action_name", "target_topic_id", "target_post_id", "topic_title", "created_at", "category_id"]
+COLUMNS_102 = ["user_id", "likes_received", "likes_given", "days_visited", "solutions", "topics_created", "posts_created", "topics_viewed", "posts_read"]
+
+
+def parse_query_date(value):
+    """Query dates are 'dd-mm-yyyy' (get_trimester_dates emits '30/04-yyyy' for t1)."""
+    return datetime.strptime(str(value).replace("/", "-"), "%d-%m-%Y").date()
+
+
+class SyntheticForum:
+    """
+    Deterministic synthetic forum.
+
+    Args:
+        categories (int): Number of course categories served by query 107.
+        users (int): Number of users served by query 108.
+        actions_per_category (int): User actions per category over the whole history.
+        days_of_history (int): Actions are spread over this many days up to today.
+        seed (int): Random seed; the same arguments always produce the same forum.
+    """
+
+    def __init__(self, categories=60, users=5000, actions_per_category=2000, days_of_history=480, seed=7):
+        rng = random.Random(seed)
+        known_courses = list(chain(foundation_courses, diploma_programming_courses, diploma_data_science_courses,
+                                   core_degree_courses, degree_level_courses, L4_degree_courses, L5_degree_courses))
+        category_ids = (cid for cid in range(1, 10_000) if cid not in irrelevant_categories)
+        self.categories = []  # [(category_id, name)]
+        for index in range(categories):
+            name = known_courses[index] if index < len(known_courses) else f"Uncategorized Course {index}"
+            self.categories.append((next(category_ids), name))
+
+        self.users = [(-1, "system")] + [(user_id, f"user_{user_id}") for user_id in range(1, users + 1)]
+        usernames = [username for _user_id, username in self.users[1:]]
+        self.user_id_of = {username: user_id for user_id, username in self.users}
+
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        history_start = now - timedelta(days=days_of_history)
+        follow_up_types = list(FOLLOW_UP_WEIGHTS)
+        follow_up_weights = list(FOLLOW_UP_WEIGHTS.values())
+
+        self.actions = {}  # category_id -> rows sorted by created_at (same layout as COLUMNS_103)
+        self.action_dates = {}  # category_id -> ordinal date of each row, for bisecting date windows
+        topic_id = 0
+        post_id = 0
+        for category_id, name in self.categories:
+            rows = []
+            # Busier courses get more actions so "largest course first" scheduling has something to work with
+            volume = max(1, int(actions_per_category * rng.uniform(0.3, 1.7)))
+            while len(rows) < volume:
+                topic_id += 1
+                post_id += 1
+                title = f"Topic {topic_id} in {name}"
+                created = history_start + timedelta(seconds=rng.uniform(0, days_of_history * 86400))
+                rows.append([rng.choice(usernames), 4, "new_topic", topic_id, post_id, title, created, category_id])
+                for _ in range(rng.randint(0, 25)):
+                    action_type = rng.choices(follow_up_types, weights=follow_up_weights)[0]
+                    post_id += 1
+                    at = min(created + timedelta(seconds=rng.expovariate(1 / 86400)), now)
+                    rows.append([rng.choice(usernames), action_type, ACTION_NAMES[action_type], topic_id, post_id, title, at, category_id])
+            rows.sort(key=lambda row: row[6])
+            self.action_dates[category_id] = [row[6].date().toordinal() for row in rows]
+            for row in rows:
+                row[6] = row[6].isoformat().replace("+00:00", "Z")
+            self.actions[category_id] = rows
+
+        self._overall_cache = OrderedDict()
+        self._overall_lock = threading.Lock()
+
+    def user_actions(self, category_ids, start_date, end_date):
+        """Rows of query 103 for the given categories and inclusive date window."""
+        start, end = start_date.toordinal(), end_date.toordinal()
+        selected = []
+        for category_id in category_ids:
+            dates = self.action_dates.get(category_id, [])
+            rows = self.actions.get(category_id, [])
+            selected.extend(rows[bisect.bisect_left(dates, start):bisect.bisect_right(dates, end)])
+        if len(category_ids) > 1:
+            selected.sort(key=lambda row: row[6])
+        return selected
+
+    def overall_engagement(self, start_date, end_date):
+        """Rows of query 102: per-user totals over every category in the window (memoised per window)."""
+        key = (start_date, end_date)
+        with self._overall_lock:
+            if key in self._overall_cache:
+                self._overall_cache.move_to_end(key)
+                return self._overall_cache[key]
+
+        totals = defaultdict(Counter)
+        visit_days = defaultdict(set)
+        for row in self.user_actions([cid for cid, _name in self.categories], start_date, end_date):
+            username, action_type = row[0], row[1]
+            user_totals = totals[username]
+            visit_days[username].add(row[6][:10])
+            match action_type:
+                case 1: user_totals["likes_given"] += 1
+                case 2: user_totals["likes_received"] += 1
+                case 4:
+                    user_totals["topics_created"] += 1
+                    user_totals["posts_created"] += 1
+                case 5 | 6: user_totals["posts_created"] += 1
+                case 15: user_totals["solutions"] += 1
+            user_totals["posts_read"] += 3
+        rows = []
+        for username, user_totals in sorted(totals.items(), key=lambda item: self.user_id_of[item[0]]):
+            days = len(visit_days[username])
+            rows.append([self.user_id_of[username], user_totals["likes_received"], user_totals["likes_given"], days,
+                         user_totals["solutions"], user_totals["topics_created"], user_totals["posts_created"],
+                         days * 4, user_totals["posts_read"]])
+        with self._overall_lock:
+            self._overall_cache[key] = rows
+            if len(self._overall_cache) > 32:
+                self._overall_cache.popitem(last=False)
+        return rows
+
+    def run_query(self, query_id, params):
+        """Return (columns, rows) for the whole (unpaged) result of a query."""
+        today = date.today()
+        start_date = parse_query_date(params["start_date"]) if "start_date" in params else date.min
+        end_date = parse_query_date(params["end_date"]) if "end_date" in params else today
+        match query_id:
+            case 107:
+                return ["category_id", "name"], [list(category) for category in self.categories]
+            case 108:
+                min_user_id = int(params.get("min_user_id", -2**31))  # Incremental sync asks only for newer users
+                return ["user_id", "username"], [list(user) for user in self.users if user[0] > min_user_id]
+            case 103:
+                if "category_ids" in params:  # Batched mode: int_list parameter, comma separated
+                    raw_ids = params["category_ids"]
+                    category_ids = [int(cid) for cid in (raw_ids.split(",") if isinstance(raw_ids, str) else raw_ids) if str(cid).strip()]
+                else:
+                    category_ids = [int(params["category_id"])]
+                return COLUMNS_103, self.user_actions(category_ids, start_date, end_date)
+            case 102:
+                return COLUMNS_102, self.overall_engagement(start_date, end_date)
+        raise KeyError(query_id)
+
+    def user_summary(self, username):
+        if username not in self.user_id_of:
+            return None
+        rng = random.Random(username)
+        return {"user_summary": {
+            "likes_given": rng.randint(0, 500), "likes_received": rng.randint(0, 500), "topics_entered": rng.randint(0, 2000),
+            "posts_read_count": rng.randint(0, 10000), "days_visited": rng.randint(0, 400), "topic_count": rng.randint(0, 50),
+            "post_count": rng.randint(0, 500), "time_read": rng.randint(0, 10**6), "recent_time_read": rng.randint(0, 10**5),
+            "solved_count": rng.randint(0, 20),
+            "top_categories": [{"name": name, "topic_count": rng.randint(0, 10), "post_count": rng.randint(0, 100)} for _cid, name in rng.sample(self.categories, min(3, len(self.categories)))],
+            "most_liked_by_users": [{"name": f"user_{rng.randint(1, len(self.users) - 1)}", "count": rng.randint(1, 30)} for _ in range(3)],
+        }}
+
+
+class RecordedForum:
+    """Serves recorded full results from DIR/<query_id>.json (and user summaries from DIR/summary.json)."""
+
+    def __init__(self, directory):
+        self.recorded = {}
+        self.summaries = {}
+        for name in os.listdir(directory):
+            match = re.fullmatch(r"(\d+)\.json", name)
+            if match:
+                with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                    self.recorded[int(match.group(1))] = json.load(f)
+        summary_path = os.path.join(directory, "summary.json")
+        if os.path.exists(summary_path):
+            with open(summary_path, "r", encoding="utf-8") as f:
+                self.summaries = json.load(f)  # {username: summary.json body}
+
+    def run_query(self, query_id, params):
+        result = self.recorded[query_id]
+        columns, rows = result["columns"], result["rows"]
+        if "category_id" in columns and ("category_id" in params or "category_ids" in params):
+            index = columns.index("category_id")
+            wanted = {cid.strip() for cid in str(params.get("category_ids", params.get("category_id"))).split(",")}
+            rows = [row for row in rows if str(row[index]) in wanted]
+        if "created_at" in columns and ("start_date" in params or "end_date" in params):
+            index = columns.index("created_at")
+            start = parse_query_date(params["start_date"]).isoformat() if "start_date" in params else ""
+            end = parse_query_date(params["end_date"]).isoformat() if "end_date" in params else "9999"
+            rows = [row for row in rows if start <= str(row[index])[:10] <= end]
+        return columns, rows
+
+    def user_summary(self, username):
+        return self.summaries.get(username)
+
+
+class StandInState:
+    """Configuration and counters shared by all request handler threads."""
+
+    def __init__(self, forum, page_size=1000, error_rate_429=0.0, retry_after=1, quota_rps=None, latency_ms=0, latency_jitter_ms=0, seed=7):
+        self.forum = forum
+        self.page_size = page_size
+        self.error_rate_429 = error_rate_429
+        self.retry_after = retry_after
+        self.quota_rps = quota_rps
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self._quota_tokens = float(quota_rps or 0)
+        self._quota_updated_at = time.monotonic()
+
+    def count(self, key):
+        with self.lock:
+            self.counters[key] += 1
+
+    def should_reject(self):
+        """Decide whether to answer 429: random injection, or the emulated server quota is exhausted."""
+        with self.lock:
+            if self.error_rate_429 and self.rng.random() < self.error_rate_429:
+                return True
+            if self.quota_rps:
+                now = time.monotonic()
+                self._quota_tokens = min(self.quota_rps, self._quota_tokens + (now - self._quota_updated_at) * self.quota_rps)
+                self._quota_updated_at = now
+                if self._quota_tokens < 1:
+                    return True
+                self._quota_tokens -= 1
+            return False
+
+    def delay(self):
+        if self.latency_ms or self.latency_jitter_ms:
+            with self.lock:
+                jitter = self.rng.uniform(0, self.latency_jitter_ms)
+            time.sleep((self.latency_ms + jitter) / 1000)
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real forum
+    server_version = "DiscourseStandIn/1.0"
+
+    @property
+    def state(self):
+        return self.server.state
+
+    def log_message(self, format, *args):
+        pass  # Request logging would dominate benchmark output
+
+    def _send_json(self, status, body, headers=None):
+        payload = json.dumps(body, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _reject_if_limited(self):
+        if self.state.should_reject():
+            self.state.count("responses_429")
+            self._send_json(429, {"errors": ["You've performed this action too many times."]}, {"Retry-After": str(self.state.retry_after)})
+            return True
+        return False
+
+    def do_GET(self):
+        if self.path == "/_stats":
+            self._send_json(200, self.state.stats())
+            return
+        match = re.fullmatch(r"/u/([^/]+)/summary\.json", self.path)
+        if not match:
+            self._send_json(404, {"errors": ["not found"]})
+            return
+        self.state.count("requests")
+        self.state.count("summary")
+        if self._reject_if_limited():
+            return
+        self.state.delay()
+        summary = self.state.forum.user_summary(match.group(1))
+        if summary is None:
+            self._send_json(404, {"errors": ["user not found"]})
+        else:
+            self._send_json(200, summary)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode("utf-8")
+        match = re.fullmatch(r"/g/[^/]+/reports/(\d+)/run", self.path)
+        if not match:
+            self._send_json(404, {"errors": ["not found"]})
+            return
+        query_id = int(match.group(1))
+        self.state.count("requests")
+        self.state.count(f"query_{query_id}")
+        if self._reject_if_limited():
+            return
+        self.state.delay()
+
+        raw_params = body[len("params="):] if body.startswith("params=") else (parse_qs(body).get("params") or ["{}"])[0]
+        params = json.loads(raw_params or "{}")
+        page = int(params.pop("page", 0))
+        try:
+            columns, rows = self.state.forum.run_query(query_id, params)
+        except (KeyError, ValueError) as e:
+            self._send_json(422, {"errors": [f"invalid query or params: {e}"]})
+            return
+        page_size = self.state.page_size
+        page_rows = rows[page * page_size:(page + 1) * page_size]
+        self._send_json(200, {"success": True, "columns": columns, "rows": page_rows, "result_count": len(page_rows)})
+
+
+def start_server(state, host="127.0.0.1", port=0):
+    """Start the stand-in in a daemon thread and return the running server (see server.server_port)."""
+    server = ThreadingHTTPServer((host, port), StandInHandler)
+    server.daemon_threads = True
+    server.state = state
+    threading.Thread(target=server.serve_forever, daemon=True, name="discourse-standin").start()
+    return server
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Discourse endpoints used by discourse-viz.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--recorded", help="Directory with recorded <query_id>.json results (instead of synthetic data)")
+    parser.add_argument("--categories", type=int, default=60)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--actions-per-category", type=int, default=2000)
+    parser.add_argument("--days-of-history", type=int, default=480)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--error-rate-429", type=float, default=0.0, help="Probability of answering any request with a 429")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--quota-rps", type=float, default=None, help="Emulated server quota; requests above it get a 429")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0)
+    return parser
+
+
+def build_state(args):
+    if args.recorded:
+        forum = RecordedForum(args.recorded)
+    else:
+        forum = SyntheticForum(categories=args.categories, users=args.users, actions_per_category=args.actions_per_category,
+                               days_of_history=args.days_of_history, seed=args.seed)
+    return StandInState(forum, page_size=args.page_size, error_rate_429=args.error_rate_429, retry_after=args.retry_after,
+                        quota_rps=args.quota_rps, latency_ms=args.latency_ms, latency_jitter_ms=args.latency_jitter_ms, seed=args.seed)
+
+
+if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    server = ThreadingHTTPServer((args.host, args.port), StandInHandler)
+    server.daemon_threads = True
+    server.state = build_state(args)
+    print(f"Discourse stand-in listening on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
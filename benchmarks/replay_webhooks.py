@@ -0,0 +1,81 @@
+"""
+Replay recorded Discourse webhook deliveries against the ingestion endpoint.
+
+Each line of the input file is one delivery:
+    {"event": "post_created", "event_id": "123", "payload": {...webhook JSON body...}}
+
+Bodies are signed with DISCOURSE_WEBHOOK_SECRET exactly like Discourse does
+(X-Discourse-Event-Signature: sha256=<hmac>), so the real authentication path is exercised.
+
+Usage:
+    DISCOURSE_WEBHOOK_SECRET=local python -m benchmarks.replay_webhooks benchmarks/webhook_samples.jsonl --url http://127.0.0.1:5000/webhooks/discourse
+    DISCOURSE_WEBHOOK_SECRET=local python -m benchmarks.replay_webhooks benchmarks/webhook_samples.jsonl --in-process
+
+--in-process mounts only the webhook blueprint on a bare Flask app and prints the rows
+each event maps to, so payload mappings can be checked without loading any data.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+
+
+def load_deliveries(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def sign(secret, body):
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+def build_headers(delivery, body, secret):
+    return {
+        "Content-Type": "application/json",
+        "X-Discourse-Event": delivery["event"],
+        "X-Discourse-Event-Id": str(delivery.get("event_id", "")),
+        "X-Discourse-Event-Signature": sign(secret, body),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded Discourse webhook deliveries.")
+    parser.add_argument("path", help="JSONL file of recorded deliveries")
+    parser.add_argument("--url", default="http://127.0.0.1:5000/webhooks/discourse")
+    parser.add_argument("--in-process", action="store_true", help="Post to a bare Flask app with only the webhook blueprint")
+    args = parser.parse_args()
+
+    secret = os.environ.get("DISCOURSE_WEBHOOK_SECRET")
+    if not secret:
+        sys.exit("DISCOURSE_WEBHOOK_SECRET must be set (the same value the app uses)")
+    deliveries = load_deliveries(args.path)
+
+    if args.in_process:
+        from flask import Flask
+        from routes.webhooks import webhooks_bp
+        from core.webhook_ingest import event_to_rows, ACTION_COLUMNS
+
+        app = Flask(__name__)
+        app.register_blueprint(webhooks_bp)
+        client = app.test_client()
+        for delivery in deliveries:
+            body = json.dumps(delivery["payload"]).encode("utf-8")
+            response = client.post("/webhooks/discourse", data=body, headers=build_headers(delivery, body, secret))
+            print(f"{delivery['event']:<20}{response.status_code:>5}  {response.get_json()}")
+            for row in event_to_rows(delivery["event"], delivery["payload"]):
+                print("    " + ", ".join(f"{column}={value}" for column, value in zip(ACTION_COLUMNS, row)))
+        print(json.dumps(client.get("/webhooks/discourse/stats").get_json(), indent=2))
+        return
+
+    import requests
+
+    for delivery in deliveries:
+        body = json.dumps(delivery["payload"]).encode("utf-8")
+        response = requests.post(args.url, data=body, headers=build_headers(delivery, body, secret), timeout=10)
+        print(f"{delivery['event']:<20}{response.status_code:>5}  {response.text.strip()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Offline benchmark of the data loader against the local Discourse stand-in.
+
+Starts benchmarks/discourse_standin.py in a subprocess (so its memory does not
+count against the loader), points the app at it and runs:
+
+1. full_reset     -> core.data_loader.full_system_reset() from a cold process
+2. daily_refresh  -> core.data_loader.refresh_all_data() for a one-day window
+
+and reports wall time, requests made (as counted by the stand-in, 429s included)
+and peak RSS for each phase.
+
+Usage:
+    python -m benchmarks.run_reset_benchmark --categories 60 --actions-per-category 2000 --client-rps 50
+    python -m benchmarks.run_reset_benchmark --error-rate-429 0.02 --latency-ms 80 --json bench.json
+
+Any option not listed below is passed through to the stand-in (see
+`python -m benchmarks.discourse_standin --help`). Peak RSS is the process
+high-water mark, so the refresh figure can never be lower than the reset figure.
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # ru_maxrss is KiB on Linux
+
+
+def _server_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/_stats", timeout=10) as response:
+        return json.load(response)
+
+
+def start_standin(standin_args, port):
+    """Start the stand-in subprocess and wait until it is accepting requests."""
+    command = [sys.executable, "-m", "benchmarks.discourse_standin", "--port", str(port), *standin_args]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()  # Printed once the synthetic forum is generated and the socket is bound
+    if "listening" not in line:
+        process.kill()
+        raise RuntimeError(f"Discourse stand-in failed to start: {line!r}")
+    return process
+
+
+def run_phase(name, base_url, func):
+    before = _server_stats(base_url)
+    start = time.perf_counter()
+    func()
+    wall = time.perf_counter() - start
+    after = _server_stats(base_url)
+    return {
+        "phase": name,
+        "wall_sec": round(wall, 2),
+        "requests": after.get("requests", 0) - before.get("requests", 0),
+        "responses_429": after.get("responses_429", 0) - before.get("responses_429", 0),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a full reset and a daily refresh against the local Discourse stand-in.")
+    parser.add_argument("--client-rps", type=float, default=None, help="Override DISCOURSE_RATE_LIMIT_RPS for the loader")
+    parser.add_argument("--client-burst", type=int, default=None, help="Override DISCOURSE_RATE_LIMIT_BURST for the loader")
+    parser.add_argument("--with-cache", action="store_true", help="Keep the on-disk query cache enabled (in a temp dir)")
+    parser.add_argument("--skip-refresh", action="store_true")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args, standin_args = parser.parse_known_args()
+
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    standin = start_standin(standin_args, port)
+    work_dir = tempfile.mkdtemp(prefix="discourse-viz-bench-")  # Everything the app writes to disk goes here, not to .cache
+    try:
+        # Configure the app before any of its modules are imported; constants are read at import time
+        os.environ["DISCOURSE_BASE_URL"] = base_url
+        os.environ.setdefault("API_KEY", "benchmark")
+        os.environ["QUERY_CACHE_ENABLED"] = "1" if args.with_cache else "0"
+        os.environ["QUERY_CACHE_DIR"] = os.path.join(work_dir, "discourse_queries")
+        os.environ["RESET_CHECKPOINT_DIR"] = os.path.join(work_dir, "reset_checkpoint")
+        os.environ["SNAPSHOT_DIR"] = os.path.join(work_dir, "snapshots")
+        os.environ["ARROW_STORE_DIR"] = os.path.join(work_dir, "arrow_store")
+        if args.client_rps is not None:
+            os.environ["DISCOURSE_RATE_LIMIT_RPS"] = str(args.client_rps)
+        if args.client_burst is not None:
+            os.environ["DISCOURSE_RATE_LIMIT_BURST"] = str(args.client_burst)
+
+        from core.logging_config import init_logging
+        init_logging(default_level="ERROR")  # LOG_LEVEL still overrides this
+        import core.data_loader as data_loader
+        from core.http_client import get_connection_stats
+
+        results = [run_phase("full_reset", base_url, data_loader.full_system_reset)]
+        if data_loader.get_system_reset_status()["reset_failed"]:
+            results[-1]["error"] = data_loader.get_system_reset_status()["failure_reason"]
+
+        if not args.skip_refresh:
+            def daily_refresh():
+                # Emulate the nightly job: the last refresh happened yesterday
+                data_loader.publish_data_generation(last_refresh_date=(datetime.now() - timedelta(days=1)).strftime("%d-%m-%Y"))
+                data_loader.refresh_all_data()
+            results.append(run_phase("daily_refresh", base_url, daily_refresh))
+
+        report = {"results": results, "server": _server_stats(base_url), "client_connections": get_connection_stats()}
+    finally:
+        standin.terminate()
+        standin.wait(timeout=10)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'phase':<15}{'wall_sec':>10}{'requests':>10}{'429s':>8}{'peak_rss_mb':>13}")
+    for result in results:
+        print(f"{result['phase']:<15}{result['wall_sec']:>10}{result['requests']:>10}{result['responses_429']:>8}{result['peak_rss_mb']:>13}")
+        if "error" in result:
+            print(f"  error: {result['error']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Benchmark of the embedded SQL engine (core/sql_engine.py) against the pandas paths.
+
+Builds one term from the synthetic forum of benchmarks/discourse_standin.py
+in-process (no server, no Discourse), publishes it as the current generation and
+times each case on both paths:
+
+1. first_responders     top 10 first responders of the largest course
+2. trending_counts      weighted action counts on the largest course's topics of the last 7 days
+3. top_users_per_course top 10 users by actions of every course of the term
+4. user_activity        one user's actions per course and action type across the term
+
+Each case reports the median wall time over --repeat runs (after one warm-up
+run) and whether both paths returned the same result. The engine's first sync
+(registering the term, or copying it for sqlite) and the peak RSS after it are
+reported separately.
+
+Usage:
+    python -m benchmarks.run_sql_benchmark --categories 60 --actions-per-category 3000
+    python -m benchmarks.run_sql_benchmark --engine sqlite --json sql_bench.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import time
+
+TOP_USERS_PER_COURSE_SQL = """
+SELECT category_id, user_key, actions FROM (
+    SELECT category_id, user_key, COUNT(*) AS actions,
+           ROW_NUMBER() OVER (PARTITION BY category_id ORDER BY COUNT(*) DESC, user_key) AS position
+    FROM user_actions
+    WHERE term = ?
+    GROUP BY category_id, user_key
+) ranked
+WHERE position <= ?
+ORDER BY category_id, position
+"""
+USER_ACTIVITY_SQL = """
+SELECT category_id, action_type, COUNT(*) AS actions
+FROM user_actions
+WHERE term = ? AND user_key = ?
+GROUP BY category_id, action_type
+ORDER BY category_id, action_type
+"""
+
+
+def _peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # ru_maxrss is KiB on Linux
+
+
+def _median_sec(func, repeat):
+    func()  # Warm-up (first-use caches, engine sync)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return round(statistics.median(timings), 4)
+
+
+def build_term(args):
+    """Publish one term of synthetic user actions as the current generation; returns (term, TermTable)."""
+    from benchmarks.discourse_standin import SyntheticForum, COLUMNS_103
+    import core.data_loader as data_loader
+    from core.dimensions import encode_user_actions
+    from core.query_schemas import decode_page
+    from core.term_table import TermTable
+    from core.utils import get_current_trimester
+
+    forum = SyntheticForum(categories=args.categories, users=args.users, actions_per_category=args.actions_per_category, days_of_history=args.days_of_history)
+    term = get_current_trimester()
+    slots, categories = {}, {}
+    for category_id, name in forum.categories:
+        slots[name] = {"user_actions_df": encode_user_actions(decode_page(103, COLUMNS_103, forum.actions[category_id]))}
+        categories[name] = category_id
+    term_table = TermTable.from_slots(slots, categories)
+    data_loader.publish_data_generation(publish_readers=False, user_actions_dictionaries={term: term_table}, user_actions_loaded=True)
+    return term, term_table
+
+
+def run_cases(term, term_table, repeat):
+    import pandas as pd
+
+    import core.sql_engine as sql_engine
+    from processors.course_data_processors import (
+        _first_responder_counts_pandas, _first_responder_counts_sql,
+        _recent_topic_action_counts_pandas, _recent_topic_action_counts_sql,
+    )
+
+    largest_course = max(term_table.categories, key=lambda course: term_table.partition_rows()[course])
+    course_df = term_table[largest_course]["user_actions_df"]
+    since = pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=7)
+    user_actions = term_table.user_actions
+    busiest_user = int(user_actions["user_key"].value_counts().index[0])
+
+    def top_users_pandas():
+        sizes = user_actions.groupby(["category_id", "user_key"], observed=True).size().rename("actions").reset_index()
+        sizes = sizes.sort_values(["category_id", "actions", "user_key"], ascending=[True, False, True])
+        return sizes.groupby("category_id", sort=False).head(10).reset_index(drop=True)
+
+    def user_activity_pandas():
+        rows = user_actions[user_actions["user_key"] == busiest_user]
+        return rows.groupby(["category_id", "action_type"], observed=True).size().rename("actions").reset_index()
+
+    def same_frame(left, right):
+        left, right = left.reset_index(drop=True).astype("int64"), right.reset_index(drop=True).astype("int64")
+        return left.equals(right)
+
+    def same_trending(left, right):
+        (left_counts, left_topics), (right_counts, right_topics) = left, right
+        columns = sorted(set(left_counts.columns) | set(right_counts.columns))
+        left_counts = left_counts.reindex(columns=columns, fill_value=0).sort_index().astype("int64")
+        right_counts = right_counts.reindex(columns=columns, fill_value=0).sort_index().astype("int64")
+        return left_counts.equals(right_counts) and set(left_topics.index) == set(right_topics.index)
+
+    cases = [
+        ("first_responders",
+         lambda: _first_responder_counts_pandas(course_df),
+         lambda: _first_responder_counts_sql(term, largest_course),
+         lambda left, right: sorted(left.tolist()) == sorted(right.tolist())),  # Ties may be ordered differently
+        ("trending_counts",
+         lambda: _recent_topic_action_counts_pandas(course_df, since),
+         lambda: _recent_topic_action_counts_sql(term, largest_course, since),
+         same_trending),
+        ("top_users_per_course",
+         top_users_pandas,
+         lambda: sql_engine.query(TOP_USERS_PER_COURSE_SQL, (term, 10)),
+         same_frame),
+        ("user_activity",
+         user_activity_pandas,
+         lambda: sql_engine.query(USER_ACTIVITY_SQL, (term, busiest_user)),
+         same_frame),
+    ]
+    results = []
+    for name, pandas_func, sql_func, same in cases:
+        results.append({
+            "case": name,
+            "pandas_sec": _median_sec(pandas_func, repeat),
+            "sql_sec": _median_sec(sql_func, repeat),
+            "match": bool(same(pandas_func(), sql_func())),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the embedded SQL engine against the pandas paths on synthetic data.")
+    parser.add_argument("--engine", choices=["auto", "duckdb", "sqlite"], default="auto", help="SQL_ENGINE for this run")
+    parser.add_argument("--categories", type=int, default=60)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--actions-per-category", type=int, default=3000)
+    parser.add_argument("--days-of-history", type=int, default=120, help="Actions are spread over this many days up to today")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case and path (median reported)")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    # Configure the app before any of its modules are imported; constants are read at import time
+    os.environ["SQL_ENGINE"] = args.engine
+    os.environ["SNAPSHOT_ENABLED"] = "0"
+    from core.logging_config import init_logging
+    init_logging(default_level="ERROR")  # LOG_LEVEL still overrides this
+    import core.data_loader as data_loader  # Imported before the processors (they import it as a module)
+    import core.sql_engine as sql_engine
+
+    start = time.perf_counter()
+    term, term_table = build_term(args)
+    build_sec = round(time.perf_counter() - start, 2)
+    rss_before_sync = _peak_rss_mb()
+    start = time.perf_counter()
+    sql_engine.get_engine().sync(data_loader.get_data_generation())
+    sync_sec = round(time.perf_counter() - start, 3)
+
+    report = {
+        "engine": sql_engine.engine_name(),
+        "rows": len(term_table.user_actions),
+        "courses": len(term_table.categories),
+        "build_sec": build_sec,
+        "engine_sync_sec": sync_sec,
+        "peak_rss_mb_before_sync": rss_before_sync,
+        "peak_rss_mb_after_sync": _peak_rss_mb(),
+        "results": run_cases(term, term_table, args.repeat),
+    }
+
+    print(f"engine: {report['engine']} | rows: {report['rows']} | courses: {report['courses']} | engine_sync_sec: {sync_sec} | peak_rss_mb: {rss_before_sync} -> {report['peak_rss_mb_after_sync']}")
+    print(f"{'case':<22}{'pandas_sec':>12}{'sql_sec':>10}{'speedup':>9}{'match':>7}")
+    for result in report["results"]:
+        speedup = round(result["pandas_sec"] / result["sql_sec"], 1) if result["sql_sec"] else float("inf")
+        print(f"{result['case']:<22}{result['pandas_sec']:>12}{result['sql_sec']:>10}{speedup:>9}{str(result['match']):>7}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Incremental merge of user actions into a course's frame.
+
+Every action row is keyed by a 64-bit fingerprint of the columns that identify it
+(FINGERPRINT_COLUMNS) of the encoded fact table (see core/dimensions.py), so a
+renamed topic does not duplicate its actions. Next to its
+user_actions_df every course slot keeps a MergeState:
+
+- fingerprints: one per row, in row order (used to drop webhook rows on reconciliation)
+- index: the same fingerprints sorted, for O(log n) membership tests
+- watermark: the newest created_at fetched by query 103 for the course
+
+A refresh fingerprints only the fetched delta, appends the rows that are not held
+yet and extends the state, instead of re-hashing the whole term with drop_duplicates.
+Each course is fetched from the day of its watermark (see fetch_start_date), so a
+course whose fetch failed catches up on the next run, and the overlapping boundary
+day is deduplicated by fingerprint.
+
+Snapshots keep the fingerprints and watermark (core/snapshot.py), so a warm start
+does not re-hash the term; checkpoints and the Arrow store hold the frames only, and
+a missing state is rebuilt from the frame on first use.
+"""
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from core.query_schemas import concat_frames
+
+MERGE_STATE_KEY = "merge_state"
+FINGERPRINT_COLUMNS = ("user_key", "action_type", "target_topic_id", "target_post_id", "created_at")
+_NUMERIC_COLUMNS = ("user_key", "action_type", "target_topic_id", "target_post_id")
+_EMPTY_FINGERPRINTS = np.empty(0, dtype=np.uint64)
+
+
+class MergeState(NamedTuple):
+    frame: pd.DataFrame  # The user_actions_df this state describes; a replaced frame invalidates it
+    fingerprints: np.ndarray  # uint64 per row of `frame`, in row order
+    index: np.ndarray  # `fingerprints`, sorted
+    watermark: pd.Timestamp | None  # Newest created_at fetched by query 103 (webhook rows do not advance it)
+
+
+def row_fingerprints(df):
+    """
+    64-bit fingerprint per row of an encoded user actions frame.
+
+    Keys, ids and action types are compared as integers and created_at as UTC nanoseconds,
+    so rows from query 103 and from webhooks get the same fingerprint whatever their dtypes.
+    """
+    if df is None or df.empty:
+        return _EMPTY_FINGERPRINTS
+    normalized = {}
+    for column in FINGERPRINT_COLUMNS:
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if column == "created_at":
+            normalized[column] = pd.to_datetime(values, utc=True, errors="coerce").dt.as_unit("ns").array.asi8
+        elif column in _NUMERIC_COLUMNS:
+            normalized[column] = pd.to_numeric(values, errors="coerce").astype("float64").fillna(-1).astype("int64").to_numpy()
+        else:
+            normalized[column] = values.astype(str).to_numpy(dtype=object)
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).to_numpy()
+
+
+def _max_created_at(df):
+    if df is None or df.empty or "created_at" not in df.columns:
+        return None
+    latest = pd.to_datetime(df["created_at"], utc=True, errors="coerce").max()
+    return None if pd.isna(latest) else latest
+
+
+def get_merge_state(course_slot, fallback_watermark=None):
+    """
+    MergeState of a course slot, rebuilt from its user_actions_df when missing or stale.
+
+    Args:
+        course_slot (dict): A course's {frame_name: DataFrame} dictionary; the state is stored in it.
+        fallback_watermark (pd.Timestamp, optional): Upper bound for a rebuilt watermark. A rebuilt
+            frame may hold webhook rows newer than anything query 103 returned, so callers pass
+            the start of the last refresh date.
+    """
+    user_actions_df = course_slot.get("user_actions_df")
+    state = course_slot.get(MERGE_STATE_KEY)
+    if state is not None and state.frame is user_actions_df:
+        return state
+    fingerprints = row_fingerprints(user_actions_df)
+    watermark = _max_created_at(user_actions_df)
+    if watermark is not None and fallback_watermark is not None:
+        watermark = min(watermark, fallback_watermark)
+    state = MergeState(user_actions_df, fingerprints, np.sort(fingerprints), watermark)
+    course_slot[MERGE_STATE_KEY] = state
+    return state
+
+
+def fetch_start_date(course_slot, last_refresh_date):
+    """
+    First day (dd-mm-yyyy) the refresh must fetch for a course: the day of its watermark,
+    or last_refresh_date for a course without one.
+    """
+    fallback = pd.Timestamp(datetime.strptime(last_refresh_date, "%d-%m-%Y").replace(tzinfo=timezone.utc))
+    watermark = get_merge_state(course_slot, fallback_watermark=fallback).watermark
+    if watermark is None:
+        return last_refresh_date
+    return watermark.strftime("%d-%m-%Y")
+
+
+def append_unseen_rows(course_slot, latest_df, advance_watermark=True):
+    """
+    Append the rows of `latest_df` that the course does not hold yet.
+
+    `course_slot["user_actions_df"]` is replaced, never modified, when rows are appended.
+
+    Args:
+        course_slot (dict): The course's slot (of a shadow copy).
+        latest_df (pd.DataFrame): Fetched (or webhook) rows in the layout of query 103.
+        advance_watermark (bool): True for rows fetched by query 103.
+
+    Returns:
+        pd.DataFrame: The rows appended (empty if none).
+    """
+    state = get_merge_state(course_slot)
+    if latest_df is None or latest_df.empty:
+        return pd.DataFrame()
+    latest_fingerprints = row_fingerprints(latest_df)
+    is_new = np.zeros(len(latest_fingerprints), dtype=bool)
+    is_new[np.unique(latest_fingerprints, return_index=True)[1]] = True  # First occurrence within the delta
+    if len(state.index):
+        positions = np.searchsorted(state.index, latest_fingerprints).clip(max=len(state.index) - 1)
+        is_new &= state.index[positions] != latest_fingerprints
+
+    watermark = state.watermark
+    if advance_watermark:
+        latest_created_at = _max_created_at(latest_df)
+        if latest_created_at is not None and (watermark is None or latest_created_at > watermark):
+            watermark = latest_created_at
+
+    if not is_new.any():
+        course_slot[MERGE_STATE_KEY] = state._replace(watermark=watermark)
+        return pd.DataFrame()
+    new_fingerprints = latest_fingerprints[is_new]
+    appended_df = latest_df[is_new].reset_index(drop=True)
+    user_actions_df = concat_frames([state.frame, appended_df])
+    sorted_new = np.sort(new_fingerprints)
+    index = np.insert(state.index, np.searchsorted(state.index, sorted_new), sorted_new)
+    course_slot["user_actions_df"] = user_actions_df
+    course_slot[MERGE_STATE_KEY] = MergeState(user_actions_df, np.concatenate([state.fingerprints, new_fingerprints]), index, watermark)
+    return appended_df
+
+
+def drop_rows(course_slot, rows_df):
+    """
+    Remove the rows matching `rows_df` by fingerprint, e.g. webhook rows before the
+    nightly reconciliation. Returns the rows removed (empty if none).
+    """
+    state = get_merge_state(course_slot)
+    if rows_df is None or rows_df.empty or not len(state.fingerprints):
+        return pd.DataFrame()
+    keep = ~np.isin(state.fingerprints, row_fingerprints(rows_df))
+    if keep.all():
+        return pd.DataFrame()
+    dropped_df = state.frame[~keep].reset_index(drop=True)
+    user_actions_df = state.frame[keep].reset_index(drop=True)
+    fingerprints = state.fingerprints[keep]
+    course_slot["user_actions_df"] = user_actions_df
+    course_slot[MERGE_STATE_KEY] = MergeState(user_actions_df, fingerprints, np.sort(fingerprints), state.watermark)
+    return dropped_df
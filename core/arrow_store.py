@@ -0,0 +1,342 @@
+"""Memory-mapped Arrow store shared by several web worker processes.
+
+With DATA_ROLE = "loader" the process that fetches from Discourse (normally the
+loader worker, core/loader_worker.py) publishes
+the loaded data as a *generation* of Arrow IPC files after every load,
+refresh and webhook flush:
+
+    ARROW_STORE_DIR/
+        CURRENT                                  name of the live generation (replaced atomically)
+        gen-<version>/metadata.json              frame list, last_refresh_date, reset status, ...
+        gen-<version>/terms/<term>/user_actions/<category_id>.arrow     the course partitions of the term tables
+        gen-<version>/terms/<term>/action_counts/<category_id>.arrow    (core/term_table.py)
+        gen-<version>/terms/<term>/overall/<frame>.arrow
+        gen-<version>/df_map_category_to_id.arrow, id_username_mapping.arrow, users.arrow, topics.arrow
+
+Frames that did not change since the previous generation are hard-linked
+instead of rewritten, so publishing after a webhook flush only writes the
+partitions of the courses it touched.
+
+Processes with DATA_ROLE = "reader" (e.g. gunicorn workers) never fetch. They
+memory-map the files of the CURRENT generation, so every worker shares the same
+page-cache copy of the data; course frames are the mapped partitions. Frames are opened lazily on first access, and
+readers notice a new generation within ARROW_STORE_POLL_SECONDS. Old
+generations stay on disk for ARROW_STORE_RETAIN_SECONDS, so a reader that is
+still on one can finish reading it.
+
+Webhook deliveries that land on a reader are written to ARROW_STORE_DIR/webhook_spool/
+and merged by the loader on its next flush.
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from functools import cached_property
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+from application.constants import ARROW_STORE_DIR, ARROW_STORE_POLL_SECONDS, ARROW_STORE_RETAIN_SECONDS
+from core.dimensions import UserDimension, TopicDimension
+from core.logging_config import get_logger
+
+logger = get_logger("core.arrow_store")
+
+CURRENT_FILE = "CURRENT"
+METADATA_FILE = "metadata.json"
+GENERATION_PREFIX = "gen-"
+SPOOL_DIR = os.path.join(ARROW_STORE_DIR, "webhook_spool")
+TERM_TABLES = ("user_actions", "action_counts")
+OVERALL_FRAMES = ("raw_metrics", "unnormalized_scores", "log_normalized_scores")
+
+# WRITER (loader process)
+
+_publish_lock = threading.Lock()
+_last_published = {}  # relative path -> (DataFrame object, file path); unchanged frames are hard-linked
+
+
+def _publish_frame(tmp_dir, generation_dir, relative_path, df, frames, published):
+    if df is None or df.empty:
+        frames[relative_path] = {"rows": 0, "empty": True}
+        return
+    path = os.path.join(tmp_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    previous = _last_published.get(relative_path)
+    linked = False
+    if previous is not None and previous[0] is df:  # Frames are replaced, never mutated in place, when they change
+        try:
+            os.link(previous[1], path)
+            linked = True
+        except OSError:
+            pass
+    if not linked:
+        feather.write_feather(df, path, compression="uncompressed")  # Uncompressed IPC files can be memory-mapped zero-copy
+    frames[relative_path] = {"rows": len(df), "empty": False}
+    published[relative_path] = (df, os.path.join(generation_dir, relative_path), linked)
+
+
+def publish_generation(state):
+    """
+    Publish the loaded data as a new generation and point CURRENT at it.
+
+    Args:
+        state (dict): user_actions_dictionaries ({term: TermTable}), df_map_category_to_id, id_username_mapping,
+            last_refresh_date, uncategorized_courses, user_actions_loaded, ready_units, load_progress, reset_status
+            and the users/topics dimension frames.
+
+    Returns:
+        str | None: The generation name, or None if publishing failed.
+    """
+    with _publish_lock:
+        start_time = time.perf_counter()
+        name = f"{GENERATION_PREFIX}{datetime.now().strftime('%Y%m%dT%H%M%S%f')}"
+        generation_dir = os.path.join(ARROW_STORE_DIR, name)
+        tmp_dir = os.path.join(ARROW_STORE_DIR, f".tmp-{name}")
+        frames, published = {}, {}
+        try:
+            os.makedirs(tmp_dir)
+            _publish_frame(tmp_dir, generation_dir, "df_map_category_to_id.arrow", state["df_map_category_to_id"], frames, published)
+            _publish_frame(tmp_dir, generation_dir, "id_username_mapping.arrow", state["id_username_mapping"], frames, published)
+            _publish_frame(tmp_dir, generation_dir, "users.arrow", state["users"], frames, published)
+            _publish_frame(tmp_dir, generation_dir, "topics.arrow", state["topics"], frames, published)
+            for term, term_table in state["user_actions_dictionaries"].items():
+                for table_name in TERM_TABLES:
+                    for category_id, df in term_table.parts(table_name).items():
+                        _publish_frame(tmp_dir, generation_dir, f"terms/{term}/{table_name}/{category_id}.arrow", df, frames, published)
+                for frame_name in OVERALL_FRAMES:
+                    _publish_frame(tmp_dir, generation_dir, f"terms/{term}/overall/{frame_name}.arrow", term_table.overall.get(frame_name), frames, published)
+            metadata = {
+                "generation": name,
+                "published_at": datetime.now().isoformat(),
+                "last_refresh_date": state["last_refresh_date"],
+                "uncategorized_courses": list(state.get("uncategorized_courses") or []),
+                "user_actions_loaded": state["user_actions_loaded"],
+                "ready_units": [list(unit) for unit in state.get("ready_units", [])],
+                "load_progress": state.get("load_progress"),
+                "reset_status": state.get("reset_status", {}),
+                "terms": {term: term_table.categories for term, term_table in state["user_actions_dictionaries"].items()},
+                "frames": frames,
+            }
+            with open(os.path.join(tmp_dir, METADATA_FILE), "w", encoding="utf-8") as f:
+                json.dump(metadata, f, indent=1)
+            os.replace(tmp_dir, generation_dir)  # Publish the complete generation in one step
+            _write_current(name)
+        except Exception as e:
+            logger.error(f"Arrow generation publish failed | function: publish_generation | generation: {name} | error: {e}", exc_info=True)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return None
+
+        _last_published.clear()
+        _last_published.update({path: (df, file_path) for path, (df, file_path, _linked) in published.items()})
+        _prune_generations(keep=name)
+        reused = sum(1 for _df, _path, linked in published.values() if linked)
+        logger.info(f"Arrow generation published | function: publish_generation | generation: {name} | frames: {len(published)} | reused_frames: {reused} | duration_sec: {round(time.perf_counter() - start_time, 2)}")
+        return name
+
+
+def _write_current(name):
+    tmp_path = os.path.join(ARROW_STORE_DIR, f".{CURRENT_FILE}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(name)
+    os.replace(tmp_path, os.path.join(ARROW_STORE_DIR, CURRENT_FILE))
+
+
+def _prune_generations(keep):
+    now = time.time()
+    for name in os.listdir(ARROW_STORE_DIR):
+        path = os.path.join(ARROW_STORE_DIR, name)
+        if name == keep or not name.removeprefix(".tmp-").startswith(GENERATION_PREFIX):
+            continue
+        if now - os.path.getmtime(path) > ARROW_STORE_RETAIN_SECONDS:  # Readers switch within ARROW_STORE_POLL_SECONDS
+            shutil.rmtree(path, ignore_errors=True)
+
+
+# READER (web worker processes)
+
+class ArrowGeneration:
+    """
+    One published generation, opened read-only; frames are memory-mapped on first access.
+    Has the same fields as core.data_loader.DataGeneration, so the getters serve either.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.directory = os.path.join(ARROW_STORE_DIR, name)
+        with open(os.path.join(self.directory, METADATA_FILE), "r", encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def frame(self, relative_path):
+        with self._lock:
+            if relative_path in self._frames:
+                return self._frames[relative_path]
+        entry = self.metadata["frames"][relative_path]
+        if entry["empty"]:
+            df = pd.DataFrame()
+        else:
+            with pa.memory_map(os.path.join(self.directory, relative_path), "r") as source:
+                table = pa.ipc.open_file(source).read_all()  # Buffers point into the shared mapping, no copy
+            df = table.to_pandas(split_blocks=True)  # Columns stay separate instead of being consolidated into copies
+        with self._lock:
+            return self._frames.setdefault(relative_path, df)
+
+    @property
+    def version(self):
+        return self.name
+
+    @cached_property
+    def user_actions_dictionaries(self):
+        from core.term_table import TermTable
+
+        user_dimension, _topic_dimension = self.dimensions
+        term_tables = {}
+        for term, categories in self.metadata["terms"].items():
+            if f"terms/{term}/user_actions.arrow" in self.metadata["frames"]:  # Published before the term tables were split by course
+                tables = {"user_actions": self.frame(f"terms/{term}/user_actions.arrow"), "action_counts": self.frame(f"terms/{term}/action_counts.arrow")}
+            else:
+                tables = {"fact_parts": _LazyParts(self, f"terms/{term}/user_actions/", categories), "count_parts": _LazyParts(self, f"terms/{term}/action_counts/", categories)}
+            term_tables[term] = TermTable(
+                categories,
+                overall=_LazySlot(self, f"terms/{term}/overall/", OVERALL_FRAMES),
+                user_dimension=user_dimension,  # Derived raw_metrics join the usernames of this generation
+                **tables,
+            )
+        return term_tables
+
+    @property
+    def df_map_category_to_id(self):
+        return self.frame("df_map_category_to_id.arrow")
+
+    @property
+    def id_username_mapping(self):
+        return self.frame("id_username_mapping.arrow")
+
+    @property
+    def last_refresh_date(self):
+        return self.metadata["last_refresh_date"]
+
+    @cached_property
+    def dimensions(self):
+        """(UserDimension, TopicDimension) of this generation's course frames."""
+        return UserDimension.from_frame(self.frame("users.arrow")), TopicDimension.from_frame(self.frame("topics.arrow"))
+
+    @property
+    def uncategorized_courses(self):
+        return self.metadata["uncategorized_courses"]
+
+    @property
+    def user_actions_loaded(self):
+        return self.metadata["user_actions_loaded"]
+
+    @cached_property
+    def ready_units(self):
+        return frozenset(tuple(unit) for unit in self.metadata.get("ready_units", []))
+
+    @property
+    def load_progress(self):
+        return self.metadata.get("load_progress")
+
+
+class _LazySlot(Mapping):
+    """Read-only {frame_name: DataFrame} of a term's overall slot that opens frames on access."""
+
+    def __init__(self, generation, prefix, frame_names):
+        self._generation = generation
+        self._prefix = prefix
+        self._frame_names = frame_names
+
+    def __getitem__(self, frame_name):
+        if frame_name not in self._frame_names:
+            raise KeyError(frame_name)
+        return self._generation.frame(f"{self._prefix}{frame_name}.arrow")
+
+    def __iter__(self):
+        return iter(self._frame_names)
+
+    def __len__(self):
+        return len(self._frame_names)
+
+
+class _LazyParts(Mapping):
+    """Read-only {course: partition} of one term table that opens partitions on access; courses without rows are left out."""
+
+    def __init__(self, generation, prefix, categories):
+        self._generation = generation
+        self._paths = {course: f"{prefix}{category_id}.arrow" for course, category_id in categories.items()}
+        self._paths = {course: path for course, path in self._paths.items() if path in generation.metadata["frames"]}
+
+    def __getitem__(self, course):
+        return self._generation.frame(self._paths[course])
+
+    def __contains__(self, course):
+        return course in self._paths
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+
+_current_generation = None
+_current_checked_at = 0.0
+_reader_lock = threading.Lock()
+
+
+def current_generation():
+    """The live generation for this reader process (re-checked every ARROW_STORE_POLL_SECONDS), or None."""
+    global _current_generation, _current_checked_at
+    now = time.monotonic()
+    if _current_generation is not None and now - _current_checked_at < ARROW_STORE_POLL_SECONDS:
+        return _current_generation
+    with _reader_lock:
+        _current_checked_at = now
+        try:
+            with open(os.path.join(ARROW_STORE_DIR, CURRENT_FILE), "r", encoding="utf-8") as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return _current_generation
+        if _current_generation is None or _current_generation.name != name:
+            try:
+                _current_generation = ArrowGeneration(name)
+                logger.info(f"Switched to Arrow generation | function: current_generation | generation: {name}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not open Arrow generation, keeping the previous one | function: current_generation | generation: {name} | error: {e}")
+        return _current_generation
+
+
+# WEBHOOK SPOOL (readers hand webhook rows to the loader)
+
+def spool_webhook_rows(event_id, rows):
+    """Write the rows of one webhook delivery for the loader process (called by readers)."""
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    name = f"{time.time_ns()}-{os.getpid()}-{threading.get_ident()}"
+    tmp_path = os.path.join(SPOOL_DIR, f".{name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"event_id": event_id, "rows": rows}, f)
+    os.replace(tmp_path, os.path.join(SPOOL_DIR, f"{name}.json"))
+
+
+def drain_webhook_spool():
+    """Return [(event_id, rows)] of the spooled deliveries, oldest first, and delete them (called by the loader)."""
+    if not os.path.isdir(SPOOL_DIR):
+        return []
+    deliveries = []
+    for name in sorted(name for name in os.listdir(SPOOL_DIR) if name.endswith(".json")):
+        path = os.path.join(SPOOL_DIR, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                delivery = json.load(f)
+            deliveries.append((delivery["event_id"], delivery["rows"]))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Unreadable webhook spool file dropped | function: drain_webhook_spool | file: {name} | error: {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return deliveries
@@ -0,0 +1,407 @@
+"""asyncio Discourse client.
+
+Every Discourse call of the process (query pages and user summaries) runs as a
+coroutine on one event loop in a background thread ("discourse-io"), over one
+pooled aiohttp session:
+
+- pages are crawled with a widening window (page 0 first, then up to
+  DISCOURSE_MAX_PAGES_IN_FLIGHT pages ahead) and stop on an empty or short page;
+- every request waits on the shared process-wide token bucket (core/rate_limiter.py)
+  with `asyncio.sleep`, so waiting for the quota costs no thread;
+- a 429 slows the bucket down and the page is retried up to DISCOURSE_MAX_429_RETRIES times;
+- pages go through the on-disk query cache (core/query_cache.py) and are decoded
+  with the typed schemas (core/query_schemas.py); file I/O, JSON parsing and
+  decoding run in worker threads, off the loop;
+- non-429 errors are logged, alerted and raise DiscourseQueryError.
+
+Sync callers keep their functions: core.execute_query.iter_discourse_query_pages /
+execute_discourse_query and user_summary.get_user_summary hand their coroutine to
+the loop (`run`, `iterate`) and wait for the result. Code on another event loop can
+`await asyncio.wrap_future(submit(coro))`; many queries at once:
+
+    frames = run(gather_discourse_queries([(103, params) for params in course_params]))
+"""
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+
+import aiohttp
+
+from application.constants import (
+    env,
+    API_USERNAME,
+    API_KEY,
+    GROUP_NAME,
+    DISCOURSE_BASE_URL,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    DISCOURSE_MAX_PAGES_IN_FLIGHT,
+    DISCOURSE_MAX_429_RETRIES,
+    DISCOURSE_DEFAULT_RETRY_AFTER,
+    DISCOURSE_ASYNC_MAX_CONNECTIONS,
+    USER_SUMMARY_MAX_WAIT_SECONDS,
+)
+from core import query_cache
+from core.execute_query import DiscourseRateLimitError, DiscourseQueryError, _get_query_logger, _build_request_payload
+from core.http_client import _record_request, _record_new_connection, _record_connect_time
+from core.logging_config import get_logger
+from core.query_schemas import decode_page, concat_frames
+from core.rate_limiter import get_discourse_rate_limiter, parse_retry_after
+from core.utils import _alert_developer_of_reset_failure
+
+logger = get_logger("core.async_client")
+
+_loop = None
+_loop_thread = None
+_loop_pid = None  # Process that started the loop (the thread is not inherited across fork)
+_loop_lock = threading.Lock()
+_session = None  # Only touched on the loop
+
+
+# THE EVENT LOOP
+
+def get_loop():
+    """The process's Discourse event loop, started on first use (and again in a forked child)."""
+    global _loop, _loop_thread, _loop_pid, _session
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            _session = None
+            _loop_thread = threading.Thread(target=_loop.run_forever, daemon=True, name="discourse-io")
+            _loop_thread.start()
+            logger.info(f"Discourse event loop started | function: get_loop | pid: {_loop_pid} | max_connections: {DISCOURSE_ASYNC_MAX_CONNECTIONS}")
+        return _loop
+
+
+def submit(coro):
+    """Schedules `coro` on the Discourse loop; returns a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run(coro):
+    """Runs `coro` on the Discourse loop and waits for its result (from any thread but the loop's own)."""
+    return submit(coro).result()
+
+
+async def _next(async_iterator):
+    return await async_iterator.__anext__()
+
+
+async def _aclose(async_iterator):
+    await async_iterator.aclose()
+
+
+def iterate(async_iterator):
+    """Sync generator over an async generator that runs on the Discourse loop, one item at a time."""
+    try:
+        while True:
+            try:
+                item = run(_next(async_iterator))
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        closed = submit(_aclose(async_iterator))  # Cancels the pages still in flight when the caller stops early
+        if threading.current_thread() is not _loop_thread:
+            closed.result()
+
+
+async def _on_request_start(session, trace_context, params):
+    trace_context.host = params.url.host
+    _record_request(trace_context.host)
+
+
+async def _on_connection_create_start(session, trace_context, params):
+    trace_context.connect_started_at = time.perf_counter()
+
+
+async def _on_connection_create_end(session, trace_context, params):
+    _record_new_connection(trace_context.host)
+    _record_connect_time(trace_context.host, time.perf_counter() - trace_context.connect_started_at)
+
+
+async def _get_session():
+    """
+    The loop's aiohttp session. Keep-alive connections are pooled, capped at
+    DISCOURSE_ASYNC_MAX_CONNECTIONS; requests beyond that wait for a free connection.
+    Requests and new connections are counted in core.http_client's per-host statistics.
+    """
+    global _session
+    if _session is None or _session.closed:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(_on_request_start)
+        trace_config.on_connection_create_start.append(_on_connection_create_start)
+        trace_config.on_connection_create_end.append(_on_connection_create_end)
+        connector = aiohttp.TCPConnector(limit=DISCOURSE_ASYNC_MAX_CONNECTIONS, limit_per_host=DISCOURSE_ASYNC_MAX_CONNECTIONS)
+        timeout = aiohttp.ClientTimeout(sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_READ_TIMEOUT)
+        _session = aiohttp.ClientSession(connector=connector, timeout=timeout, raise_for_status=False, trace_configs=[trace_config])
+    return _session
+
+
+async def _close_session():
+    if _session is not None and not _session.closed:
+        await _session.close()
+
+
+@atexit.register
+def _shutdown():
+    if _loop is not None and _loop_pid == os.getpid() and _loop.is_running():
+        try:
+            submit(_close_session()).result(timeout=5)
+        except Exception:
+            pass  # Exiting anyway
+
+
+# QUERY PAGES
+
+async def _alert(reason, details):
+    # The alert webhook is posted with the sync client; keep it off the event loop
+    await asyncio.to_thread(_alert_developer_of_reset_failure, reason, details)
+
+
+async def _wait_for_token(limiter):
+    delay = limiter.reserve()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+
+async def _fetch_page(query_id, query_params, page, logger):
+    """
+    Fetch and parse one page of a Discourse query.
+
+    Every attempt first takes a token from the shared rate limiter. On a 429 the
+    limiter is told to slow down for the server's `Retry-After` (or a linear
+    fallback backoff), and the page is retried up to DISCOURSE_MAX_429_RETRIES times.
+    Other HTTP/request errors are raised to the caller.
+    """
+    request_url = f"{DISCOURSE_BASE_URL}/g/{GROUP_NAME}/reports/{query_id}/run"
+    data_payload = _build_request_payload(query_params, page)
+    headers = {
+        "Accept": "*/*",
+        "Api-Key": API_KEY,
+        "Api-Username": API_USERNAME,
+        "Content-Type": "multipart/form-data"
+    }
+    limiter = get_discourse_rate_limiter()
+    session = await _get_session()
+
+    for attempt in range(DISCOURSE_MAX_429_RETRIES + 1):
+        await _wait_for_token(limiter)
+        logger.debug(f"Fetching page {page} | params: {query_params}", extra={"query_id": query_id, "page": page, "attempt": attempt})
+        async with session.post(request_url, data=data_payload, headers=headers) as response:
+            if response.status != 429:
+                response.raise_for_status()  # aiohttp.ClientResponseError for other bad responses
+                body = await response.read()
+                limiter.on_success()
+                return await asyncio.to_thread(json.loads, body)  # Pages are large; parse them off the loop
+            retry_after_header = response.headers.get("Retry-After")
+
+        if attempt == DISCOURSE_MAX_429_RETRIES:
+            logger.error(
+                f"Rate limited (429) after {DISCOURSE_MAX_429_RETRIES} retries",
+                extra={"query_id": query_id, "page": page, "params_provided": bool(query_params)},
+            )
+            await _alert(
+                "Rate limiting",
+                f"function: execute_discourse_query | query_id: {query_id} | page: {page} | params: {query_params} | error: 429 Too Many Requests"
+            )
+            raise DiscourseRateLimitError(
+                f"**********\nStopping execution due to persistent rate limiting\nERROR: 429 Too Many Requests for query_id = {query_id}\nQUERY_PARAMS = {query_params}\nMax retries ({DISCOURSE_MAX_429_RETRIES}) exceeded\n**********"
+            )
+        delay = parse_retry_after(retry_after_header, default=DISCOURSE_DEFAULT_RETRY_AFTER * (attempt + 1))
+        logger.warning(
+            f"Rate limited (429), retrying after {delay}s (attempt {attempt + 1}/{DISCOURSE_MAX_429_RETRIES})",
+            extra={"query_id": query_id, "page": page, "retry_attempt": attempt + 1, "delay_seconds": delay},
+        )
+        limiter.on_rate_limited(delay)  # Pauses every caller, not just this page
+
+
+async def _fetch_page_cached(query_id, query_params, page, logger, crawl_stamp=None):
+    """
+    Return `(json_response, crawl_stamp)` for one page, serving it from the on-disk
+    cache when possible. Cache hits do not take a rate-limiter token.
+    """
+    cached = await asyncio.to_thread(query_cache.lookup, query_id, query_params, page, crawl_stamp=crawl_stamp)
+    if cached is not None:
+        return cached
+    json_response = await _fetch_page(query_id, query_params, page, logger)
+    crawl_stamp = await asyncio.to_thread(query_cache.store, query_id, query_params, page, json_response, crawl_stamp=crawl_stamp)
+    return json_response, crawl_stamp
+
+
+async def _iter_json_pages(query_id, query_params, logger, max_pages=None):
+    """
+    Yield `(page, json_response)` for every non-empty page, in page order.
+
+    Up to DISCOURSE_MAX_PAGES_IN_FLIGHT pages are fetched concurrently (all through
+    the shared rate limiter). The window starts at one page and widens while pages
+    keep coming back full, so single-page queries never pay for speculative requests.
+    Fetching stops on the first empty page, or on a page shorter than the first one
+    (which can only be the last page).
+    """
+    max_in_flight = max(1, DISCOURSE_MAX_PAGES_IN_FLIGHT)
+    tasks = {}  # page -> Task
+    next_page_to_submit = 0
+    next_page_to_yield = 0
+    window = 1
+    full_page_size = None
+    last_page = max_pages - 1 if max_pages is not None else None  # Last page we may still need; None = unknown
+    crawl_stamp = None  # Set by page 0; later pages are only served from cache if they belong to the same crawl
+
+    def submit_until_window_full():
+        nonlocal next_page_to_submit
+        while len(tasks) < window and (last_page is None or next_page_to_submit <= last_page):
+            tasks[next_page_to_submit] = asyncio.create_task(_fetch_page_cached(query_id, query_params, next_page_to_submit, logger, crawl_stamp))
+            next_page_to_submit += 1
+
+    try:
+        submit_until_window_full()
+        while tasks:
+            json_response, page_stamp = await tasks.pop(next_page_to_yield)  # Errors propagate to the caller, which decides how to stop
+            if next_page_to_yield == 0:
+                crawl_stamp = page_stamp  # The window is one page wide until page 0 is back, so no page was submitted without it
+
+            if json_response["result_count"] == 0:
+                logger.warning(f"Query returned zero results | function: execute_discourse_query | query_id: {query_id} | params_provided: {query_params} | page: {next_page_to_yield}", extra={"query_id": query_id, "page": next_page_to_yield})
+                break
+
+            rows_on_page = len(json_response["rows"])
+            if full_page_size is None:
+                full_page_size = rows_on_page
+            elif rows_on_page < full_page_size:
+                last_page = next_page_to_yield  # A short page is the last one; don't wait for an empty page
+
+            yield next_page_to_yield, json_response
+            next_page_to_yield += 1
+            if last_page is not None and next_page_to_yield > last_page:
+                break
+            window = min(window * 2, max_in_flight)
+            submit_until_window_full()
+    finally:
+        for pending in tasks.values():
+            pending.cancel()  # Speculative pages beyond the end
+        if tasks:
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+async def iter_discourse_query_pages_async(query_id, query_params=None, partial_ok=False):
+    """
+    Stream a Discourse query one decoded page at a time (semantics of
+    core.execute_query.iter_discourse_query_pages, which runs this on the loop).
+    """
+    logger = _get_query_logger(query_id)
+
+    match query_id:
+        case 103: logger.info("Executing query_103 for course-specific user actions", extra={"params_provided": bool(query_params)})
+        case 102: logger.info("Executing query_102 for overall discourse engagement", extra={"params_provided": bool(query_params)})
+        case 107: logger.info("Executing query_107 for fetching category IDs")
+        case 108: logger.info("Executing query_108 for userid-name mapping")
+        case _: raise ValueError("INVALID DISCOURSE QUERY-ID")
+
+    if query_params is not None and not isinstance(query_params, dict):
+        raise ValueError("Query parameters must be a dictionary.")
+
+    pages_fetched = 0
+    rows_fetched = 0
+    start_time = time.perf_counter()
+    max_pages = 1 if env == "dev" else None  # Dev mode only ever looks at the first page
+
+    try:
+        async for page, json_response in _iter_json_pages(query_id, query_params, logger, max_pages=max_pages):
+            page_df = await asyncio.to_thread(decode_page, query_id, json_response['columns'], json_response['rows'])  # Typed, column-wise decode
+            del json_response  # Drop the decoded JSON before handing the page out
+            pages_fetched = page + 1
+            rows_fetched += len(page_df)
+            yield page_df
+    except aiohttp.ClientResponseError as e:  # HTTP errors other than 429
+        logger.exception(
+            f"HTTP error while executing query | function: execute_discourse_query | query_id: {query_id} | params_provided: {query_params}",
+            extra={"query_id": query_id, "page": pages_fetched, "params_provided": bool(query_params), "status_code": e.status},
+        )
+        await _alert(
+            "HTTP error",
+            f"function: execute_discourse_query | query_id: {query_id} | page: {pages_fetched} | params: {query_params} | status_code: {e.status} | error: {e}"
+        )  # Pagination stops on non-429 errors
+        if not partial_ok:
+            raise DiscourseQueryError(f"query {query_id} stopped at page {pages_fetched} on HTTP {e.status}") from e
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:  # Connection errors, timeouts, etc.
+        logger.exception(
+            f"Request error while executing query | function: execute_discourse_query | query_id: {query_id} | params_provided: {query_params} | page: {pages_fetched}",
+            extra={"query_id": query_id, "page": pages_fetched, "params_provided": bool(query_params)},
+        )
+        await _alert(
+            "Request error",
+            f"function: execute_discourse_query | query_id: {query_id} | page: {pages_fetched} | params: {query_params} | error: {e!r}"
+        )
+        if not partial_ok:
+            raise DiscourseQueryError(f"query {query_id} stopped at page {pages_fetched} on a request error: {e!r}") from e
+    except DiscourseRateLimitError:
+        raise  # Persistent rate limiting: already logged and alerted in _fetch_page
+    except Exception as e:
+        logger.exception(
+            f"Unexpected error while executing query | function: execute_discourse_query | query_id: {query_id} | params_provided: {query_params} | page: {pages_fetched}",
+            extra={"query_id": query_id, "page": pages_fetched, "params_provided": bool(query_params)},
+        )
+        await _alert(
+            "Unexpected error",
+            f"function: execute_discourse_query | query_id: {query_id} | page: {pages_fetched} | params: {query_params} | error: {e}"
+        )
+        if not partial_ok:
+            raise DiscourseQueryError(f"query {query_id} stopped at page {pages_fetched} on an unexpected error: {e}") from e
+
+    duration = time.perf_counter() - start_time
+    logger.info(
+        "Completed query",
+        extra={"query_id": query_id, "rows": rows_fetched, "pages": pages_fetched, "duration_sec": round(duration, 2)},
+    )
+
+
+async def execute_discourse_query_async(query_id, query_params=None, partial_ok=False):
+    """Run a Discourse query (102, 103, 107 or 108) and return all of its pages as one DataFrame."""
+    frames = [page_df async for page_df in iter_discourse_query_pages_async(query_id, query_params, partial_ok=partial_ok)]
+    return await asyncio.to_thread(concat_frames, frames)
+
+
+async def gather_discourse_queries(queries):
+    """
+    Run several queries concurrently and return their DataFrames in the same order.
+
+    Args:
+        queries (list[tuple[int, dict | None]]): `(query_id, query_params)` pairs.
+    """
+    return await asyncio.gather(*(execute_discourse_query_async(query_id, query_params) for query_id, query_params in queries))
+
+
+# USER SUMMARIES
+
+async def get_user_summary_async(user_name):
+    """
+    summary.json of one user, or {"error", "status_code"} on failure (503 when no
+    rate-limiter token is free within USER_SUMMARY_MAX_WAIT_SECONDS).
+    """
+    url = f"{DISCOURSE_BASE_URL}/u/{user_name}/summary.json"
+    headers = {
+        "Api-Key": API_KEY,
+        "Api-Username": API_USERNAME
+    }
+
+    limiter = get_discourse_rate_limiter()
+    # Shares the Discourse quota with the background loader, but a request never waits out
+    # a reset's backlog or a long Retry-After pause
+    delay = limiter.reserve(max_delay=USER_SUMMARY_MAX_WAIT_SECONDS)
+    if delay is None:
+        return {"error": "Discourse rate limit reached, try again shortly", "status_code": 503}
+    await asyncio.sleep(delay)
+    session = await _get_session()
+    async with session.get(url, headers=headers) as response:
+        if response.status == 429:
+            limiter.on_rate_limited(parse_retry_after(response.headers.get("Retry-After"), default=DISCOURSE_DEFAULT_RETRY_AFTER))
+        elif response.status == 200:
+            limiter.on_success()
+        if response.status != 200:
+            return {"error": f"Failed to fetch data for user_id: {user_name}", "status_code": response.status}
+        return await response.json(content_type=None)
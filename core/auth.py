@@ -3,6 +3,8 @@ import os
 from flask import url_for, redirect, session, request, flash, jsonify
 from authlib.integrations.flask_client import OAuth
 from functools import wraps
+import hmac
+from application.constants import ADMIN_EMAILS, ADMIN_API_TOKEN
 
 def login_required(f):
     @wraps(f)
@@ -20,6 +22,22 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def admin_required(f):
+    """Allows only the Google accounts in ADMIN_EMAILS, or requests carrying "Authorization: Bearer <ADMIN_API_TOKEN>"."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        auth_header = request.headers.get("Authorization", "")
+        if ADMIN_API_TOKEN and auth_header.startswith("Bearer ") and hmac.compare_digest(auth_header[len("Bearer "):], ADMIN_API_TOKEN):
+            return f(*args, **kwargs)
+        email = (session.get('user') or {}).get('email', '').lower()
+        if not email or email not in ADMIN_EMAILS:
+            return jsonify({
+                "error": "forbidden",
+                "message": "Admin access required"
+            }), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 def init_oauth(app):
     """
     Create OAuth(app) and register the Google provider.
@@ -1,13 +1,20 @@
 import pandas as pd
-from core.utils import sanitize_filepath, get_current_trimester, get_previous_trimesters, is_trimester_start_today
+from core.utils import sanitize_filepath, get_current_trimester, get_previous_trimesters, get_trimester_dates, is_trimester_start_today
 from datetime import datetime
 from core.logging_config import get_logger
 from itertools import chain
-import copy
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple
+from flask import g, has_request_context
 from application.constants import (
     irrelevant_categories,
-    weights_dict_for_overall_engagement,
-    env,
+    COURSE_QUERY_BATCH_SIZE,
+    REFRESH_WORKERS,
+    QUERY_108_MIN_USER_ID_PARAM,
+    DATA_ROLE,
+    ARROW_STORE_POLL_SECONDS,
     foundation_courses,
     diploma_programming_courses,
     diploma_data_science_courses,
@@ -17,58 +24,104 @@ from application.constants import (
     L5_degree_courses,
 )
 from core.execute_query import execute_discourse_query
+from core.query_schemas import concat_frames
 from processors.course_data_processors import (
-    create_raw_metrics_dataframe,
-    create_unnormalized_scores_dataframe,
-    create_log_normalized_scores_dataframe,
+    count_user_actions,
+    add_user_action_counts,
+    subtract_user_action_counts,
+    score_frames_from_counts,
+    iter_user_actions_by_category,
 )
 from processors.overall_discourseData_processors import (
-    create_log_normalized_scores_dataframe_for_all_users,
-    create_unnormalized_scores_dataframe_for_all_users,
+    WINDOW_COLUMNS,
+    days_to_refresh,
+    get_overall_window_metrics,
+    overall_dataframes_from_windows,
+    parse_query_date,
+    replace_window_partitions,
 )
 from core.utils import _alert_developer_of_reset_failure
+from core.http_client import log_connection_stats
+from core.reset_checkpoint import ResetCheckpoint
+from core.webhook_ingest import ingest_lock, take_ingested_rows, clear_ingested_rows, export_ingested_rows, import_ingested_rows
+from core.snapshot import write_snapshot, load_latest_snapshot
+from core.arrow_store import publish_generation, current_generation
+from core.action_merge import append_unseen_rows, drop_rows, fetch_start_date
+import core.dimensions as dimensions
+from core.dimensions import encode_user_actions
+from core.term_table import TermTable, ACTION_COUNTS_KEY, merge_copy
 
 logger = get_logger("core.data_loader")
 
-# Global state (initialized by init_minimal_data / background_load_user_actions)
-user_actions_dictionaries = {}
-df_map_category_to_id = None
-id_username_mapping = None
-user_actions_loaded = False
-last_refresh_date = datetime.now().strftime("%d-%m-%Y")
-uncategorized_courses = []  # New global list to store uncategorized courses
-
-# Backup state for fallback on full_system_reset failure
-# Stores previous state so users can access old data if reset fails
-_backup_user_actions_dictionaries = None
-_backup_df_map_category_to_id = None
-_backup_id_username_mapping = None
-_backup_last_refresh_date = None
-_backup_uncategorized_courses = None  # NEW: backup for uncategorized list
+class DataGeneration(NamedTuple):
+    """
+    One complete state of the loaded data. A generation is never modified after it is published:
+    the loaders build the next one on the side (see _shadow_copy) and publish it with
+    publish_data_generation, which swaps the single `_generation` reference.
+    """
+    version: int
+    user_actions_dictionaries: dict  # {term: TermTable} (core/term_table.py)
+    df_map_category_to_id: pd.DataFrame | None
+    id_username_mapping: pd.DataFrame | None
+    last_refresh_date: str  # dd-mm-yyyy; the next refresh fetches from this date
+    uncategorized_courses: list
+    user_actions_loaded: bool  # Every unit of the load has finished
+    ready_units: frozenset = frozenset()  # (term, course) and (term, "overall") slots already filled while the first load runs
+    load_progress: dict | None = None  # started_at, units_total, units_restored, units_failed of the running first load
+
+
+# Global state: the published generation (replaced by init_minimal_data, background_load_user_actions, refreshes and resets)
+_generation = DataGeneration(
+    version=0,
+    user_actions_dictionaries={},
+    df_map_category_to_id=None,
+    id_username_mapping=None,
+    last_refresh_date=datetime.now().strftime("%d-%m-%Y"),
+    uncategorized_courses=[],
+    user_actions_loaded=False,
+)
 
 # Flag to indicate full system reset failure - used by alerting mechanism
 system_reset_failed = False
 system_reset_failure_reason = None
+_reset_lock = threading.Lock()  # Only one full system reset (scheduled or resumed) at a time
 
 # DATA LOADER FUNCTIONS
-def load_user_actions_dictionaries():
+def load_user_actions_dictionaries(checkpoint=None, df_map_category_to_id=None, progress=None):
     from core.data_processor import get_all_data_dicts
 
-    data_dicts = get_all_data_dicts()
+    data_dicts = get_all_data_dicts(checkpoint=checkpoint, df_map_category_to_id=df_map_category_to_id, progress=progress)
     return data_dicts
 
 
+def open_reset_checkpoint():
+    """Checkpoint of the full load for the current and previous 2 terms (see core/reset_checkpoint.py)."""
+    return ResetCheckpoint(get_previous_trimesters(get_current_trimester())[:3])
+
+
+def _finish_checkpoint(checkpoint, context):
+    """
+    Clears the checkpoint after a load that finished every unit. Otherwise keeps it, so the next
+    load (restart or resume_full_system_reset) only fetches the failed units, and returns a failure reason.
+    """
+    failed_units = checkpoint.failed_units()
+    if not failed_units:
+        checkpoint.clear()
+        return None
+    reason = f"{len(failed_units)} load units failed (first: {next(iter(failed_units))}); finished units are checkpointed, use resume to fetch only the missing ones"
+    logger.error(f"Load finished with failed units | function: {context} | failed_units: {len(failed_units)} | completed_units: {len(checkpoint.completed_units())} | units: {list(failed_units)[:20]}")
+    return reason
+
+
 def load_df_map_category_to_id():
-    global uncategorized_courses
+    # In dev mode this is a read from the on-disk query cache, whose entries never expire there (core/query_cache.py)
+    df_map_category_to_id = execute_discourse_query(query_id=107, query_params=None)
+    df_map_category_to_id = df_map_category_to_id[~df_map_category_to_id["category_id"].isin(irrelevant_categories)]
+    return df_map_category_to_id
 
-    
-    if env == "dev":
-        df_map_category_to_id = pd.read_csv("TRASH/data/df_map_category_to_id.csv")
-        df_map_category_to_id = df_map_category_to_id[~df_map_category_to_id["category_id"].isin(irrelevant_categories)]
-    else:
-        df_map_category_to_id = execute_discourse_query(query_id=107, query_params=None)
-        df_map_category_to_id = df_map_category_to_id[~df_map_category_to_id["category_id"].isin(irrelevant_categories)]
 
+def find_uncategorized_courses(df_map_category_to_id):
+    """Courses of query 107 that are in none of the course lists of application/constants.py."""
     # Create union of all known courses (case-insensitive)
     all_known_courses = set(
         course.strip().lower()
@@ -90,76 +143,361 @@ def load_df_map_category_to_id():
         if row.name.strip().lower() not in all_known_courses
     ]
 
-    logger.info(f"Found {len(uncategorized_courses)} uncategorized courses | function: load_df_map_category_to_id")
-
-    return df_map_category_to_id
+    logger.info(f"Found {len(uncategorized_courses)} uncategorized courses | function: find_uncategorized_courses")
+    return uncategorized_courses
 
 
 def load_id_username_mapping():
     from core.execute_query import execute_discourse_query
 
-    if env == "dev":
-        df = pd.read_csv("TRASH/data/id_username_mapping.csv")  # FOR TESTING ONLY
-    else:
-        df = execute_discourse_query(query_id=108, query_params=None)
+    df = execute_discourse_query(query_id=108, query_params=None)  # Served from the query cache in dev mode
     return df
 
 
+def sync_id_username_mapping(id_username_mapping):
+    """
+    Incremental sync of the id -> username mapping.
+
+    Users are only ever added, so instead of the full query 108 crawl this asks only for
+    users above the highest known user_id and returns the mapping with them appended.
+    Falls back to the full load when no mapping is held yet.
+    """
+    if id_username_mapping is None or id_username_mapping.empty:
+        return load_id_username_mapping()
+    highest_known_user_id = int(id_username_mapping["user_id"].max())
+    new_users_df = execute_discourse_query(query_id=108, query_params={QUERY_108_MIN_USER_ID_PARAM: str(highest_known_user_id)})
+    if new_users_df.empty:
+        logger.info(f"No new users | function: sync_id_username_mapping | highest_known_user_id: {highest_known_user_id}")
+        return id_username_mapping
+
+    new_users_df = new_users_df[new_users_df["user_id"] > highest_known_user_id]  # In case the query ignores the parameter
+    id_username_mapping = concat_frames([id_username_mapping, new_users_df]).drop_duplicates(subset="user_id", keep="last").reset_index(drop=True)
+    logger.info(f"User mappings synced | function: sync_id_username_mapping | new_users: {len(new_users_df)} | users: {len(id_username_mapping)}")
+    return id_username_mapping
+
+
+def publish_data_generation(publish_readers=True, **changes):
+    """
+    Publishes a new generation: the current one with `changes` (DataGeneration fields) applied.
+
+    The swap is a single reference assignment, so readers see either the old or the new state,
+    never a mix. Requests that pinned the old generation keep it until they finish; it is freed
+    once no request holds it. Callers that derive the new state from the current one hold
+    ingest_lock, so concurrent updates (refresh, reset, webhook flush) are not lost.
+    With publish_readers=False the reader processes are not sent this generation (yet).
+    """
+    global _generation
+    _generation = _generation._replace(version=_generation.version + 1, **changes)
+    logger.info(f"Data generation published | function: publish_data_generation | version: {_generation.version} | changed: {sorted(changes)}")
+    if publish_readers:
+        publish_arrow_generation()
+    return _generation
+
+
+def _shadow_copy(user_actions_dictionaries):
+    """
+    New {term: TermTable} dict over the same term tables, to build the next generation in. Sharing
+    them is safe because they are immutable: updates replace a term with TermTable.with_slots.
+    """
+    return dict(user_actions_dictionaries)
+
+
+def _course_categories(df_map_category_to_id):
+    """{course: category_id} of the courses of query 107 (course names as used for the term slots)."""
+    return {sanitize_filepath(row.name).lower(): int(row.category_id) for row in df_map_category_to_id.itertuples()}
+
+
 def init_minimal_data():
-    global df_map_category_to_id, id_username_mapping, user_actions_dictionaries
     df_map_category_to_id = load_df_map_category_to_id()  # ~1 min
     id_username_mapping = load_id_username_mapping()      # ~1 min
 
     # Create empty placeholders based on category IDs and current terms
     current_and_prev_terms = get_previous_trimesters(get_current_trimester())[:3]
-    user_actions_dictionaries = {
-        term: {
-            sanitize_filepath(row.name).lower(): {
-                "user_actions_df": pd.DataFrame(),
-                "raw_metrics": pd.DataFrame(),
-                "unnormalized_scores": pd.DataFrame(),
-                "log_normalized_scores": pd.DataFrame()
-            } for row in df_map_category_to_id.itertuples()
-        }
-        for term in current_and_prev_terms
-    }
+    user_actions_dictionaries = {term: TermTable(_course_categories(df_map_category_to_id)) for term in current_and_prev_terms}  # Empty course partitions
     logger.info(f"Initialized data structures | function: init_minimal_data | terms: {list(user_actions_dictionaries.keys())}")
+    publish_data_generation(  # Readers in other processes get the course list while the full load runs
+        user_actions_dictionaries=user_actions_dictionaries,
+        df_map_category_to_id=df_map_category_to_id,
+        id_username_mapping=id_username_mapping,
+        uncategorized_courses=find_uncategorized_courses(df_map_category_to_id),
+    )
     return df_map_category_to_id, id_username_mapping, user_actions_dictionaries
 
 
+def save_snapshot():
+    """Persists the published generation as a versioned Parquet snapshot (see core/snapshot.py)."""
+    generation = _generation
+    return write_snapshot({
+        "user_actions_dictionaries": generation.user_actions_dictionaries,
+        "df_map_category_to_id": generation.df_map_category_to_id,
+        "id_username_mapping": generation.id_username_mapping,
+        "last_refresh_date": generation.last_refresh_date,
+        "uncategorized_courses": generation.uncategorized_courses,
+        "webhook_rows": export_ingested_rows(),
+        "users": dimensions.users.frame(),
+        "topics": dimensions.topics.frame(),
+    })
+
+
+def publish_arrow_generation():
+    """
+    In the "loader" role, publishes the current generation to the "reader" worker processes,
+    which memory-map it (see core/arrow_store.py). No-op in the other roles.
+    """
+    if DATA_ROLE != "loader":
+        return None
+    generation = _generation
+    return publish_generation({
+        "user_actions_dictionaries": generation.user_actions_dictionaries,
+        "df_map_category_to_id": generation.df_map_category_to_id,
+        "id_username_mapping": generation.id_username_mapping,
+        "last_refresh_date": generation.last_refresh_date,
+        "uncategorized_courses": generation.uncategorized_courses,
+        "user_actions_loaded": generation.user_actions_loaded,
+        "ready_units": sorted(generation.ready_units),
+        "load_progress": generation.load_progress,
+        "reset_status": dict(get_system_reset_status(), reset_running=False),  # Published when a load/reset has finished
+        "users": dimensions.users.frame(),
+        "topics": dimensions.topics.frame(),
+    })
+
+
+def warm_start():
+    """
+    Publishes the latest valid snapshot as the first generation instead of the ~30 min cold load.
+    Only an incremental refresh from last_refresh_date is needed afterwards.
+
+    Returns:
+        bool: False when there is no usable snapshot, or it does not hold the current trimester
+        (the app was down over a trimester start); the caller then does a cold load.
+    """
+    state = load_latest_snapshot()
+    if state is None:
+        return False
+    if get_current_trimester() not in state["user_actions_dictionaries"]:
+        logger.warning(f"Snapshot predates the current trimester, cold start instead | function: warm_start | version: {state['version']} | terms: {list(state['user_actions_dictionaries'])}")
+        return False
+
+    dimensions.load_dimensions(state["users"], state["topics"])
+    user_actions_dictionaries = state["user_actions_dictionaries"]
+    import_ingested_rows({unit: encode_user_actions(df) for unit, df in state["webhook_rows"].items()})
+    publish_data_generation(
+        user_actions_dictionaries=user_actions_dictionaries,
+        df_map_category_to_id=state["df_map_category_to_id"],
+        id_username_mapping=state["id_username_mapping"],
+        last_refresh_date=state["last_refresh_date"],
+        uncategorized_courses=state["uncategorized_courses"],
+        user_actions_loaded=True,
+    )
+    logger.info(f"Warm start from snapshot | function: warm_start | version: {state['version']} | last_refresh_date: {state['last_refresh_date']} | terms: {list(state['user_actions_dictionaries'])}")
+    return True
+
+
+class ProgressiveLoad:
+    """
+    Publishes the (term, course) and overall slots of the first load as they land (passed to
+    get_all_data_dicts as `progress`), so their charts can be served before the whole load has
+    finished, and tracks the progress for /loading-status. Slots landing within
+    ARROW_STORE_POLL_SECONDS of the last publish are batched, so each term table is rebuilt at
+    most once per interval instead of once per unit.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.units_total = 0
+        self.units_restored = 0
+        self.units_failed = 0
+        self.categories = {}  # {term: {course: category_id}}
+        self._lock = threading.Lock()
+        self._pending_slots = {}  # {term: {slot_name: slot}} landed since the last publish
+        self._published_at = 0.0
+        self._flush_timer = None
+        self._closed = False
+
+    def as_dict(self):
+        return {"started_at": self.started_at, "units_total": self.units_total, "units_restored": self.units_restored, "units_failed": self.units_failed}
+
+    def planned(self, units_total, categories):
+        self.units_total = units_total
+        self.categories = categories
+        with ingest_lock:
+            publish_data_generation(load_progress=self.as_dict())
+
+    def unit_loaded(self, term, slot_name, slot, restored=False):
+        self.units_restored += restored
+        with self._lock:
+            self._pending_slots.setdefault(term, {})[slot_name] = dict(slot)
+            wait_sec = self._published_at + ARROW_STORE_POLL_SECONDS - time.monotonic()  # Readers would not pick up more often anyway
+            if wait_sec > 0:
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(wait_sec, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+        self.flush()
+
+    def flush(self):
+        """Publishes the slots landed since the last publish, rebuilding each of their terms once."""
+        with self._lock:
+            pending_slots, self._pending_slots = self._pending_slots, {}
+            self._flush_timer = None
+            self._published_at = time.monotonic()
+        if not pending_slots:
+            return
+        with ingest_lock:
+            if self._closed:  # The finished load has been published already
+                return
+            user_actions_dictionaries = _shadow_copy(_generation.user_actions_dictionaries)
+            for term, slots in pending_slots.items():
+                term_table = user_actions_dictionaries.get(term) or TermTable({})
+                user_actions_dictionaries[term] = term_table.with_slots(slots, self.categories.get(term))
+            publish_data_generation(
+                user_actions_dictionaries=user_actions_dictionaries,
+                ready_units=_generation.ready_units | {(term, slot_name) for term, slots in pending_slots.items() for slot_name in slots},
+                load_progress=self.as_dict(),
+            )
+
+    def close(self):
+        """Drops the slots not published yet; called (holding ingest_lock) before the finished load is published."""
+        self._closed = True
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+            self._pending_slots = {}
+
+    def unit_failed(self, term, slot_name):
+        self.units_failed += 1  # Stays "loading" until the load ends; a resume can still fetch it
+
+
 def background_load_user_actions():
-    global user_actions_dictionaries, user_actions_loaded
-    logger.info(f"Starting data loading | function: background_load_user_actions | user_actions_loaded_before: {user_actions_loaded}")
+    logger.info(f"Starting data loading | function: background_load_user_actions | user_actions_loaded_before: {_generation.user_actions_loaded}")
     logger.info(f"Background loading started | function: background_load_user_actions")
-    user_actions_dictionaries = load_user_actions_dictionaries()  # ~30 min
-    user_actions_loaded = True
-    logger.info(f"Background loading completed | function: background_load_user_actions | user_actions_loaded_after: {user_actions_loaded}")
+    checkpoint = open_reset_checkpoint()  # Resumes a load that was interrupted by a crash or restart
+    progress = ProgressiveLoad()
+    user_actions_dictionaries = load_user_actions_dictionaries(checkpoint=checkpoint, progress=progress)  # ~30 min; courses become servable one by one
+    _record_load_outcome(_finish_checkpoint(checkpoint, "background_load_user_actions"))
+    with ingest_lock:
+        progress.close()
+        publish_data_generation(user_actions_dictionaries=user_actions_dictionaries, user_actions_loaded=True, ready_units=frozenset(), load_progress=None)
+    save_snapshot()
+    logger.info(f"Background loading completed | function: background_load_user_actions | user_actions_loaded_after: {_generation.user_actions_loaded}")
     return user_actions_dictionaries
 
 
+def get_live_generation():
+    """
+    The latest published generation. In the "reader" role this is the latest Arrow generation
+    published by the loader process (nothing is fetched in a reader, so `_generation` stays empty there).
+    """
+    if DATA_ROLE == "reader":
+        return current_generation() or _generation
+    return _generation
+
+
+def get_data_generation():
+    """
+    The generation to read from. Within a request it is pinned on first use (flask.g), so all
+    getters of one request see the same complete state even if a new generation is published meanwhile.
+    """
+    if not has_request_context():
+        return get_live_generation()
+    if "data_generation" not in g:
+        g.data_generation = get_live_generation()
+    return g.data_generation
+
+
+def get_dimensions():
+    """
+    (UserDimension, TopicDimension) to join usernames and topic titles into the user actions
+    of the current generation (see core/dimensions.py).
+    """
+    return dimensions_of(get_data_generation())
+
+
+def dimensions_of(generation):
+    """(UserDimension, TopicDimension) of one generation (see get_dimensions)."""
+    if isinstance(generation, DataGeneration):
+        return dimensions.users, dimensions.topics  # Append-only, so they cover every generation of this process
+    return generation.dimensions
+
+
 def get_user_actions_loaded():
     """Helper function to check if user actions are loaded"""
-    return user_actions_loaded
+    return get_data_generation().user_actions_loaded
 
 
 def get_user_actions_dictionaries():
     """Helper function to get user actions dictionaries"""
-    return user_actions_dictionaries
+    return get_data_generation().user_actions_dictionaries
+
+
+def get_term_table(term):
+    """
+    One term's TermTable (core/term_table.py), or None: its long user_actions and action_counts
+    tables cover every course, for grouped work across courses.
+    """
+    return get_data_generation().user_actions_dictionaries.get(term)
 
 
 def get_df_map_category_to_id():
     """Helper function to get category mapping"""
-    return df_map_category_to_id
+    return get_data_generation().df_map_category_to_id
 
 
 def get_id_username_mapping():
     """Helper function to get username mapping"""
-    return id_username_mapping
+    return get_data_generation().id_username_mapping
 
 
 def get_uncategorized_courses():
     """Helper function to get uncategorized courses"""
-    return uncategorized_courses
+    return get_data_generation().uncategorized_courses
+
+
+def is_unit_ready(term, slot_name):
+    """Whether the charts of one course (or slot_name "overall") of a term can be served yet"""
+    generation = get_data_generation()
+    return generation.user_actions_loaded or (term, slot_name) in generation.ready_units
+
+
+def get_loading_status():
+    """
+    Progress of the first load, for /loading-status.
+
+    Returns:
+        dict: loaded (bool), progress (0..1), units_ready / units_total, eta_seconds (None while
+        unknown), and ready_overall: the terms whose overall charts can be served.
+    """
+    generation = get_data_generation()
+    if generation.user_actions_loaded:
+        return {"loaded": True, "progress": 1.0, "units_ready": None, "units_total": None, "eta_seconds": 0, "ready_overall": list(generation.user_actions_dictionaries)}
+
+    load_progress = generation.load_progress or {}
+    units_total = load_progress.get("units_total", 0)
+    units_ready = len(generation.ready_units)
+    units_done = units_ready + load_progress.get("units_failed", 0)
+    units_fetched = units_done - load_progress.get("units_restored", 0)  # Restored units took no time and would skew the rate
+    eta_seconds = None
+    if units_total and units_fetched > 0:
+        elapsed = time.time() - load_progress["started_at"]
+        eta_seconds = round(elapsed / units_fetched * max(units_total - units_done, 0))
+    return {
+        "loaded": False,
+        "progress": round(units_done / units_total, 3) if units_total else 0.0,
+        "units_ready": units_ready,
+        "units_total": units_total,
+        "eta_seconds": eta_seconds,
+        "ready_overall": sorted(term for term, slot_name in generation.ready_units if slot_name == "overall"),
+    }
+
+
+def _record_load_outcome(failure_reason):
+    """Sets the reset failure flags from the outcome of a checkpointed load and alerts on failure."""
+    global system_reset_failed, system_reset_failure_reason
+    system_reset_failed = failure_reason is not None
+    system_reset_failure_reason = failure_reason
+    if failure_reason is not None:
+        _alert_developer_of_reset_failure(alert_reason="Data load incomplete", error_message=failure_reason)
 
 
 def get_system_reset_status():
@@ -171,56 +509,23 @@ def get_system_reset_status():
             - 'reset_failed' (bool): Whether the last reset failed
             - 'failure_reason' (str): Error message if reset failed
             - 'requires_investigation' (bool): Whether developer action is needed
+            - 'reset_running' (bool): Whether a full system reset is in progress
     
     This can be used by frontend to show status alerts or by monitoring systems
     to trigger automatic escalations.
     """
+    if DATA_ROLE == "reader":
+        generation = current_generation()  # As of the loader's last publish
+        if generation is not None:
+            return dict(generation.metadata["reset_status"])
     return {
         'reset_failed': system_reset_failed,
         'failure_reason': system_reset_failure_reason,
-        'requires_investigation': system_reset_failed
+        'requires_investigation': system_reset_failed,
+        'reset_running': _reset_lock.locked(),
     }
 
 
-def _backup_current_state():
-    """
-    Create a backup of current data before full system reset.
-    
-    This is used as a fallback if the reset fails - allows users to continue
-    accessing old data instead of experiencing complete system downtime.
-    """
-    global user_actions_dictionaries, df_map_category_to_id, id_username_mapping, last_refresh_date, uncategorized_courses
-    global _backup_user_actions_dictionaries, _backup_df_map_category_to_id, _backup_id_username_mapping, _backup_last_refresh_date, _backup_uncategorized_courses
-    
-    # Deep copy current state to preserve it in case reset fails
-    _backup_user_actions_dictionaries = copy.deepcopy(user_actions_dictionaries)
-    _backup_df_map_category_to_id = df_map_category_to_id.copy() if df_map_category_to_id is not None else None
-    _backup_id_username_mapping = id_username_mapping.copy() if id_username_mapping is not None else None
-    _backup_last_refresh_date = last_refresh_date
-    _backup_uncategorized_courses = list(uncategorized_courses) if uncategorized_courses is not None else []  # NEW
-    logger.info("State backup created | function: _backup_current_state")
-
-
-def _restore_from_backup():
-    """
-    Restore data from backup in case full system reset fails.
-    
-    This ensures users can access old data instead of experiencing complete downtime.
-    The system will show old data while developers investigate the reset failure.
-    """
-    global user_actions_dictionaries, df_map_category_to_id, id_username_mapping, last_refresh_date, uncategorized_courses
-    global _backup_user_actions_dictionaries, _backup_df_map_category_to_id, _backup_id_username_mapping, _backup_last_refresh_date, _backup_uncategorized_courses
-    
-    user_actions_dictionaries = _backup_user_actions_dictionaries
-    df_map_category_to_id = _backup_df_map_category_to_id
-    id_username_mapping = _backup_id_username_mapping
-    last_refresh_date = _backup_last_refresh_date
-    uncategorized_courses = _backup_uncategorized_courses  # NEW
-    logger.info("State restored from backup | function: _restore_from_backup")
-
-
-
-
 def full_system_reset():
     """
     Perform a complete system reset - equivalent to application restart.
@@ -238,12 +543,19 @@ def full_system_reset():
     4. No stale or incremental data remains
     
     FAILURE HANDLING (Recommendation: Graceful degradation):
-    If reset fails:
-    1. Backup is restored so users see OLD data (no downtime)
-    2. user_actions_loaded is set to True (users can use old data)
-    3. system_reset_failed flag is set to True (indicates issue to frontend)
-    4. Developer is alerted via email/g-chat to investigate
-    5. System will retry reset on next trimester start date
+    The new mappings and user_actions_dictionaries are built on the side and published as one
+    new generation only when complete, so users keep seeing the current data during the reset
+    (no loading page) and no copy of it is needed. If reset fails:
+    1. Nothing is published; users keep the OLD data (no downtime)
+    2. system_reset_failed flag is set to True (indicates issue to frontend)
+    3. Developer is alerted via email/g-chat to investigate
+    4. Every finished (term, course) and overall unit is checkpointed on disk
+       (core/reset_checkpoint.py). resume_full_system_reset() (admin trigger
+       POST /admin/reset/resume) or a restart fetches only the missing units
+    
+    If only some units fail (e.g. one course keeps erroring), the new data is kept
+    with those courses empty, system_reset_failed is set and the checkpoint is kept
+    for a resume.
     
     This approach prioritizes user experience over having latest data:
     - Users see old data rather than loading message/downtime
@@ -251,36 +563,54 @@ def full_system_reset():
     - No cascade failures or partial state corruption
     
     Process mimics init_minimal_data() + background_load_user_actions():
-    - Backs up current state before starting
-    - Sets user_actions_loaded to False during reset (shows loading state)
     - Reloads all mappings and data structures
-    - Sets user_actions_loaded to True when complete
-    - Updates last_refresh_date to current date
+    - Publishes them, with last_refresh_date set to the current date, in one generation swap
     
-    Execution time: ~30 minutes (similar to app startup)
+    Execution time: ~30 minutes (similar to app startup); a resume only pays for the missing units
     """
-    global user_actions_dictionaries, df_map_category_to_id, id_username_mapping, user_actions_loaded, last_refresh_date
+    if not _reset_lock.acquire(blocking=False):
+        logger.warning("Full system reset already running - skipping | function: full_system_reset")
+        return False
+    try:
+        _full_system_reset()
+    finally:
+        _reset_lock.release()
+    return True
+
+
+def resume_full_system_reset():
+    """
+    Admin trigger: runs full_system_reset in a background thread, reusing the checkpoint of the
+    last failed or interrupted reset so only the missing units are fetched.
+
+    Returns:
+        bool: False if a reset is already running.
+    """
+    if DATA_ROLE == "reader":
+        logger.warning("Full system reset can only run in the loader process | function: resume_full_system_reset")
+        return False
+    if _reset_lock.locked():
+        return False
+    logger.info(f"Resume of full system reset requested | function: resume_full_system_reset | checkpointed_units: {len(open_reset_checkpoint().completed_units())}")
+    threading.Thread(target=full_system_reset, daemon=True, name="full-system-reset").start()
+    return True
+
+
+def _full_system_reset():
+    """Body of full_system_reset; the caller holds _reset_lock."""
     global system_reset_failed, system_reset_failure_reason
     
     logger.info("=" * 80)
     logger.info("TRIMESTER START DETECTED - INITIATING FULL SYSTEM RESET")
     logger.info("=" * 80)
     
-    # Step 0: Backup current state before attempting reset
-    # Recommendation: This allows graceful fallback if any step fails
-    logger.info("Step 0/4: Backing up current system state...")
-    _backup_current_state()
-    logger.info("Current system state backed up successfully | function: full_system_reset")
-    
-    # Set loading flag to False to prevent users from accessing incomplete data
-    # Recommendation: Keep user_actions_loaded=False during reset so users see maintenance message
-    user_actions_loaded = False
-    logger.info(f"User actions loading flag set to False | function: full_system_reset")
-    
+    # No backup and no loading page: everything below is built on the side, and users keep
+    # reading the published generation until the new one replaces it in Step 4
     try:
         # Step 1: Reload category-to-ID mapping (discovers new courses)
         logger.info("Step 1/4: Reloading course category mappings (Query #107)...")
         df_map_category_to_id = load_df_map_category_to_id()
+        uncategorized_courses = find_uncategorized_courses(df_map_category_to_id)
         logger.info(f"Course mappings reloaded | courses: {len(df_map_category_to_id)} | function: full_system_reset")
         
         # Step 2: Reload user ID-username mapping (discovers new users)
@@ -290,51 +620,44 @@ def full_system_reset():
         
         # Step 3: Rebuild all user actions data from scratch (Query #103, #102 for all trimesters)
         logger.info("Step 3/4: Rebuilding all user actions data from scratch...")
-        user_actions_dictionaries = load_user_actions_dictionaries()
+        checkpoint = open_reset_checkpoint()  # Units finished by an earlier failed/interrupted reset are read back, not refetched
+        user_actions_dictionaries = load_user_actions_dictionaries(checkpoint=checkpoint, df_map_category_to_id=df_map_category_to_id)
         logger.info(f"User actions data rebuilt | trimesters: {list(user_actions_dictionaries.keys())} | function: full_system_reset")
         
-        # Step 4: Update refresh date to today
+        # Step 4: Publish the new data with the refresh date set to today
         logger.info("Step 4/4: Finalizing reset...")
         last_refresh_date = datetime.now().strftime("%d-%m-%Y")
-        logger.info(f"Last refresh date updated | date: {last_refresh_date} | function: full_system_reset")
-        
-        # Set loading flag to True - system ready for use
-        user_actions_loaded = True
-        system_reset_failed = False
-        system_reset_failure_reason = None
-        logger.info(f"User actions loading flag set to True | function: full_system_reset")
-
-        # Explicitly clear backups to free memory (NEW)
-        global _backup_user_actions_dictionaries, _backup_df_map_category_to_id, _backup_id_username_mapping, _backup_last_refresh_date, _backup_uncategorized_courses
-        _backup_user_actions_dictionaries = None
-        _backup_df_map_category_to_id = None
-        _backup_id_username_mapping = None
-        _backup_last_refresh_date = None
-        _backup_uncategorized_courses = None
-        logger.info("Backup data cleared from memory | function: full_system_reset")
+        _record_load_outcome(_finish_checkpoint(checkpoint, "full_system_reset"))  # Keeps the checkpoint if some units failed
+        with ingest_lock:
+            clear_ingested_rows()  # Webhook rows of the old frames no longer need reconciling
+            publish_data_generation(
+                user_actions_dictionaries=user_actions_dictionaries,
+                df_map_category_to_id=df_map_category_to_id,
+                id_username_mapping=id_username_mapping,
+                last_refresh_date=last_refresh_date,
+                uncategorized_courses=uncategorized_courses,
+                user_actions_loaded=True,
+            )
+        logger.info(f"New data published | date: {last_refresh_date} | function: full_system_reset")
+        save_snapshot()
 
         logger.info("=" * 80)
-        logger.info("FULL SYSTEM RESET COMPLETED SUCCESSFULLY")
+        if system_reset_failed:
+            logger.warning(f"FULL SYSTEM RESET COMPLETED WITH MISSING UNITS - {system_reset_failure_reason}")
+        else:
+            logger.info("FULL SYSTEM RESET COMPLETED SUCCESSFULLY")
         logger.info("=" * 80)
     except Exception as e:
-        # Recommendation: On failure, restore backup and allow users to access old data
-        # This provides graceful degradation instead of complete system downtime
+        # Recommendation: On failure, users keep accessing old data
+        # Nothing was published, so the current generation is still complete and untouched
         logger.error(f"FULL SYSTEM RESET FAILED | error: {str(e)} | function: full_system_reset", exc_info=True)
         
-        # Step 1: Restore data from backup
-        logger.warning("Restoring previous system state from backup...")
-        _restore_from_backup()
-        
-        # Step 2: Allow users to access old data (don't leave system in loading state)
-        logger.warning("Setting user_actions_loaded=True to allow access to old data...")
-        user_actions_loaded = True
-        
-        # Step 3: Set failure flags for alerting and monitoring
+        # Step 1: Set failure flags for alerting and monitoring
         system_reset_failed = True
         system_reset_failure_reason = str(e)
         logger.warning(f"system_reset_failed flag set to True | reason: {system_reset_failure_reason}")
         
-        # Step 4: Alert developer to investigate
+        # Step 2: Alert developer to investigate
         logger.warning("Alerting development team about reset failure...")
         _alert_developer_of_reset_failure(alert_reason = "Full System Reset Failed", error_message = system_reset_failure_reason)
         
@@ -342,10 +665,129 @@ def full_system_reset():
         logger.error("FULL SYSTEM RESET FAILED - FALLBACK TO OLD DATA")
         logger.error(f"Reason: {system_reset_failure_reason}")
         logger.error("Users will see previous trimester data while developers investigate")
-        logger.error("System will attempt reset again on next trimester start date")
+        logger.error("Finished units are checkpointed - POST /admin/reset/resume (or a restart) continues from there")
         logger.error("=" * 80)
 
 
+def _course_action_counts(course_slot):
+    """
+    The per-user action counts behind a course's raw_metrics. Slots of a TermTable hold them
+    (ACTION_COUNTS_KEY) for their user_actions_df; a slot whose user_actions_df was replaced
+    otherwise gets them recounted from it.
+    """
+    stored = course_slot.get(ACTION_COUNTS_KEY)
+    if stored is not None and stored[0] is course_slot.get("user_actions_df"):
+        return stored[1]
+    user_actions_df = course_slot.get("user_actions_df")
+    return count_user_actions(user_actions_df) if user_actions_df is not None and not user_actions_df.empty else None
+
+
+def _merge_course_delta(course_slot, latest_user_actions_df, replaced_rows_df=None, from_query_103=True):
+    """
+    Merges newly fetched user actions into a course slot (a dict, e.g. a copy of a TermTable's slot)
+    and recalculates its metrics and scores.
+    Only rows the course does not hold yet are appended (matched by fingerprint, see core/action_merge.py).
+    `replaced_rows_df` (rows that came in through webhooks) are removed first, so the fetched rows take their place.
+    Rows fetched by query 103 (`from_query_103`) advance the course's watermark; webhook rows do not.
+
+    Raw metrics are updated additively: only the appended and removed rows are counted, and the
+    scores are re-derived from the updated counts.
+
+    Returns:
+        pd.DataFrame: The rows appended (empty if none).
+    """
+    action_counts = _course_action_counts(course_slot)
+    removed_rows_df = pd.DataFrame()
+    if replaced_rows_df is not None and not replaced_rows_df.empty:
+        removed_rows_df = drop_rows(course_slot, replaced_rows_df)
+    appended_rows_df = append_unseen_rows(course_slot, latest_user_actions_df, advance_watermark=from_query_103)
+    if removed_rows_df.empty and appended_rows_df.empty:
+        return appended_rows_df
+    if not removed_rows_df.empty:
+        action_counts = subtract_user_action_counts(action_counts, count_user_actions(removed_rows_df))
+    if not appended_rows_df.empty:
+        action_counts = add_user_action_counts(action_counts, count_user_actions(appended_rows_df))
+
+    if course_slot["user_actions_df"].empty or action_counts is None or action_counts.empty:
+        course_slot["raw_metrics"], course_slot["unnormalized_scores"], course_slot["log_normalized_scores"] = pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+        course_slot.pop(ACTION_COUNTS_KEY, None)
+        return appended_rows_df
+
+    course_slot["raw_metrics"], course_slot["unnormalized_scores"], course_slot["log_normalized_scores"] = score_frames_from_counts(action_counts)
+    course_slot[ACTION_COUNTS_KEY] = (course_slot["user_actions_df"], action_counts)
+    return appended_rows_df
+
+
+def _refresh_course_unit(term, course_slots, refreshed_slots, rows, start_date, end_date, ingested_rows):
+    """
+    Fetches the query-103 delta of one course (or, in batched mode, one batch of courses) and merges it
+    into a copy of the course's slot, which goes into refreshed_slots only once the merge succeeded.
+    Runs on a refresh pool worker; every course has its own slot, so no locking is needed.
+
+    Returns:
+        dict: {category_name: {"rows", "fetch_sec", "merge_sec"}}
+    """
+    fetch_start = time.perf_counter()
+    if len(rows) > 1:
+        # Batched mode: one 103 crawl per group of categories, split locally by category_id
+        latest_pages = {int(row.category_id): [] for row in rows}
+        for category_id, page_part in iter_user_actions_by_category(list(latest_pages), start_date, end_date):
+            latest_pages[category_id].append(page_part)
+        latest_frames = [(row, concat_frames(latest_pages.pop(int(row.category_id)))) for row in rows]
+    else:
+        query_params_for_103 = {"category_id": str(rows[0].category_id), "start_date": start_date, "end_date": end_date}
+        latest_frames = [(rows[0], encode_user_actions(execute_discourse_query(103, query_params=query_params_for_103)))]
+    fetch_sec = time.perf_counter() - fetch_start
+
+    timings = {}
+    for row, latest_user_actions_df in latest_frames:
+        category_name = sanitize_filepath(row.name).lower()
+        merge_start = time.perf_counter()
+        course_slot = dict(course_slots[category_name])
+        _merge_course_delta(course_slot, latest_user_actions_df, ingested_rows.get((term, category_name)))
+        refreshed_slots[category_name] = course_slot
+        timings[category_name] = {"rows": len(latest_user_actions_df), "fetch_sec": round(fetch_sec, 2), "merge_sec": round(time.perf_counter() - merge_start, 2)}
+        logger.info(f"Course data refreshed | function: refresh_all_data | course: {category_name} | start_date: {start_date} | rows: {len(latest_user_actions_df)} | fetch_sec: {timings[category_name]['fetch_sec']} | merge_sec: {timings[category_name]['merge_sec']}")
+    return timings
+
+
+def _refresh_overall_unit(term, term_table, refreshed_slots, last_refresh_date, today):
+    """
+    Re-fetches the overall engagement (query 102) of every day since the newest partition as one-day
+    partitions and re-derives the term totals. Runs on a refresh pool worker, like _refresh_course_unit.
+    """
+    fetch_start = time.perf_counter()
+    overall_slot = dict(term_table["overall"])
+    window_metrics = overall_slot["window_metrics"]
+    # From the newest partition (fetched part-way through its day), so days missed by a failed refresh are caught up
+    first_day = window_metrics["window_end"].max().date() if not window_metrics.empty else parse_query_date(last_refresh_date)
+    first_day = max(first_day, parse_query_date(get_trimester_dates(term)[0]))
+    days = days_to_refresh(window_metrics, first_day, parse_query_date(today))
+    windows = [(day, day) for day in days]
+    latest_window_metrics = get_overall_window_metrics(windows, domain="ds.study.iitm.ac.in")
+    fetch_sec = time.perf_counter() - fetch_start
+
+    merge_start = time.perf_counter()
+    window_metrics = replace_window_partitions(window_metrics, latest_window_metrics, windows)
+    overall_slot["raw_metrics"], overall_slot["unnormalized_scores"], overall_slot["log_normalized_scores"] = overall_dataframes_from_windows(window_metrics)
+    overall_slot["window_metrics"] = window_metrics
+    refreshed_slots["overall"] = overall_slot
+    logger.info(f"Overall engagement refreshed | function: refresh_all_data | days: {[day.isoformat() for day in days]} | partitions: {window_metrics[WINDOW_COLUMNS].drop_duplicates().shape[0] if not window_metrics.empty else 0}")
+    return {"overall": {"rows": len(latest_window_metrics), "fetch_sec": round(fetch_sec, 2), "merge_sec": round(time.perf_counter() - merge_start, 2)}}
+
+
+def _log_refresh_timings(timings, failed, duration_sec):
+    """Summary of one refresh: per-unit timings of the slowest units, totals and the failed units."""
+    slowest = sorted(timings.items(), key=lambda item: item[1]["fetch_sec"] + item[1]["merge_sec"], reverse=True)[:10]
+    logger.info(
+        f"Refresh units finished | function: refresh_all_data | units: {len(timings)} | failed: {failed} | "
+        f"rows: {sum(timing['rows'] for timing in timings.values())} | "
+        f"fetch_sec_total: {round(sum(timing['fetch_sec'] for timing in timings.values()), 2)} | "
+        f"merge_sec_total: {round(sum(timing['merge_sec'] for timing in timings.values()), 2)} | "
+        f"duration_sec: {round(duration_sec, 2)} | workers: {REFRESH_WORKERS} | slowest: {slowest}"
+    )
+
+
 # DATA REFRESH FUNCTION
 def refresh_all_data():
     """
@@ -355,31 +797,37 @@ def refresh_all_data():
     Safety check: If accidentally triggered on a trimester start date, it exits early.
     
     On regular days:
-    - Fetches only NEW user actions since last_refresh_date (Query #103, #102)
-    - Merges with existing data and removes duplicates
+    - Fetches only NEW user actions: each course from its created_at watermark (Query #103), overall since last_refresh_date (Query #102)
+    - Appends only the rows not held yet, matched by row fingerprint (core/action_merge.py)
+    - Replaces rows ingested from webhooks since the last refresh with the fetched rows (reconciliation)
+    - Appends users created since the last refresh to id_username_mapping (Query #108, incremental)
     - Recalculates metrics and scores for updated datasets
     - Updates last_refresh_date to current date
     
     Trimester handling:
     - Removes oldest trimester (4 trimesters back) from memory
     - Initializes new trimester structures if detected
+
+    The merged data is built in a shadow copy of the current generation and published in one
+    swap at the end, so requests never see a half-refreshed state. Webhook flushes wait until then.
     """
-    global _backup_user_actions_dictionaries, _backup_df_map_category_to_id, _backup_id_username_mapping, _backup_last_refresh_date, _backup_uncategorized_courses
-    
     # Safety check for trimester start
     if is_trimester_start_today():
         logger.warning("Trimester start date detected - skipping incremental refresh (full system reset should run instead | function: refresh_all_data")
         return
-    
-    # Clear any leftover backups from previous reset attempts
-    _backup_user_actions_dictionaries = None
-    _backup_df_map_category_to_id = None
-    _backup_id_username_mapping = None
-    _backup_last_refresh_date = None
-    _backup_uncategorized_courses = None  # NEW: clear leftover backup
-    logger.info("Cleared backup memory | function: refresh_all_data")
-    
-    global user_actions_dictionaries, df_map_category_to_id, id_username_mapping, last_refresh_date
+
+    with ingest_lock:  # Webhook rows stay buffered until the refreshed generation is published
+        _refresh_all_data()
+    save_snapshot()
+    log_connection_stats(context="refresh_all_data")
+    logger.info(f"Data refresh completed | function: refresh_all_data | term: {get_current_trimester()} | last_refresh_date: {_generation.last_refresh_date}")
+
+
+def _refresh_all_data():
+    """Body of refresh_all_data; the caller holds ingest_lock."""
+    generation = _generation
+    user_actions_dictionaries = _shadow_copy(generation.user_actions_dictionaries)
+    df_map_category_to_id, last_refresh_date = generation.df_map_category_to_id, generation.last_refresh_date
     today = datetime.now().strftime("%d-%m-%Y")
     trimester_corresponding_to_today = get_current_trimester()
     trimester_data_to_be_removed = get_previous_trimesters(trimester_corresponding_to_today)[3]
@@ -390,62 +838,65 @@ def refresh_all_data():
     # This ensures incremental data collection can start even if trimester reset didn't succeed
     if trimester_corresponding_to_today not in user_actions_dictionaries:
         logger.info(f"New trimester detected | function: refresh_all_data | trimester: {trimester_corresponding_to_today}")
-        user_actions_dictionaries[trimester_corresponding_to_today] = {}
-        
-        # Initialize course structures
-        for row in df_map_category_to_id.itertuples():
-            category_name = sanitize_filepath(row.name).lower()
-            user_actions_dictionaries[trimester_corresponding_to_today][category_name] = {
-                "user_actions_df": pd.DataFrame(),
+        # Empty course partitions and overall engagement structure
+        user_actions_dictionaries[trimester_corresponding_to_today] = TermTable(
+            _course_categories(df_map_category_to_id),
+            overall={
                 "raw_metrics": pd.DataFrame(),
                 "unnormalized_scores": pd.DataFrame(),
-                "log_normalized_scores": pd.DataFrame()
-            }
-        
-        # Initialize overall engagement structure
-        user_actions_dictionaries[trimester_corresponding_to_today]["overall"] = {
-            "raw_metrics": pd.DataFrame(),
-            "unnormalized_scores": pd.DataFrame(),
-            "log_normalized_scores": pd.DataFrame()
-        }
+                "log_normalized_scores": pd.DataFrame(),
+                "window_metrics": pd.DataFrame()
+            },
+        )
     # Creating new data for each course
+    course_rows = []
     for row in df_map_category_to_id.itertuples():
-        category_id = row.category_id
         category_name = sanitize_filepath(row.name).lower()
         if category_name not in user_actions_dictionaries[trimester_corresponding_to_today]:
             logger.warning(f"Category not found | function: refresh_all_data | date: {today} | course: {category_name} | term: {trimester_corresponding_to_today}")
             continue
-        query_params_for_103 = {"category_id": str(category_id), "start_date": last_refresh_date, "end_date": today}
-
-        latest_user_actions_df = execute_discourse_query(103, query_params=query_params_for_103)
-        logger.info(f"Course data fetched | function: refresh_all_data | date: {today} | course: {category_name} | rows: {len(latest_user_actions_df)}")
-        if not latest_user_actions_df.empty:
-            existing_user_actions_df = user_actions_dictionaries[trimester_corresponding_to_today][category_name]["user_actions_df"]
-            new_user_actions_df = pd.concat([existing_user_actions_df, latest_user_actions_df]).drop_duplicates()
-            user_actions_dictionaries[trimester_corresponding_to_today][category_name]["user_actions_df"] = new_user_actions_df
-
-            new_raw_metrics_dataframe = create_raw_metrics_dataframe(new_user_actions_df)
-            new_unnormalized_scores_df = create_unnormalized_scores_dataframe(new_raw_metrics_dataframe)
-            new_log_normalized_scores_df = create_log_normalized_scores_dataframe(new_raw_metrics_dataframe)
-
-            user_actions_dictionaries[trimester_corresponding_to_today][category_name]["raw_metrics"] = new_raw_metrics_dataframe
-            user_actions_dictionaries[trimester_corresponding_to_today][category_name]["unnormalized_scores"] = new_unnormalized_scores_df
-            user_actions_dictionaries[trimester_corresponding_to_today][category_name]["log_normalized_scores"] = new_log_normalized_scores_df
-            
-    # Updating data for overall engagement
-    query_params_for_102 = {"start_date": last_refresh_date, "end_date": today, "domain":"ds.study.iitm.ac.in"}
-    latest_raw_metrics_for_overall_engagement = execute_discourse_query(102, query_params = query_params_for_102)
-    existing_raw_metrics_for_overall_engagement = user_actions_dictionaries[trimester_corresponding_to_today]["overall"]["raw_metrics"]
-
-    new_raw_metrics_for_overall_engagement = pd.concat([latest_raw_metrics_for_overall_engagement, existing_raw_metrics_for_overall_engagement]).drop_duplicates()
-    new_raw_metrics_for_overall_engagement = new_raw_metrics_for_overall_engagement.groupby("user_id", as_index=False).sum()
-    new_raw_metrics_for_overall_engagement = new_raw_metrics_for_overall_engagement[["user_id"] + list(weights_dict_for_overall_engagement.keys())]
-
-    new_unnormalized_scores_dataframe_all_users, new_log_normalized_scores_dataframe_all_users = create_unnormalized_scores_dataframe_for_all_users(new_raw_metrics_for_overall_engagement), create_log_normalized_scores_dataframe_for_all_users(new_raw_metrics_for_overall_engagement)
-
-    user_actions_dictionaries[trimester_corresponding_to_today]["overall"]["raw_metrics"] = new_raw_metrics_for_overall_engagement
-    user_actions_dictionaries[trimester_corresponding_to_today]["overall"]["unnormalized_scores"] = new_unnormalized_scores_dataframe_all_users
-    user_actions_dictionaries[trimester_corresponding_to_today]["overall"]["log_normalized_scores"] = new_log_normalized_scores_dataframe_all_users
-
-    last_refresh_date = today
-    logger.info(f"Data refresh completed | function: refresh_all_data | term: {trimester_corresponding_to_today} | last_refresh_date: {last_refresh_date}")
+        course_rows.append(row)
+    # Each course is fetched from its own watermark, so a course whose last fetch failed catches up
+    term_table = user_actions_dictionaries[trimester_corresponding_to_today]
+    course_slots = {sanitize_filepath(row.name).lower(): merge_copy(term_table[sanitize_filepath(row.name).lower()]) for row in course_rows}  # Keep the merge states rebuilt here
+    course_start_dates = {int(row.category_id): fetch_start_date(course_slots[sanitize_filepath(row.name).lower()], last_refresh_date) for row in course_rows}
+    if COURSE_QUERY_BATCH_SIZE > 1:
+        refresh_units = [course_rows[batch_start:batch_start + COURSE_QUERY_BATCH_SIZE] for batch_start in range(0, len(course_rows), COURSE_QUERY_BATCH_SIZE)]
+    else:
+        refresh_units = [[row] for row in course_rows]
+    ingested_rows = export_ingested_rows()  # A course's webhook rows are forgotten once its merge has replaced them
+
+    # Course units and the overall unit run concurrently under the shared rate limit; each unit replaces
+    # only its own slots, and a failed unit keeps its current data (its watermark is unchanged, so the
+    # next refresh fetches the missed days)
+    timings, failed, refreshed_slots = {}, [], {}
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, REFRESH_WORKERS), thread_name_prefix="refresh") as executor:
+        futures = {executor.submit(_refresh_overall_unit, trimester_corresponding_to_today, term_table, refreshed_slots, last_refresh_date, today): None}
+        for rows in refresh_units:
+            start_date = min((course_start_dates[int(row.category_id)] for row in rows), key=lambda date: datetime.strptime(date, "%d-%m-%Y"))
+            futures[executor.submit(_refresh_course_unit, trimester_corresponding_to_today, course_slots, refreshed_slots, rows, start_date, today, ingested_rows)] = rows
+        for future in as_completed(futures):
+            rows = futures[future]
+            unit_names = ["overall"] if rows is None else [sanitize_filepath(row.name).lower() for row in rows]
+            try:
+                unit_timings = future.result()
+            except Exception as e:
+                logger.error(f"Refresh unit failed, keeping its current data | function: refresh_all_data | units: {unit_names} | error: {e}", exc_info=(type(e), e, e.__traceback__))
+                failed.extend(unit_names)
+                continue
+            for category_name in unit_timings:
+                if category_name != "overall":
+                    take_ingested_rows(trimester_corresponding_to_today, category_name)
+            timings.update(unit_timings)
+    _log_refresh_timings(timings, failed, time.perf_counter() - start_time)
+    user_actions_dictionaries[trimester_corresponding_to_today] = term_table.with_slots(refreshed_slots)  # One rebuild of the term's tables
+
+    # New users since the last refresh, so they show up on the overall leaderboard
+    id_username_mapping = generation.id_username_mapping
+    try:
+        id_username_mapping = sync_id_username_mapping(id_username_mapping)
+    except Exception as e:
+        logger.error(f"User mapping sync failed, keeping the current mapping | function: refresh_all_data | error: {e}", exc_info=True)
+
+    publish_data_generation(user_actions_dictionaries=user_actions_dictionaries, id_username_mapping=id_username_mapping, last_refresh_date=today)
@@ -1,93 +1,241 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def get_all_data_dicts():
+
+def _store_course_dataframes(course_slot, course_dataframes):
+    """Puts the (user_actions_df, raw_metrics, unnormalized_scores, log_normalized_scores) tuple of one course into its slot."""
+    from core.dimensions import encode_user_actions
+
+    user_actions_df, raw_metrics_df, unnormalized_scores_df, log_normalized_scores_df = course_dataframes
+    course_slot["user_actions_df"] = encode_user_actions(user_actions_df)  # Checkpoint units hold the query-103 layout
+    course_slot["raw_metrics"] = raw_metrics_df
+    course_slot["unnormalized_scores"] = unnormalized_scores_df
+    course_slot["log_normalized_scores"] = log_normalized_scores_df
+
+
+def _store_overall_dataframes(overall_slot, overall_dataframes):
+    """Puts the (raw_metrics, unnormalized_scores, log_normalized_scores, window_metrics) tuple of a term's overall unit into its slot."""
+    overall_slot["raw_metrics"], overall_slot["unnormalized_scores"], overall_slot["log_normalized_scores"], overall_slot["window_metrics"] = overall_dataframes
+
+
+def _course_traffic_hint(row, held_rows_by_term):
+    """
+    Rough recent traffic of a course, used to load the busiest courses of a term first (and so
+    also to start the largest crawls first). Uses the rows held for the course in the newest term
+    that has any (e.g. from a warm start or the previous load), otherwise the post count from query 107.
+    `held_rows_by_term` is {term: TermTable.partition_rows()}.
+    """
+    from core.utils import sanitize_filepath
+
+    category_name = sanitize_filepath(row.name).lower()
+    for term in sorted(held_rows_by_term, key=lambda term: term.split("-")[::-1], reverse=True):  # "t3-2025" -> ["2025", "t3"]
+        held_rows = held_rows_by_term[term].get(category_name, 0)
+        if held_rows:
+            return held_rows
+    post_count = getattr(row, "post_count", None)
+    if post_count is not None and post_count == post_count:  # Not NaN
+        return int(post_count)
+    return 0
+
+
+def _run_load_unit(unit):
+    """
+    Runs one work unit on a pool worker and returns {slot_name: dataframes}.
+    Units: ("course", term, [row], (start, end)), ("course_batch", term, rows, (start, end)), ("overall", term, None, (start, end)).
+    """
+    from core.utils import sanitize_filepath
+    from processors.course_data_processors import get_course_specific_dataframes, get_course_specific_dataframes_for_categories
+    from processors.overall_discourseData_processors import get_overall_engagement_partitions
+
+    kind, term, rows, (start_date, end_date) = unit
+    match kind:
+        case "course":
+            row = rows[0]
+            params = {"category_id": str(row.category_id), "start_date": start_date, "end_date": end_date}
+            return {sanitize_filepath(row.name).lower(): get_course_specific_dataframes(query_params=params)}
+        case "course_batch":
+            # Batched mode: one paginated 103 crawl per group of categories, rows split locally by category_id
+            dataframes_by_category = get_course_specific_dataframes_for_categories([row.category_id for row in rows], start_date, end_date)
+            return {sanitize_filepath(row.name).lower(): dataframes_by_category[int(row.category_id)] for row in rows}
+        case "overall":
+            return {"overall": get_overall_engagement_partitions(start_date, end_date, domain="ds.study.iitm.ac.in")}
+
+
+def get_all_data_dicts(checkpoint=None, df_map_category_to_id=None, progress=None):
+    """
+    Builds user_actions_dictionaries ({term: TermTable}, core/term_table.py) for the current and previous 2 terms.
+    The slots are filled as plain {course: {frame_name: DataFrame}} dicts and turned into one TermTable per term at the end.
+
+    The load is planned as independent work units, one per (term, course) (or per batch of
+    courses with COURSE_QUERY_BATCH_SIZE) and one overall unit per term, and run on a pool
+    of DATA_LOAD_WORKERS threads. Every Discourse call still goes through the process-wide
+    rate limiter, so the pool only fills the quota instead of exceeding it. Units are started
+    term by term, current term first; within a term the overall unit comes first, then the
+    courses with the most recent traffic. Failed units are collected into error_list as before.
+
+    With a `progress` (core.data_loader.ProgressiveLoad), `progress.planned(slots, categories)` is called once
+    the load is planned and `progress.unit_loaded(term, slot_name, slot, restored)` for every
+    (term, course) and overall slot as soon as it is filled, so it can be served right away
+    (`progress.unit_failed(term, slot_name)` for the ones that fail).
+
+    With a `checkpoint` (core.reset_checkpoint.ResetCheckpoint), every finished (term, course)
+    and overall unit is saved as soon as it is done, units already in the checkpoint are read
+    back instead of fetched, and failed units are recorded with `checkpoint.mark_failed`.
+
+    `df_map_category_to_id` defaults to the published one; a full system reset passes the
+    mapping it just reloaded, since that is only published together with the new data.
+    """
     import pandas as pd
     import numpy as np
 
     # Imports from other programs
     from core.utils import sanitize_filepath, get_current_trimester, get_previous_trimesters, get_trimester_dates
-    from processors.course_data_processors import get_course_specific_dataframes
-    from processors.overall_discourseData_processors import get_overall_engagement_df
-    from application.constants import env
+    from application.constants import env, COURSE_QUERY_BATCH_SIZE, DATA_LOAD_WORKERS
     from core.logging_config import get_logger
-    
-    from core.data_loader import get_df_map_category_to_id
-    
+    from core.http_client import log_connection_stats
+    from core.reset_checkpoint import course_unit, overall_unit
+    from core.dimensions import decode_user_actions
+    from core.term_table import TermTable
+
+    from core.data_loader import get_df_map_category_to_id, get_user_actions_dictionaries
+
     logger = get_logger("core.data_loader")
-    df_map_category_to_id = get_df_map_category_to_id()
+    if df_map_category_to_id is None:
+        df_map_category_to_id = get_df_map_category_to_id()
+    held_rows_by_term = {term: term_table.partition_rows() for term, term_table in (get_user_actions_dictionaries() or {}).items()}  # Only used for the size hints
 
     curr_plus_prev_trimesters = get_previous_trimesters(get_current_trimester())[:3] # The items of this list will act as keys of the dictionary; elements are terms in descending order, like current(t2-2025), previous(t1-2025), t3-2024 and so on # CHANGED FOR TESTING
 
-    
-    
+
+
     user_actions_dictionaries = {}
+    term_categories = {}  # {term: {course: category_id}}
     error_list = []
+    course_units = []  # (term_rank, traffic_hint, unit)
+    overall_units = []
+    restored_slots = []  # (term, slot_name) read back from the checkpoint
 
-    for term in curr_plus_prev_trimesters: # keys are actually the terms, like "t1-2025","t3-2024"; # THIS LOOP IS FOR FINDING THE REQUIRED DATA FOR COURSES
+    for term in curr_plus_prev_trimesters: # keys are actually the terms, like "t1-2025","t3-2024"; # THIS LOOP PLANS THE WORK UNITS OF EACH TERM
         key=term
         user_actions_dictionaries[key] = {}
-        try:
-            for row in df_map_category_to_id.itertuples(): # This loop is for finding course-specific dataframes for each term
-                try:
-                    category_id = row.category_id
-                    if env == "dev":
-                        if not (category_id==18): continue
-                    category_name = sanitize_filepath(row.name).lower() # Removes characters like :," " etc and replaces them with "_"
-                    if category_name not in user_actions_dictionaries[key]:
-                        user_actions_dictionaries[key][category_name] = {}
-                        user_actions_dictionaries[key][category_name]["user_actions_df"] = pd.DataFrame() # This will be used to create week-wise engagement graph
-                        user_actions_dictionaries[key][category_name]["raw_metrics"] = pd.DataFrame()
-                        user_actions_dictionaries[key][category_name]["unnormalized_scores"] = pd.DataFrame()
-                        user_actions_dictionaries[key][category_name]["log_normalized_scores"] = pd.DataFrame()
-                    
-                    start_date, end_date = get_trimester_dates(term)
-                    params = {"category_id": str(category_id), "start_date": start_date, "end_date": end_date}
-                    
-                    user_actions_df, raw_metrics_df, unnormalized_scores_df, log_normalized_scores_df = get_course_specific_dataframes(query_params=tuple(params.items()))
-
-                    # if not user_actions_df.empty and len(user_actions_df)>75: # THIS WILL BE IMPLEMENTED LATER AFTER DISCUSSION
-                    user_actions_dictionaries[key][category_name]["user_actions_df"] = user_actions_df
-                        
-                    user_actions_dictionaries[key][category_name]["raw_metrics"] = raw_metrics_df # So now we have the raw metrics for each category for each term.
-
-                    user_actions_dictionaries[key][category_name]["unnormalized_scores"] = unnormalized_scores_df
-
-                    user_actions_dictionaries[key][category_name]["log_normalized_scores"] = log_normalized_scores_df
-
-                except Exception as exec:
-                    logger.error(f"Error processing course data | function: get_all_data_dicts | course: {category_name} | term: {term} | error: {exec}", extra={"course": category_name, "term": term}, exc_info=True)
-                    error_list.append((key,category_name,exec))
-                    continue
-        except Exception as exec:
-            logger.error(f"Error processing term data | function: get_all_data_dicts | term: {term} | error: {exec}", extra={"term": term}, exc_info=True)
-            error_list.append(term)
-            continue
-
-
-    for term in curr_plus_prev_trimesters:
-        # THIS LOOP IS FOR FINDIND THE REQUIRED DATA OF OVERALL DISCOURSE
-        start_date, end_date = get_trimester_dates(term)
-        params = {"start_date": start_date, "end_date": end_date, "domain":"ds.study.iitm.ac.in"}
-        
-        user_actions_dictionaries[term]["overall"] = {
+        user_actions_dictionaries[key]["overall"] = {
             "raw_metrics": pd.DataFrame(),
             "unnormalized_scores": pd.DataFrame(),
-            "log_normalized_scores": pd.DataFrame()
+            "log_normalized_scores": pd.DataFrame(),
+            "window_metrics": pd.DataFrame()
         }
         try:
-            raw_metrics_all_users_df, unnormalized_scores_all_users_df, log_normalized_scores_all_users_df = get_overall_engagement_df(query_params=tuple(params.items()))
+            start_date, end_date = get_trimester_dates(term)
+            course_rows = [row for row in df_map_category_to_id.itertuples() if not (env == "dev" and row.category_id != 18)]
+            for row in course_rows:
+                category_name = sanitize_filepath(row.name).lower() # Removes characters like :," " etc and replaces them with "_"
+                term_categories.setdefault(key, {})[category_name] = int(row.category_id)
+                if category_name not in user_actions_dictionaries[key]:
+                    user_actions_dictionaries[key][category_name] = {}
+                    user_actions_dictionaries[key][category_name]["user_actions_df"] = pd.DataFrame() # This will be used to create week-wise engagement graph
+                    user_actions_dictionaries[key][category_name]["raw_metrics"] = pd.DataFrame()
+                    user_actions_dictionaries[key][category_name]["unnormalized_scores"] = pd.DataFrame()
+                    user_actions_dictionaries[key][category_name]["log_normalized_scores"] = pd.DataFrame()
 
-            user_actions_dictionaries[term]["overall"]["raw_metrics"] = raw_metrics_all_users_df
-            user_actions_dictionaries[term]["overall"]["unnormalized_scores"] = unnormalized_scores_all_users_df
-            user_actions_dictionaries[term]["overall"]["log_normalized_scores"] = log_normalized_scores_all_users_df
-        except Exception as exec:
-            logger.error("Error processing overall engagement data", extra={"term": term}, exc_info=True)
+            if checkpoint is not None:
+                # Resume: read back the courses finished by an earlier (failed or interrupted) load
+                remaining_rows = []
+                for row in course_rows:
+                    category_name = sanitize_filepath(row.name).lower()
+                    course_dataframes = checkpoint.load(course_unit(key, category_name))
+                    if course_dataframes is None:
+                        remaining_rows.append(row)
+                    else:
+                        _store_course_dataframes(user_actions_dictionaries[key][category_name], course_dataframes)
+                        restored_slots.append((key, category_name))
+                if len(remaining_rows) < len(course_rows):
+                    logger.info(f"Courses restored from checkpoint | function: get_all_data_dicts | term: {term} | restored: {len(course_rows) - len(remaining_rows)} | remaining: {len(remaining_rows)}")
+                course_rows = remaining_rows
+
+            # Busiest courses first; batches are formed from courses of similar traffic
+            term_rank = curr_plus_prev_trimesters.index(term)
+            sized_rows = sorted(((_course_traffic_hint(row, held_rows_by_term), row) for row in course_rows), key=lambda item: -item[0])
+            if COURSE_QUERY_BATCH_SIZE > 1:
+                for batch_start in range(0, len(sized_rows), COURSE_QUERY_BATCH_SIZE):
+                    batch = sized_rows[batch_start:batch_start + COURSE_QUERY_BATCH_SIZE]
+                    course_units.append((term_rank, sum(size for size, _row in batch), ("course_batch", key, [row for _size, row in batch], (start_date, end_date))))
+            else:
+                course_units.extend((term_rank, size, ("course", key, [row], (start_date, end_date))) for size, row in sized_rows)
+
+            # THIS UNIT IS FOR FINDIND THE REQUIRED DATA OF OVERALL DISCOURSE
+            overall_dataframes = checkpoint.load(overall_unit(term)) if checkpoint is not None else None
+            if overall_dataframes is None:
+                overall_units.append((curr_plus_prev_trimesters.index(term), ("overall", key, None, (start_date, end_date))))
+            else:
+                _store_overall_dataframes(user_actions_dictionaries[key]["overall"], overall_dataframes)
+                restored_slots.append((key, "overall"))
+        except Exception as e:
+            logger.error(f"Error processing term data | function: get_all_data_dicts | term: {term} | error: {e}", extra={"term": term}, exc_info=True)
             error_list.append(term)
+            if checkpoint is not None:
+                checkpoint.mark_failed(course_unit(key, "*"), e)
             continue
-    
+
+    # Current term first; within a term the overall unit (query 102 over every category, the home page), then courses by traffic
+    prioritized_units = [(term_rank, 0, 0, unit) for term_rank, unit in overall_units] + [(term_rank, 1, -size, unit) for term_rank, size, unit in course_units]
+    planned_units = [unit for *_priority, unit in sorted(prioritized_units, key=lambda item: item[:3])]
+    if progress is not None:
+        progress.planned(sum(len(term_dict) for term_dict in user_actions_dictionaries.values()), term_categories)
+        for term, slot_name in restored_slots:
+            progress.unit_loaded(term, slot_name, user_actions_dictionaries[term][slot_name], restored=True)
+    workers = max(1, min(DATA_LOAD_WORKERS, len(planned_units)))
+    logger.info(f"Data load planned | function: get_all_data_dicts | units: {len(planned_units)} | workers: {workers}")
+    start_time = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="data-load") as executor:
+        futures = {executor.submit(_run_load_unit, unit): unit for unit in planned_units}
+        for future in as_completed(futures): # Results are stored from this thread only, so the dictionaries need no locking
+            kind, term, rows, _dates = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                if kind == "overall":
+                    logger.error("Error processing overall engagement data", extra={"term": term}, exc_info=(type(e), e, e.__traceback__))
+                    error_list.append(term)
+                    if checkpoint is not None:
+                        checkpoint.mark_failed(overall_unit(term), e)
+                    if progress is not None:
+                        progress.unit_failed(term, "overall")
+                    continue
+                course_names = [sanitize_filepath(row.name).lower() for row in rows]
+                logger.error(f"Error processing course data | function: get_all_data_dicts | courses: {course_names} | term: {term} | error: {e}", extra={"courses": course_names, "term": term}, exc_info=(type(e), e, e.__traceback__))
+                error_list.extend((term, category_name, e) for category_name in course_names)
+                for category_name in course_names:
+                    if checkpoint is not None:
+                        checkpoint.mark_failed(course_unit(term, category_name), e)
+                    if progress is not None:
+                        progress.unit_failed(term, category_name)
+                continue
+
+            for slot_name, dataframes in results.items():
+                if slot_name == "overall":
+                    overall_slot = user_actions_dictionaries[term]["overall"]
+                    _store_overall_dataframes(overall_slot, dataframes)
+                    if checkpoint is not None:
+                        checkpoint.save(overall_unit(term), dataframes)
+                    if progress is not None:
+                        progress.unit_loaded(term, "overall", overall_slot)
+                    continue
+                # if not user_actions_df.empty and len(user_actions_df)>75: # THIS WILL BE IMPLEMENTED LATER AFTER DISCUSSION
+                _store_course_dataframes(user_actions_dictionaries[term][slot_name], dataframes) # So now we have the raw metrics for each category for each term.
+                if checkpoint is not None:
+                    # Saved with usernames and titles joined back in, so a unit does not depend on this process's dimensions
+                    checkpoint.save(course_unit(term, slot_name), (decode_user_actions(dataframes[0]), *dataframes[1:]))
+                if progress is not None:
+                    progress.unit_loaded(term, slot_name, user_actions_dictionaries[term][slot_name])
+
+    logger.info(f"Data load units finished | function: get_all_data_dicts | units: {len(planned_units)} | workers: {workers} | duration_sec: {round(time.perf_counter() - start_time, 2)}")
     if error_list:
         logger.warning("Data loading completed with errors", extra={"error_count": len(error_list), "errors": str(error_list)[:500]})
     else:
         logger.info("Data loading completed successfully", extra={"terms": list(user_actions_dictionaries.keys())})
+    log_connection_stats(context="get_all_data_dicts")
+    user_actions_dictionaries = {term: TermTable.from_slots(term_dict, term_categories.get(term, {})) for term, term_dict in user_actions_dictionaries.items()}
     return user_actions_dictionaries # MOST IMP VARIABLE IN THE WHOLE CODE
 
 if __name__=="__main__":
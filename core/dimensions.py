@@ -0,0 +1,176 @@
+"""Shared dimension tables for the stored user actions (star schema).
+
+Query 103 returns the acting username and the topic title on every action row.
+Stored as they are, the same strings would be repeated on every row of every
+course in every term. Instead each course's `user_actions_df` is a compact fact
+table (FACT_COLUMNS):
+
+    user_key         int32, key into the user dimension
+    action_type      int8, Discourse user_actions code (see application.constants.action_name_to_type)
+    target_topic_id  topic id (key into the topic dimension)
+    target_post_id
+    created_at       datetime64[UTC]
+    category_id
+
+and the strings live once per process in two dimensions shared by all terms and courses:
+
+    users   user_key -> username                                  (append-only)
+    topics  topic_id -> topic_title, created_at, category_id      (the newest title wins)
+
+Rows are encoded as soon as a page is decoded (`encode_user_actions`); names are
+joined back only where a chart or list is rendered. The loader persists both
+dimensions with every snapshot and Arrow generation; reader processes use the ones
+of their generation (see core.data_loader.get_dimensions).
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+FACT_COLUMNS = ["user_key", "action_type", "target_topic_id", "target_post_id", "created_at", "category_id"]
+USER_COLUMNS = ["user_key", "username"]
+TOPIC_COLUMNS = ["topic_id", "topic_title", "created_at", "category_id"]
+NEW_TOPIC = 4  # action_type of the row that carries a topic's creation time
+
+
+class UserDimension:
+    """Append-only username <-> user_key mapping."""
+
+    def __init__(self, usernames=()):
+        self._lock = threading.Lock()
+        self._usernames = list(usernames)
+        self._keys = {username: key for key, username in enumerate(self._usernames)}
+        self._frame = None
+
+    def __len__(self):
+        return len(self._usernames)
+
+    def encode(self, usernames):
+        """user_key (int32) of every username, adding the ones not seen yet."""
+        usernames = pd.Series(usernames, dtype=object).fillna("")
+        uniques, codes = np.unique(usernames.to_numpy(dtype=str), return_inverse=True)
+        with self._lock:
+            unique_keys = np.empty(len(uniques), dtype=np.int32)
+            for position, username in enumerate(uniques.tolist()):  # Python str, not numpy str_
+                key = self._keys.get(username)
+                if key is None:
+                    key = self._keys[username] = len(self._usernames)
+                    self._usernames.append(username)
+                    self._frame = None
+                unique_keys[position] = key
+        return unique_keys[codes]
+
+    def decode(self, user_keys):
+        """Usernames of user_keys (object array)."""
+        with self._lock:
+            names = np.array(self._usernames, dtype=object)
+        return names[np.asarray(user_keys, dtype=np.int64)] if len(names) else np.array([], dtype=object)
+
+    def frame(self):
+        """The dimension as a DataFrame (USER_COLUMNS); the same object is returned while nothing was added."""
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame({"user_key": np.arange(len(self._usernames), dtype=np.int32), "username": np.array(self._usernames, dtype=object)})
+            return self._frame
+
+    @classmethod
+    def from_frame(cls, df):
+        if df is None or df.empty:
+            return cls()
+        return cls(df.sort_values("user_key")["username"].tolist())
+
+
+class TopicDimension:
+    """topic_id -> (topic_title, created_at, category_id)."""
+
+    def __init__(self, df=None):
+        self._lock = threading.Lock()
+        self._topics = {}
+        if df is not None and not df.empty:
+            for row in df[TOPIC_COLUMNS].itertuples(index=False):
+                self._topics[int(row.topic_id)] = (row.topic_title, row.created_at, row.category_id)
+        self._frame = None
+
+    def __len__(self):
+        return len(self._topics)
+
+    def upsert(self, user_actions_df):
+        """Records the topics of decoded query-103 rows; creation times come from their new_topic rows."""
+        if user_actions_df.empty or "target_topic_id" not in user_actions_df.columns:
+            return
+        columns = {"topic_id": pd.to_numeric(user_actions_df["target_topic_id"], errors="coerce")}
+        columns["topic_title"] = user_actions_df["topic_title"] if "topic_title" in user_actions_df.columns else None
+        is_new_topic = pd.to_numeric(user_actions_df["action_type"].astype(object), errors="coerce") == NEW_TOPIC
+        columns["created_at"] = user_actions_df["created_at"].where(is_new_topic)
+        columns["category_id"] = user_actions_df["category_id"] if "category_id" in user_actions_df.columns else None
+        rows = pd.DataFrame(columns).dropna(subset=["topic_id"]).drop_duplicates("topic_id", keep="last")
+        with self._lock:
+            for row in rows.itertuples(index=False):
+                topic_id = int(row.topic_id)
+                title, created_at, category_id = self._topics.get(topic_id, (None, pd.NaT, None))
+                self._topics[topic_id] = (
+                    row.topic_title if isinstance(row.topic_title, str) else title,
+                    row.created_at if not pd.isna(row.created_at) else created_at,
+                    row.category_id if not pd.isna(row.category_id) else category_id,
+                )
+            self._frame = None
+
+    def titles(self, topic_ids):
+        """Titles of topic_ids (None for unknown topics)."""
+        with self._lock:
+            return [self._topics.get(int(topic_id), (None,))[0] for topic_id in topic_ids]
+
+    def frame(self):
+        """The dimension as a DataFrame (TOPIC_COLUMNS); the same object is returned while nothing changed."""
+        with self._lock:
+            if self._frame is None:
+                self._frame = pd.DataFrame(
+                    [(topic_id, *values) for topic_id, values in self._topics.items()], columns=TOPIC_COLUMNS
+                ).astype({"topic_id": "int64"})
+                self._frame["created_at"] = pd.to_datetime(self._frame["created_at"], utc=True)
+            return self._frame
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df)
+
+
+# The loader's dimensions (standalone and loader processes)
+users = UserDimension()
+topics = TopicDimension()
+
+
+def load_dimensions(users_df, topics_df):
+    """Replace the process dimensions, e.g. with the ones of a snapshot (before its facts are used)."""
+    global users, topics
+    users, topics = UserDimension.from_frame(users_df), TopicDimension.from_frame(topics_df)
+
+
+def encode_user_actions(df):
+    """
+    Fact table (FACT_COLUMNS) of decoded query-103 rows; usernames and topics are added to the
+    process dimensions. Frames that are already encoded are returned as they are.
+    """
+    if df is None or df.empty or "user_key" in df.columns:
+        return df
+    topics.upsert(df)
+    facts = {
+        "user_key": users.encode(df["acting_username"]),
+        "action_type": pd.to_numeric(df["action_type"].astype(object), errors="coerce").fillna(0).astype("int8").to_numpy(),
+    }
+    for column in FACT_COLUMNS[2:]:
+        if column in df.columns:
+            facts[column] = df[column].array
+    return pd.DataFrame(facts)
+
+
+def decode_user_actions(df, user_dimension=None, topic_dimension=None):
+    """Joins usernames and topic titles back into a fact table (the layout of query 103, without action_name)."""
+    if df is None or df.empty or "user_key" not in df.columns:
+        return df
+    user_dimension, topic_dimension = user_dimension or users, topic_dimension or topics
+    decoded = df.drop(columns="user_key")
+    decoded.insert(0, "acting_username", user_dimension.decode(df["user_key"]))
+    if "target_topic_id" in df.columns:
+        decoded["topic_title"] = topic_dimension.titles(df["target_topic_id"].fillna(-1))
+    return decoded
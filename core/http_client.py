@@ -0,0 +1,178 @@
+"""Shared HTTP client layer.
+
+Sync outgoing calls (developer alerts) go through one pooled ``requests.Session``
+so TCP+TLS connections are kept alive and reused instead of being re-established
+for every request. Discourse calls run on the aiohttp session of
+core/async_client.py, which reports into the same per-host connection statistics,
+so they show how many handshakes the keep-alive pools actually saved.
+"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from application.constants import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+)
+from core.logging_config import get_logger
+
+logger = get_logger("core.http_client")
+
+_session = None
+_session_lock = threading.Lock()
+
+# Per-host connection statistics: {host: {"requests": int, "new_connections": int, "connect_time_sec": float}}
+_connection_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _host_stats(host):
+    # Caller must hold _stats_lock
+    if host not in _connection_stats:
+        _connection_stats[host] = {"requests": 0, "new_connections": 0, "connect_time_sec": 0.0}
+    return _connection_stats[host]
+
+
+def _record_request(host):
+    with _stats_lock:
+        _host_stats(host)["requests"] += 1
+
+
+def _record_new_connection(host):
+    with _stats_lock:
+        _host_stats(host)["new_connections"] += 1
+
+
+def _record_connect_time(host, seconds):
+    with _stats_lock:
+        _host_stats(host)["connect_time_sec"] += seconds
+
+
+class _ConnectionStatsMixin:
+    """Counts requests and fresh connections per host, and times each TCP+TLS connect."""
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        host = self.host
+        _record_new_connection(host)
+        original_connect = conn.connect
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return original_connect()
+            finally:
+                _record_connect_time(host, time.perf_counter() - start)
+
+        conn.connect = timed_connect
+        return conn
+
+    def urlopen(self, method, url, *args, **kwargs):
+        _record_request(self.host)
+        return super().urlopen(method, url, *args, **kwargs)
+
+
+class _CountingHTTPConnectionPool(_ConnectionStatsMixin, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_ConnectionStatsMixin, HTTPSConnectionPool):
+    pass
+
+
+class _CountingHTTPAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        # Assign a fresh dict; the default one is shared at module level inside urllib3
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = _CountingHTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        pool_block=False,  # open an extra (non-pooled) connection rather than blocking when the pool is busy
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+                logger.info(f"HTTP session created | function: get_session | pool_connections: {HTTP_POOL_CONNECTIONS} | pool_maxsize: {HTTP_POOL_MAXSIZE} | timeout: ({HTTP_CONNECT_TIMEOUT}, {HTTP_READ_TIMEOUT})")
+    return _session
+
+
+def request(method, url, timeout=None, **kwargs):
+    """
+    Send a request through the shared session.
+
+    `timeout` defaults to (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT); pass a number or a
+    (connect, read) tuple to override it for a single call.
+    """
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    return get_session().request(method, url, timeout=timeout, **kwargs)
+
+
+def get(url, **kwargs):
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request("POST", url, **kwargs)
+
+
+def get_connection_stats():
+    """
+    Return per-host connection reuse statistics.
+
+    Returns:
+        dict: {host: {"requests", "new_connections", "reused_connections", "reuse_ratio",
+                      "connect_time_sec", "avg_connect_sec", "estimated_saved_sec"}}
+
+    `estimated_saved_sec` is the number of reused requests multiplied by the average
+    observed connect (TCP+TLS handshake) time, i.e. the handshake time the pool avoided.
+    """
+    with _stats_lock:
+        snapshot = {host: dict(stats) for host, stats in _connection_stats.items()}
+
+    for stats in snapshot.values():
+        reused = max(stats["requests"] - stats["new_connections"], 0)
+        avg_connect = stats["connect_time_sec"] / stats["new_connections"] if stats["new_connections"] else 0.0
+        stats["reused_connections"] = reused
+        stats["reuse_ratio"] = round(reused / stats["requests"], 3) if stats["requests"] else 0.0
+        stats["connect_time_sec"] = round(stats["connect_time_sec"], 3)
+        stats["avg_connect_sec"] = round(avg_connect, 4)
+        stats["estimated_saved_sec"] = round(reused * avg_connect, 2)
+    return snapshot
+
+
+def log_connection_stats(context=""):
+    """Log one line per host with the connection reuse statistics gathered so far."""
+    for host, stats in get_connection_stats().items():
+        logger.info(
+            f"HTTP connection reuse | context: {context} | host: {host} | requests: {stats['requests']} | new_connections: {stats['new_connections']} | reused: {stats['reused_connections']} | avg_connect_sec: {stats['avg_connect_sec']} | estimated_saved_sec: {stats['estimated_saved_sec']}",
+            extra={"host": host, **stats},
+        )
+
+
+def reset_connection_stats():
+    """Clear the collected statistics (e.g. between benchmark runs)."""
+    with _stats_lock:
+        _connection_stats.clear()
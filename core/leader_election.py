@@ -0,0 +1,76 @@
+"""Leader election between the web worker processes of one machine.
+
+Under a production WSGI server (wsgi.py) every worker process serves requests
+as a reader (DATA_ROLE = "reader", core/arrow_store.py). Exactly one of them,
+the *refresh leader*, also starts and supervises the loader worker
+(core/loader_worker.py), which runs the startup load and the scheduled jobs and
+publishes the generations all workers read.
+
+The leader is whoever holds an exclusive flock on LEADER_LOCK_FILE. Every worker
+tries to take it every LEADER_POLL_SECONDS; the lock is held for the lifetime of
+the leader process and released by the OS when it exits or is killed, so another
+worker takes over. The old leader's loader exits with its parent, and the new
+one waits for it on the loader lock (see core.loader_worker.run), so two loaders
+never publish at the same time.
+"""
+import fcntl
+import os
+import threading
+import time
+
+from application.constants import ARROW_STORE_DIR, LEADER_POLL_SECONDS
+from core.logging_config import get_logger
+
+logger = get_logger("core.leader_election")
+
+LEADER_LOCK_FILE = os.path.join(ARROW_STORE_DIR, "leader.lock")
+
+_lock_file = None  # Open while this process is the leader
+_election_pid = None  # Process that started the election thread (not inherited across fork)
+_election_lock = threading.Lock()
+
+
+def try_acquire(path):
+    """
+    Takes an exclusive flock on `path` without blocking. Returns the open file, which holds the
+    lock until it is closed or the process exits, or None if another process holds it.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    lock_file = open(path, "a+", encoding="utf-8")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    lock_file.truncate(0)
+    lock_file.write(f"{os.getpid()}\n")  # For operators: which process holds it
+    lock_file.flush()
+    return lock_file
+
+
+def is_leader():
+    """Whether this process is the refresh leader."""
+    return _lock_file is not None
+
+
+def start_leader_election(on_elected):
+    """
+    Starts the election thread of this process (once per process). `on_elected` is called
+    once, on that thread, when this process becomes the leader.
+    """
+    global _election_pid
+
+    def elect():
+        global _lock_file
+        while _lock_file is None:
+            _lock_file = try_acquire(LEADER_LOCK_FILE)
+            if _lock_file is None:
+                time.sleep(LEADER_POLL_SECONDS)
+        logger.info(f"Elected refresh leader | function: start_leader_election | pid: {os.getpid()}")
+        on_elected()
+
+    with _election_lock:
+        if _election_pid == os.getpid():
+            return
+        _election_pid = os.getpid()
+    threading.Thread(target=elect, daemon=True, name="leader-election").start()
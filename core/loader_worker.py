@@ -0,0 +1,232 @@
+"""The data loader as its own process.
+
+In the loader role all fetching, decoding and aggregation (the startup load,
+the scheduled reset and refresh, webhook flushes) runs in this worker instead of
+on threads of the web process, so it never competes with request threads for
+the GIL. The worker publishes every finished generation to the Arrow store
+(core/arrow_store.py); web processes (DATA_ROLE = "reader") memory-map it
+read-only and never fetch.
+
+Run it on its own (e.g. as a second container or service):
+
+    python -m core.loader_worker
+
+or let the web process start and supervise it (DATA_ROLE=reader and
+LOADER_PROCESS=spawn: `start_loader_process`, restarted if it dies; under
+wsgi.py the elected leader worker does, see core/leader_election.py). A
+spawned worker exits when its parent does. Only one loader per
+ARROW_STORE_DIR runs at a time (LOADER_LOCK_FILE).
+
+Readers cannot run loader jobs themselves; they leave requests for the worker
+under ARROW_STORE_DIR/loader_requests/ (e.g. `request_reset_resume` for the
+admin endpoint), which it picks up within LOADER_POLL_SECONDS.
+"""
+import os
+import sys
+
+if __name__ == "__main__":
+    os.environ["DATA_ROLE"] = "loader"  # Before application.constants is imported: this process is the loader
+
+import argparse
+import json
+import signal
+import subprocess
+import threading
+import time
+
+from application.constants import (
+    ARROW_STORE_DIR,
+    LOADER_POLL_SECONDS,
+    LOADER_RESTART_DELAY_SECONDS,
+    WEBHOOK_FLUSH_INTERVAL_SECONDS,
+)
+from core.leader_election import try_acquire
+from core.logging_config import get_logger, init_logging
+
+logger = get_logger("core.loader_worker")
+
+REQUEST_DIR = os.path.join(ARROW_STORE_DIR, "loader_requests")
+LOADER_LOCK_FILE = os.path.join(ARROW_STORE_DIR, "loader.lock")  # One loader per store at a time
+RESET_RESUME_REQUEST = "reset_resume"
+
+
+def start_loading():
+    """
+    Starts the initial load: a warm start from the latest snapshot (then only the delta since its
+    last_refresh_date is fetched), or a cold start (blocking ~2 mins, the course data loads in the background).
+    """
+    import core.data_loader as data_loader
+
+    if data_loader.warm_start():
+        threading.Thread(target=data_loader.refresh_all_data, daemon=True).start()
+    else:
+        data_loader.init_minimal_data()  # Blocking: ~2 mins
+        threading.Thread(target=data_loader.background_load_user_actions, daemon=True).start()
+
+
+def create_scheduler():
+    """The scheduler with the loader's jobs (not started)."""
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    import core.data_loader as data_loader
+    from core.webhook_ingest import flush_buffer
+
+    # Two separate jobs for clean separation of concerns:
+    # 1. Full system reset on trimester start dates (Jan 1, May 1, Sep 1)
+    # 2. Incremental updates on all other days
+    scheduler = BackgroundScheduler()
+
+    # JOB 1: Full System Reset (Trimester Starts Only)
+    # Runs ONLY on Jan 1, May 1, Sep 1 at 3:30 AM
+    # Recalculates EVERYTHING from scratch (new courses, new users, all data)
+    # Recommendation: max_instances=1 prevents concurrent execution if previous run is still active
+    # Recommendation: coalesce=True skips missed runs if job overlaps
+    scheduler.add_job(
+        func=data_loader.full_system_reset,
+        trigger='cron',
+        month='1,5,9',        # January, May, September only
+        day='1',              # First day of month only
+        hour=3,
+        minute=30,
+        id='trimester_full_system_reset',
+        name='Full System Reset (Trimester Start)',
+        max_instances=1,      # Prevent concurrent runs
+        coalesce=True,        # Skip missed runs if overlapping
+        replace_existing=True
+    )
+
+    # JOB 2: Incremental Daily Refresh (All Other Days)
+    # Runs at 3:15 AM every day
+    # Safety check inside refresh_all_data() skips execution on trimester start dates
+    # Fetches only delta (new actions since last_refresh_date) and merges with existing data
+    # Recommendation: max_instances=1 prevents race conditions with data structures
+    scheduler.add_job(
+        func=data_loader.refresh_all_data,
+        trigger='cron',
+        day='*',              # Every day
+        hour=3,
+        minute=15,
+        id='daily_incremental_refresh',
+        name='Daily Incremental Data Refresh',
+        max_instances=1,      # Prevent concurrent runs
+        coalesce=True,        # Skip missed runs if overlapping
+        replace_existing=True
+    )
+
+    # JOB 3: Merge buffered webhook events (micro-batches)
+    # Recomputes scores only for the courses that received events since the last run
+    scheduler.add_job(
+        func=flush_buffer,
+        trigger='interval',
+        seconds=WEBHOOK_FLUSH_INTERVAL_SECONDS,
+        id='webhook_micro_batch_flush',
+        name='Webhook Micro-batch Flush',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+    return scheduler
+
+
+# REQUESTS FROM THE WEB PROCESSES
+
+def request_reset_resume():
+    """Ask the loader worker to resume the last failed full system reset (called by readers)."""
+    os.makedirs(REQUEST_DIR, exist_ok=True)
+    name = f"{time.time_ns()}-{os.getpid()}"
+    tmp_path = os.path.join(REQUEST_DIR, f".{name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"action": RESET_RESUME_REQUEST, "requested_at": time.time()}, f)
+    os.replace(tmp_path, os.path.join(REQUEST_DIR, f"{name}.json"))
+
+
+def _handle_requests():
+    import core.data_loader as data_loader
+
+    if not os.path.isdir(REQUEST_DIR):
+        return
+    for name in sorted(name for name in os.listdir(REQUEST_DIR) if name.endswith(".json")):
+        path = os.path.join(REQUEST_DIR, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                action = json.load(f)["action"]
+        except (OSError, ValueError, KeyError) as e:
+            action = None
+            logger.warning(f"Unreadable loader request dropped | function: _handle_requests | file: {name} | error: {e}")
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        if action == RESET_RESUME_REQUEST:
+            started = data_loader.resume_full_system_reset()
+            logger.info(f"Reset resume requested by a web process | function: _handle_requests | started: {started}")
+
+
+# THE WORKER PROCESS
+
+def _parent_exited(parent_pid):
+    return parent_pid is not None and os.getppid() != parent_pid  # Orphans are re-parented (a dead parent may linger as a zombie)
+
+
+def run(parent_pid=None):
+    """
+    Runs the loader until SIGTERM/SIGINT (or until `parent_pid` exits): the initial load,
+    the scheduled jobs and the requests of the web processes. Waits first while another
+    loader of the same store is still running (e.g. the one of a leader that just died).
+    """
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+
+    loader_lock = try_acquire(LOADER_LOCK_FILE)  # Held until this process exits
+    if loader_lock is None:
+        logger.info(f"Waiting for the previous loader to exit | function: run | pid: {os.getpid()}")
+        while loader_lock is None:
+            if stop.wait(LOADER_POLL_SECONDS) or _parent_exited(parent_pid):
+                return
+            loader_lock = try_acquire(LOADER_LOCK_FILE)
+
+    logger.info(f"Loader worker started | function: run | pid: {os.getpid()} | parent_pid: {parent_pid}")
+    start_loading()
+    scheduler = create_scheduler()
+    scheduler.start()
+    try:
+        while not stop.wait(LOADER_POLL_SECONDS):
+            if _parent_exited(parent_pid):
+                logger.info(f"Parent process exited, stopping | function: run | parent_pid: {parent_pid}")
+                break
+            _handle_requests()
+    finally:
+        scheduler.shutdown(wait=False)  # An interrupted reset resumes from its checkpoint on the next start
+    logger.info(f"Loader worker stopped | function: run | pid: {os.getpid()}")
+
+
+def start_loader_process():
+    """
+    Starts the loader worker as a child of this (web) process and restarts it, after
+    LOADER_RESTART_DELAY_SECONDS, whenever it exits. Returns the supervising thread.
+    """
+    def supervise():
+        while True:
+            command = [sys.executable, "-m", "core.loader_worker", "--parent-pid", str(os.getpid())]
+            process = subprocess.Popen(command, env=dict(os.environ, DATA_ROLE="loader"))
+            logger.info(f"Loader worker process started | function: start_loader_process | pid: {process.pid}")
+            return_code = process.wait()
+            logger.error(f"Loader worker process exited, restarting | function: start_loader_process | pid: {process.pid} | return_code: {return_code} | restart_in_sec: {LOADER_RESTART_DELAY_SECONDS}")
+            time.sleep(LOADER_RESTART_DELAY_SECONDS)
+
+    thread = threading.Thread(target=supervise, daemon=True, name="loader-supervisor")
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the data loader as its own process, publishing generations to ARROW_STORE_DIR.")
+    parser.add_argument("--parent-pid", type=int, default=None, help="Exit when this process exits (set when started by the web process)")
+    args = parser.parse_args()
+    init_logging()
+    run(parent_pid=args.parent_pid)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Persistent on-disk cache for Discourse query pages.
+
+Sits in front of the network fetch in core/execute_query.py. Each page is stored
+as one JSON file keyed by `(query_id, params, page)`:
+
+- Per-query TTLs (QUERY_CACHE_TTL_SECONDS). Pages whose `end_date` lies before
+  today belong to a closed trimester and never expire.
+- Pages of one crawl are stamped with the time page 0 was fetched. A cached page
+  of a still-changing result is only reused within the same crawl stamp, so a
+  crawl never mixes pages fetched at different times (rows shift between pages
+  as new actions arrive).
+- Writes are atomic (temp file + os.replace), so a crash never leaves a torn entry.
+- A total size cap with LRU eviction; reads refresh the file mtime, which is the
+  recency used for eviction.
+- In dev mode entries never expire, so a populated cache directory replaces the
+  old `TRASH/data/*.csv` shortcut and dev runs work offline.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import date, datetime
+
+from application.constants import (
+    env,
+    QUERY_CACHE_ENABLED,
+    QUERY_CACHE_DIR,
+    QUERY_CACHE_MAX_BYTES,
+    QUERY_CACHE_TTL_SECONDS,
+)
+from core.logging_config import get_logger
+
+logger = get_logger("core.query_cache")
+
+_size_lock = threading.Lock()
+_total_bytes = None  # Lazily computed from the directory on first write
+
+
+def _cache_key(query_id, query_params, page):
+    key_material = json.dumps({"query_id": query_id, "params": query_params or {}, "page": page}, sort_keys=True)
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+def _entry_path(query_id, query_params, page):
+    return os.path.join(QUERY_CACHE_DIR, str(query_id), f"{_cache_key(query_id, query_params, page)}.json")
+
+
+def _parse_query_date(value):
+    # Query dates are 'dd-mm-yyyy'; get_trimester_dates() emits '30/04-yyyy' for t1
+    try:
+        return datetime.strptime(str(value).replace("/", "-"), "%d-%m-%Y").date()
+    except ValueError:
+        return None
+
+
+def is_immutable(query_params):
+    """True when the query window ended before today, i.e. the result can no longer change."""
+    if not query_params or "end_date" not in query_params:
+        return False
+    end_date = _parse_query_date(query_params["end_date"])
+    return end_date is not None and end_date < date.today()
+
+
+def lookup(query_id, query_params, page, crawl_stamp=None):
+    """
+    Return `(json_response, crawl_stamp)` for a valid cached page, or None on a miss.
+
+    Args:
+        crawl_stamp (float | None): Stamp of the current crawl (from page 0). Pages of
+            mutable results are only reused when they were stored under the same stamp.
+    """
+    if not QUERY_CACHE_ENABLED:
+        return None
+    path = _entry_path(query_id, query_params, page)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        logger.warning(f"Unreadable cache entry ignored | function: lookup | query_id: {query_id} | page: {page} | path: {path}")
+        return None
+
+    if not (entry["immutable"] or env == "dev"):
+        ttl = QUERY_CACHE_TTL_SECONDS.get(query_id, 0)
+        if time.time() - entry["crawl_stamp"] > ttl:
+            return None
+        if page > 0 and entry["crawl_stamp"] != crawl_stamp:
+            return None
+
+    try:
+        os.utime(path)  # Mark as recently used for LRU eviction
+    except OSError:
+        pass
+    logger.debug(f"Cache hit | function: lookup | query_id: {query_id} | page: {page}", extra={"query_id": query_id, "page": page})
+    return entry["response"], entry["crawl_stamp"]
+
+
+def store(query_id, query_params, page, json_response, crawl_stamp=None):
+    """
+    Atomically write one page to the cache and return the crawl stamp it was stored under.
+
+    Page 0 starts a new crawl stamp (the current time) unless one is given.
+    """
+    if crawl_stamp is None:
+        crawl_stamp = time.time()
+    if not QUERY_CACHE_ENABLED:
+        return crawl_stamp
+
+    path = _entry_path(query_id, query_params, page)
+    entry = {
+        "query_id": query_id,
+        "params": query_params,
+        "page": page,
+        "crawl_stamp": crawl_stamp,
+        "immutable": is_immutable(query_params),
+        "response": json_response,
+    }
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, separators=(",", ":"))
+            size = os.path.getsize(tmp_path)
+            try:
+                replaced_size = os.path.getsize(path)  # A re-fetched page overwrites its old entry
+            except FileNotFoundError:
+                replaced_size = 0
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning(f"Could not write cache entry | function: store | query_id: {query_id} | page: {page} | error: {e}")
+        return crawl_stamp
+
+    _account_and_evict(size - replaced_size)
+    return crawl_stamp
+
+
+def _iter_entries():
+    for root, _dirs, files in os.walk(QUERY_CACHE_DIR):
+        for name in files:
+            if name.endswith(".json"):
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+
+def _account_and_evict(added_bytes):
+    global _total_bytes
+    with _size_lock:
+        if _total_bytes is None:
+            _total_bytes = sum(size for _path, size, _mtime in _iter_entries())
+        else:
+            _total_bytes += added_bytes
+        if _total_bytes <= QUERY_CACHE_MAX_BYTES:
+            return
+
+        # Evict least recently used entries until we are back under 90% of the cap
+        target = QUERY_CACHE_MAX_BYTES * 0.9
+        entries = sorted(_iter_entries(), key=lambda entry: entry[2])
+        _total_bytes = sum(size for _path, size, _mtime in entries)
+        evicted = 0
+        for path, size, _mtime in entries:
+            if _total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+                _total_bytes -= size
+                evicted += 1
+            except OSError:
+                continue
+    logger.info(f"Query cache evicted entries | function: _account_and_evict | evicted: {evicted} | total_bytes: {_total_bytes} | max_bytes: {QUERY_CACHE_MAX_BYTES}")
+
+
+def clear(query_id=None):
+    """Delete every cached page (or only those of one query id)."""
+    global _total_bytes
+    target_dir = QUERY_CACHE_DIR if query_id is None else os.path.join(QUERY_CACHE_DIR, str(query_id))
+    with _size_lock:
+        for root, _dirs, files in os.walk(target_dir):
+            for name in files:
+                try:
+                    os.remove(os.path.join(root, name))
+                except OSError:
+                    pass
+        _total_bytes = None
+    logger.info(f"Query cache cleared | function: clear | query_id: {query_id}")
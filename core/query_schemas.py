@@ -0,0 +1,135 @@
+"""Typed column schemas for the Discourse queries (102, 103, 107, 108).
+
+Pages are decoded column-wise straight from the `columns`/`rows` payload into
+compact dtypes instead of going through per-row dicts and pandas inference:
+
+- ids      -> int32 (int64 if a value does not fit, nullable if a value is missing)
+- counts   -> int16 (per-user counts are small; int32/int64 if a value does not fit, nullable as above)
+- category -> pandas categorical (`action_type`, `action_name`)
+- datetime -> tz-aware (UTC) datetime64, parsed once here so processors never re-parse
+- text     -> object
+
+Columns a schema does not list are left to pandas inference, so new query
+columns keep working until they are added here.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+ID = "id"
+COUNT = "count"
+CATEGORY = "category"
+DATETIME = "datetime"
+TEXT = "text"
+
+INT_DTYPES = {ID: (np.int32, np.int64), COUNT: (np.int16, np.int32, np.int64)}  # Tried in order; the first that fits wins
+
+QUERY_SCHEMAS = {
+    102: {  # Overall engagement, one row per user
+        "user_id": ID,
+        "likes_received": COUNT,
+        "likes_given": COUNT,
+        "days_visited": COUNT,
+        "solutions": COUNT,
+        "topics_created": COUNT,
+        "posts_created": COUNT,
+        "topics_viewed": COUNT,
+        "posts_read": COUNT,
+    },
+    103: {  # Course-specific user actions, one row per action
+        "user_id": ID,
+        "acting_user_id": ID,
+        "target_user_id": ID,
+        "target_topic_id": ID,
+        "target_post_id": ID,
+        "category_id": ID,
+        "action_type": CATEGORY,
+        "action_name": CATEGORY,
+        "created_at": DATETIME,
+        "acting_username": TEXT,
+        "topic_title": TEXT,
+    },
+    107: {  # Category id -> name
+        "category_id": ID,
+        "parent_category_id": ID,
+        "name": TEXT,
+        "topic_count": COUNT,
+        "post_count": COUNT,
+    },
+    108: {  # User id -> username
+        "user_id": ID,
+        "username": TEXT,
+    },
+}
+
+
+def _decode_int_column(values, dtypes):
+    for dtype in dtypes:
+        try:
+            return np.array(values, dtype=dtype)
+        except OverflowError:
+            continue
+        except (TypeError, ValueError):
+            break
+    # Missing or non-numeric values: fall back to a nullable integer column
+    numeric = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+    present = numeric.dropna()
+    for dtype in dtypes[:-1]:
+        if present.between(np.iinfo(dtype).min, np.iinfo(dtype).max).all():
+            return numeric.astype(dtype.__name__.capitalize()).array  # e.g. "Int16"
+    return numeric.astype("Int64").array
+
+
+def _decode_column(values, kind):
+    match kind:
+        case "id" | "count":
+            return _decode_int_column(values, INT_DTYPES[kind])
+        case "category":
+            return pd.Categorical(values)
+        case "datetime":
+            return pd.to_datetime(pd.Series(values, dtype=object), format="mixed", utc=True, errors="coerce").array  # Handles UTC & IST offsets
+        case "text":
+            return np.array(values, dtype=object)
+        case _:
+            return pd.Series(values).array
+
+
+def decode_page(query_id, columns, rows):
+    """
+    Build a typed DataFrame from one page of a Discourse query response.
+
+    Args:
+        query_id (int): Discourse query id; selects the schema from QUERY_SCHEMAS.
+        columns (list[str]): The `columns` field of the response.
+        rows (list[list]): The `rows` field of the response.
+    """
+    if not rows:
+        return pd.DataFrame(columns=columns)
+    schema = QUERY_SCHEMAS.get(query_id, {})
+    data = {
+        name: _decode_column(values, schema.get(name))
+        for name, values in zip(columns, zip(*rows))  # zip(*rows) transposes the page into columns
+    }
+    return pd.DataFrame(data, copy=False)
+
+
+def concat_frames(frames):
+    """
+    Concatenate decoded frames (pages of one query, or stored + newly fetched rows).
+
+    Categorical columns are re-aligned to the union of their categories first, so
+    they stay categorical instead of silently falling back to object dtype.
+    Empty frames (e.g. the placeholders created by init_minimal_data) are skipped.
+    """
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+
+    for column in frames[0].columns:
+        if not all(column in frame.columns and isinstance(frame[column].dtype, pd.CategoricalDtype) for frame in frames):
+            continue
+        categories = union_categoricals([frame[column] for frame in frames], sort_categories=True).categories
+        frames = [frame.assign(**{column: frame[column].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,134 @@
+"""Process-wide rate limiting for Discourse API calls.
+
+A single token bucket is shared by every thread that talks to Discourse, so the
+total request rate stays within the forum's quota no matter how many pages or
+courses are being fetched concurrently. The bucket adapts to the server:
+a 429 halves the rate and pauses all callers for the `Retry-After` period, and
+every successful call nudges the rate back towards the configured value (AIMD).
+"""
+import email.utils
+import threading
+import time
+from datetime import datetime, timezone
+
+from application.constants import DISCOURSE_RATE_LIMIT_RPS, DISCOURSE_RATE_LIMIT_BURST
+from core.logging_config import get_logger
+
+logger = get_logger("core.rate_limiter")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate (float): Sustained requests per second.
+        burst (int): Maximum number of requests that may be sent back-to-back.
+        min_rate (float): Floor the adaptive rate never drops below.
+        recovery_step (float): Fraction of `rate` regained after each successful call.
+    """
+
+    def __init__(self, rate, burst, min_rate=None, recovery_step=0.05):
+        if rate <= 0 or burst < 1:
+            raise ValueError("Rate must be positive and burst must be at least 1.")
+        self.configured_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = int(burst)
+        self.min_rate = float(min_rate) if min_rate is not None else self.configured_rate / 8
+        self.recovery_step = recovery_step
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()  # may lie in the future while callers are paused after a 429
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if now > self._updated_at:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+
+    def reserve(self, max_delay=None):
+        """
+        Take one token and return how many seconds the caller must wait before sending.
+
+        The token is reserved immediately, so callers that are told to wait are
+        served in arrival order. Sync callers sleep on the result (see `acquire`);
+        async callers can `await asyncio.sleep(bucket.reserve())`.
+        With `max_delay`, a caller that would have to wait longer gets None and no token is taken.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            pause = max(self._updated_at - now, 0.0)
+            deficit = max(1 - self._tokens, 0.0) / self.rate
+            if max_delay is not None and pause + deficit > max_delay:
+                return None
+            self._tokens -= 1
+            return pause + deficit
+
+    def acquire(self):
+        """Block the current thread until a request may be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    def on_rate_limited(self, retry_after):
+        """
+        Record a 429 from the server.
+
+        Halves the current rate and pauses every caller for `retry_after` seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            previous_rate = self.rate
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+            self._updated_at = max(self._updated_at, now + retry_after)
+        logger.warning(f"Rate limit hit, slowing down | function: TokenBucket.on_rate_limited | retry_after_sec: {retry_after} | rate_before: {round(previous_rate, 3)} | rate_after: {round(self.rate, 3)}")
+
+    def on_success(self):
+        """Record a successful call; slowly recovers the rate after earlier 429s."""
+        if self.rate >= self.configured_rate:
+            return
+        with self._lock:
+            self.rate = min(self.configured_rate, self.rate + self.configured_rate * self.recovery_step)
+
+    def stats(self):
+        with self._lock:
+            return {"rate": round(self.rate, 3), "configured_rate": self.configured_rate, "burst": self.burst, "tokens": round(self._tokens, 2)}
+
+
+def parse_retry_after(header_value, default=None):
+    """
+    Parse a `Retry-After` header (delta-seconds or an HTTP date) into seconds.
+
+    Returns `default` when the header is missing or malformed.
+    """
+    if not header_value:
+        return default
+    try:
+        return max(float(header_value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(header_value)
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+_discourse_limiter = None
+_discourse_limiter_lock = threading.Lock()
+
+
+def get_discourse_rate_limiter():
+    """Return the process-wide token bucket that every Discourse call goes through."""
+    global _discourse_limiter
+    if _discourse_limiter is None:
+        with _discourse_limiter_lock:
+            if _discourse_limiter is None:
+                _discourse_limiter = TokenBucket(rate=DISCOURSE_RATE_LIMIT_RPS, burst=DISCOURSE_RATE_LIMIT_BURST)
+                logger.info(f"Discourse rate limiter created | function: get_discourse_rate_limiter | rate_per_sec: {DISCOURSE_RATE_LIMIT_RPS} | burst: {DISCOURSE_RATE_LIMIT_BURST}")
+    return _discourse_limiter
@@ -0,0 +1,156 @@
+"""Checkpoints for the full data load (startup load and full_system_reset).
+
+The load is split into units: one per (term, course) for query 103 and one per
+term for the overall query 102. Every unit is pickled to disk as soon as it
+finishes, and a manifest lists the finished units. When a load fails part-way
+or the process dies, the next load (a restart, or the admin resume trigger)
+reads the finished units back and only fetches the missing ones.
+
+A checkpoint belongs to one set of terms. Units of closed terms stay valid
+forever; units of the current term are only reused on the day they were
+written, since later actions would otherwise be lost (the daily refresh only
+fetches from the load date onwards). Files are written atomically (temp file +
+os.replace), so a crash never leaves a torn unit or manifest.
+"""
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from datetime import date
+
+from application.constants import RESET_CHECKPOINT_ENABLED, RESET_CHECKPOINT_DIR
+from core.logging_config import get_logger
+from core.utils import get_current_trimester
+
+logger = get_logger("core.reset_checkpoint")
+
+MANIFEST_FILE = "manifest.json"
+
+
+def course_unit(term, category_name):
+    return f"course|{term}|{category_name}"
+
+
+def overall_unit(term):
+    return f"overall|{term}"
+
+
+def _atomic_write(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ResetCheckpoint:
+    """
+    Finished units of one full data load.
+
+    Args:
+        terms (list[str]): Terms being loaded, e.g. ['t3-2025', 't2-2025', 't1-2025'].
+        directory (str): Where units and the manifest are stored.
+    """
+
+    def __init__(self, terms, directory=RESET_CHECKPOINT_DIR):
+        self.terms = list(terms)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._units = {}  # unit -> {"file": str, "written_on": "yyyy-mm-dd"}
+        self._failed = {}  # unit -> error message, for units that failed in this load
+        if RESET_CHECKPOINT_ENABLED:
+            os.makedirs(self.directory, exist_ok=True)
+            self._load_manifest()
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, MANIFEST_FILE)
+
+    def _load_manifest(self):
+        try:
+            with open(self._manifest_path(), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError):
+            logger.warning(f"Unreadable checkpoint manifest ignored | function: ResetCheckpoint._load_manifest | dir: {self.directory}")
+            return
+        if manifest.get("terms") != self.terms:
+            logger.info(f"Checkpoint belongs to other terms, starting fresh | function: ResetCheckpoint._load_manifest | checkpoint_terms: {manifest.get('terms')} | terms: {self.terms}")
+            self.clear()
+            return
+
+        current_term, today = get_current_trimester(), date.today().isoformat()
+        for unit, entry in manifest.get("units", {}).items():
+            if unit.split("|")[1] == current_term and entry["written_on"] != today:
+                continue  # Current-term data from an earlier day misses the actions since then
+            if os.path.exists(os.path.join(self.directory, entry["file"])):
+                self._units[unit] = entry
+        logger.info(f"Checkpoint found | function: ResetCheckpoint._load_manifest | reusable_units: {len(self._units)} | terms: {self.terms}")
+
+    def _write_manifest(self):
+        # Caller must hold self._lock
+        manifest = {"terms": self.terms, "units": self._units}
+        _atomic_write(self._manifest_path(), json.dumps(manifest, indent=1).encode("utf-8"))
+
+    def has(self, unit):
+        with self._lock:
+            return unit in self._units
+
+    def load(self, unit):
+        """Return the stored dataframes of a finished unit, or None if it is missing or unreadable."""
+        with self._lock:
+            entry = self._units.get(unit)
+        if entry is None:
+            return None
+        try:
+            with open(os.path.join(self.directory, entry["file"]), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f"Unreadable checkpoint unit, refetching | function: ResetCheckpoint.load | unit: {unit} | error: {e}")
+            with self._lock:
+                self._units.pop(unit, None)
+            return None
+
+    def save(self, unit, dataframes):
+        """Persist one finished unit (a tuple of dataframes) and record it in the manifest."""
+        if not RESET_CHECKPOINT_ENABLED:
+            return
+        file_name = hashlib.sha1(unit.encode("utf-8")).hexdigest()[:16] + ".pkl"
+        try:
+            _atomic_write(os.path.join(self.directory, file_name), pickle.dumps(dataframes, protocol=pickle.HIGHEST_PROTOCOL))
+            with self._lock:
+                self._units[unit] = {"file": file_name, "written_on": date.today().isoformat()}
+                self._write_manifest()
+        except OSError as e:
+            logger.warning(f"Could not write checkpoint unit | function: ResetCheckpoint.save | unit: {unit} | error: {e}")
+
+    def mark_failed(self, unit, error):
+        with self._lock:
+            self._failed[unit] = str(error)
+
+    def failed_units(self):
+        with self._lock:
+            return dict(self._failed)
+
+    def completed_units(self):
+        with self._lock:
+            return sorted(self._units)
+
+    def clear(self):
+        """Delete the checkpoint (after a load that finished every unit)."""
+        with self._lock:
+            self._units = {}
+            self._failed = {}
+            if os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except OSError:
+                        pass
+        logger.info(f"Checkpoint cleared | function: ResetCheckpoint.clear | dir: {self.directory}")
@@ -0,0 +1,233 @@
+"""Versioned on-disk snapshots of the loaded data, for warm restarts.
+
+After every full load, reset and daily refresh the loader writes the whole
+store to SNAPSHOT_DIR/<version>/ as Parquet files plus a manifest.json:
+
+    <version>/
+        manifest.json                         written last; a version without it is incomplete
+        df_map_category_to_id.parquet
+        id_username_mapping.parquet
+        dimensions/users.parquet, topics.parquet  shared user/topic dimensions of the course frames (core/dimensions.py)
+        terms/<term>/user_actions.parquet     the term's long tables (core/term_table.py), partitioned by category_id
+        terms/<term>/action_counts.parquet
+        terms/<term>/merge_states.parquet     row fingerprints of the courses' merge states (core/action_merge.py)
+        terms/<term>/overall/<frame>.parquet  raw_metrics, unnormalized_scores, log_normalized_scores, window_metrics (query-102 partitions)
+        webhook_rows/<term>/<course>.parquet  webhook rows still awaiting the nightly reconciliation
+
+The manifest records last_refresh_date, the uncategorized course list, the
+courses (and category_id) of every term, the merge watermark of every course
+with a merge state, and the row count of every frame.
+Course score frames are not written; they are derived from action_counts again.
+The version directory is built under a temporary name and renamed into place,
+so readers never see a half-written snapshot. On startup the newest version
+whose manifest and files check out is loaded (older ones are tried if it is
+damaged). After that only an incremental refresh from
+last_refresh_date is needed. The newest SNAPSHOT_KEEP versions are kept.
+
+Empty frames (e.g. terms without activity) are not written; the manifest marks them.
+"""
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from application.constants import SNAPSHOT_ENABLED, SNAPSHOT_DIR, SNAPSHOT_KEEP
+from core.logging_config import get_logger
+
+logger = get_logger("core.snapshot")
+
+SNAPSHOT_FORMAT_VERSION = 4  # Other versions are unusable (a cold load runs instead)
+MANIFEST_FILE = "manifest.json"
+TERM_TABLES = ("user_actions", "action_counts")
+OVERALL_FRAMES = ("raw_metrics", "unnormalized_scores", "log_normalized_scores", "window_metrics")
+
+
+def _write_frame(version_dir, relative_path, df, frames_manifest):
+    if df is None or df.empty:
+        frames_manifest[relative_path] = {"rows": 0, "empty": True}
+        return
+    path = os.path.join(version_dir, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df.to_parquet(path, engine="pyarrow", index=False)
+    frames_manifest[relative_path] = {"rows": len(df), "empty": False}
+
+
+def _read_frame(version_dir, relative_path, frames_manifest):
+    entry = frames_manifest[relative_path]
+    if entry["empty"]:
+        return pd.DataFrame()
+    df = pd.read_parquet(os.path.join(version_dir, relative_path), engine="pyarrow")
+    if len(df) != entry["rows"]:
+        raise ValueError(f"row count mismatch for {relative_path}: {len(df)} != {entry['rows']}")
+    return df
+
+
+def _merge_state_frame(term_table):
+    """The fingerprints of every course with a merge state, in partition order, and {course: watermark}."""
+    states = term_table.merge_states()
+    courses = [course for course in term_table.categories if course in states]
+    if not courses:
+        return pd.DataFrame(), {}
+    fingerprints = pd.DataFrame({
+        "category_id": np.repeat(np.array([term_table.categories[course] for course in courses], dtype=np.int32), [len(states[course].fingerprints) for course in courses]),
+        "fingerprint": np.concatenate([states[course].fingerprints for course in courses]),
+    })
+    watermarks = {course: None if states[course].watermark is None else states[course].watermark.isoformat() for course in courses}
+    return fingerprints, watermarks
+
+
+def _merge_states_from_frame(fingerprints, watermarks, categories, user_actions):
+    """{course: MergeState} (frame=None) read back; a state that does not match its partition's row count is dropped."""
+    from core.action_merge import MergeState
+
+    if fingerprints.empty or user_actions.empty:
+        return {}
+    partition_rows = user_actions["category_id"].value_counts()
+    keys = fingerprints["category_id"].to_numpy()  # Sorted, like the partitions
+    values = fingerprints["fingerprint"].to_numpy(dtype=np.uint64)
+    merge_states = {}
+    for course, watermark in watermarks.items():
+        category_id = categories.get(course)
+        if category_id is None:
+            continue
+        start, stop = np.searchsorted(keys, category_id, side="left"), np.searchsorted(keys, category_id, side="right")
+        if stop - start != partition_rows.get(category_id, 0):
+            continue  # Rebuilt from the rows on first use instead
+        course_fingerprints = values[start:stop]
+        merge_states[course] = MergeState(None, course_fingerprints, np.sort(course_fingerprints), None if watermark is None else pd.Timestamp(watermark))
+    return merge_states
+
+
+def write_snapshot(state):
+    """
+    Write a new snapshot version and prune old ones.
+
+    Args:
+        state (dict): user_actions_dictionaries ({term: TermTable}), df_map_category_to_id, id_username_mapping,
+            last_refresh_date, uncategorized_courses, webhook_rows ({(term, course): df}) and the
+            users/topics dimension frames.
+
+    Returns:
+        str | None: The version written, or None when snapshots are disabled or the write failed.
+    """
+    if not SNAPSHOT_ENABLED:
+        return None
+    start_time = time.perf_counter()
+    version = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    tmp_dir = os.path.join(SNAPSHOT_DIR, f".tmp-{version}")
+    frames_manifest = {}
+    try:
+        os.makedirs(tmp_dir)
+        _write_frame(tmp_dir, "df_map_category_to_id.parquet", state["df_map_category_to_id"], frames_manifest)
+        _write_frame(tmp_dir, "id_username_mapping.parquet", state["id_username_mapping"], frames_manifest)
+        _write_frame(tmp_dir, "dimensions/users.parquet", state["users"], frames_manifest)
+        _write_frame(tmp_dir, "dimensions/topics.parquet", state["topics"], frames_manifest)
+        watermarks = {}
+        for term, term_table in state["user_actions_dictionaries"].items():
+            for table_name in TERM_TABLES:
+                _write_frame(tmp_dir, f"terms/{term}/{table_name}.parquet", getattr(term_table, table_name), frames_manifest)
+            merge_state_fingerprints, watermarks[term] = _merge_state_frame(term_table)
+            _write_frame(tmp_dir, f"terms/{term}/merge_states.parquet", merge_state_fingerprints, frames_manifest)
+            for frame_name in OVERALL_FRAMES:
+                _write_frame(tmp_dir, f"terms/{term}/overall/{frame_name}.parquet", term_table.overall.get(frame_name), frames_manifest)
+        for (term, course), df in state.get("webhook_rows", {}).items():
+            _write_frame(tmp_dir, f"webhook_rows/{term}/{course}.parquet", df, frames_manifest)
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "version": version,
+            "created_at": datetime.now().isoformat(),
+            "last_refresh_date": state["last_refresh_date"],
+            "uncategorized_courses": list(state.get("uncategorized_courses") or []),
+            "terms": {term: term_table.categories for term, term_table in state["user_actions_dictionaries"].items()},
+            "merge_watermarks": watermarks,
+            "frames": frames_manifest,
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_dir, os.path.join(SNAPSHOT_DIR, version))  # Publish the complete version in one step
+    except Exception as e:
+        logger.error(f"Snapshot write failed | function: write_snapshot | version: {version} | error: {e}", exc_info=True)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+
+    _prune_old_versions()
+    logger.info(f"Snapshot written | function: write_snapshot | version: {version} | frames: {len(frames_manifest)} | duration_sec: {round(time.perf_counter() - start_time, 2)}")
+    return version
+
+
+def _list_versions():
+    if not os.path.isdir(SNAPSHOT_DIR):
+        return []
+    return sorted((name for name in os.listdir(SNAPSHOT_DIR) if not name.startswith(".")), reverse=True)
+
+
+def _prune_old_versions():
+    for name in os.listdir(SNAPSHOT_DIR):
+        if name.startswith(".tmp-"):  # Left behind by a crash during a write
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, name), ignore_errors=True)
+    for version in _list_versions()[SNAPSHOT_KEEP:]:
+        shutil.rmtree(os.path.join(SNAPSHOT_DIR, version), ignore_errors=True)
+
+
+def _read_version(version):
+    version_dir = os.path.join(SNAPSHOT_DIR, version)
+    with open(os.path.join(version_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    format_version = manifest.get("format_version")
+    if format_version != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"unsupported snapshot format {format_version}")
+    frames = manifest["frames"]
+
+    from core.term_table import TermTable
+
+    user_actions_dictionaries = {}
+    for term, courses in manifest["terms"].items():
+        user_actions, action_counts = (_read_frame(version_dir, f"terms/{term}/{table_name}.parquet", frames) for table_name in TERM_TABLES)
+        watermarks = manifest.get("merge_watermarks", {}).get(term)  # Missing in snapshots written before merge states were kept
+        user_actions_dictionaries[term] = TermTable(
+            courses,
+            user_actions,
+            action_counts,
+            overall={frame_name: _read_frame(version_dir, f"terms/{term}/overall/{frame_name}.parquet", frames) for frame_name in OVERALL_FRAMES},
+            merge_states=_merge_states_from_frame(_read_frame(version_dir, f"terms/{term}/merge_states.parquet", frames), watermarks, courses, user_actions) if watermarks else None,
+        )
+
+    webhook_rows = {}
+    for relative_path in frames:
+        if relative_path.startswith("webhook_rows/"):
+            _prefix, term, file_name = relative_path.split("/")
+            webhook_rows[(term, file_name[:-len(".parquet")])] = _read_frame(version_dir, relative_path, frames)
+
+    return {
+        "version": version,
+        "user_actions_dictionaries": user_actions_dictionaries,
+        "df_map_category_to_id": _read_frame(version_dir, "df_map_category_to_id.parquet", frames),
+        "id_username_mapping": _read_frame(version_dir, "id_username_mapping.parquet", frames),
+        "users": _read_frame(version_dir, "dimensions/users.parquet", frames),
+        "topics": _read_frame(version_dir, "dimensions/topics.parquet", frames),
+        "last_refresh_date": manifest["last_refresh_date"],
+        "uncategorized_courses": manifest["uncategorized_courses"],
+        "webhook_rows": webhook_rows,
+    }
+
+
+def load_latest_snapshot():
+    """Return the state of the newest valid snapshot (same keys as write_snapshot takes), or None."""
+    if not SNAPSHOT_ENABLED:
+        return None
+    for version in _list_versions():
+        start_time = time.perf_counter()
+        try:
+            state = _read_version(version)
+        except Exception as e:
+            logger.warning(f"Snapshot unusable, trying an older one | function: load_latest_snapshot | version: {version} | error: {e}")
+            continue
+        logger.info(f"Snapshot loaded | function: load_latest_snapshot | version: {version} | last_refresh_date: {state['last_refresh_date']} | duration_sec: {round(time.perf_counter() - start_time, 2)}")
+        return state
+    logger.info("No usable snapshot found | function: load_latest_snapshot")
+    return None
@@ -0,0 +1,310 @@
+"""Embedded SQL engine over the loaded data.
+
+Ad-hoc questions (filters, group-bys, top-N) can be asked in SQL instead of
+filtering whole pandas frames per request. The engine runs in-process, with no
+service to run:
+
+    duckdb  each term is registered as one chunked Arrow table whose chunks are the
+            course partitions of its TermTable (core/term_table.py); DuckDB scans
+            them in place, and only partitions that changed are converted again
+    sqlite  fallback when duckdb is not installed (stdlib); the rows of changed
+            partitions are copied into an in-memory database
+
+SQL_ENGINE picks the engine ("auto": duckdb if installed, else sqlite; "off":
+callers keep their pandas paths). Both engines expose the same tables:
+
+    user_actions   term, category_id, user_key, action_type, target_topic_id, target_post_id, created_at
+    action_counts  term, category_id, user_key, action_name, count
+    courses        term, course, category_id
+    users          user_key, username                                (core/dimensions.py)
+    topics         topic_id, topic_title, created_at, category_id
+
+Before every query the engine is synced with the caller's data generation; only
+the terms whose TermTable changed since the last sync are registered again, and
+within them only the partitions that are not the ones already loaded.
+Queries use `?` parameters; timestamps are passed as pandas Timestamps and
+returned as datetime64[UTC] for the columns listed in parse_dates.
+"""
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import pyarrow as pa
+
+from application.constants import SQL_ENGINE
+from core.logging_config import get_logger
+
+try:
+    import duckdb
+except ImportError:  # Optional: the sqlite engine is used instead
+    duckdb = None
+
+logger = get_logger("core.sql_engine")
+
+TABLES = {
+    "user_actions": {"term": "VARCHAR", "category_id": "INTEGER", "user_key": "INTEGER", "action_type": "INTEGER", "target_topic_id": "BIGINT", "target_post_id": "BIGINT", "created_at": "TIMESTAMPTZ"},
+    "action_counts": {"term": "VARCHAR", "category_id": "INTEGER", "user_key": "INTEGER", "action_name": "VARCHAR", "count": "INTEGER"},
+    "courses": {"term": "VARCHAR", "course": "VARCHAR", "category_id": "INTEGER"},
+    "users": {"user_key": "INTEGER", "username": "VARCHAR"},
+    "topics": {"topic_id": "BIGINT", "topic_title": "VARCHAR", "created_at": "TIMESTAMPTZ", "category_id": "INTEGER"},
+}
+TERM_TABLES = ("user_actions", "action_counts")  # One part per term, one chunk per course
+SQLITE_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"  # UTC; fixed width, so text order is time order
+SQLITE_INDEXES = (
+    "CREATE INDEX user_actions_course ON user_actions (term, category_id, action_type)",
+    "CREATE INDEX user_actions_topic ON user_actions (term, category_id, target_topic_id)",
+    "CREATE INDEX action_counts_course ON action_counts (term, category_id)",
+)
+
+
+def _quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _courses_frame(user_actions_dictionaries):
+    rows = [(term, course, category_id) for term, term_table in user_actions_dictionaries.items() for course, category_id in term_table.categories.items()]
+    return pd.DataFrame(rows, columns=list(TABLES["courses"]))
+
+
+class _Engine:
+    """Common sync logic; subclasses load tables into their database."""
+
+    name = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._term_tables = {}  # term -> TermTable currently loaded
+        self._frames = {}  # table name -> DataFrame currently loaded (courses, users, topics)
+
+    def sync(self, generation):
+        """Load the term tables and dimensions of `generation` that differ from the loaded ones."""
+        from core.data_loader import dimensions_of
+
+        user_actions_dictionaries = generation.user_actions_dictionaries
+        user_dimension, topic_dimension = dimensions_of(generation)
+        changed_terms = [term for term, term_table in user_actions_dictionaries.items() if self._term_tables.get(term) is not term_table]
+        dropped_terms = [term for term in self._term_tables if term not in user_actions_dictionaries]
+        if changed_terms or dropped_terms or "courses" not in self._frames:
+            start_time = time.perf_counter()
+            for term in dropped_terms:
+                self._drop_term(term)
+                del self._term_tables[term]
+            for term in changed_terms:
+                self._load_term(term, user_actions_dictionaries[term])
+                self._term_tables[term] = user_actions_dictionaries[term]
+            self._terms_changed()
+            self._load_frame("courses", _courses_frame(user_actions_dictionaries))
+            logger.info(f"SQL engine synced | function: sync | engine: {self.name} | terms_loaded: {changed_terms} | terms_dropped: {dropped_terms} | duration_sec: {round(time.perf_counter() - start_time, 3)}")
+        for table_name, df in (("users", user_dimension.frame()), ("topics", topic_dimension.frame())):
+            if self._frames.get(table_name) is not df:  # Dimension frames are the same object while nothing changed
+                self._load_frame(table_name, df)
+
+    def query(self, generation, sql, params=(), parse_dates=()):
+        with self._lock:
+            self.sync(generation)
+            df = self._execute(sql, [self._param(value) for value in params])
+        for column in parse_dates:
+            df[column] = pd.to_datetime(df[column], utc=True)
+        return df
+
+    def _param(self, value):
+        if hasattr(value, "item") and not isinstance(value, pd.Timestamp):  # numpy scalars
+            return value.item()
+        return value
+
+
+class DuckDBEngine(_Engine):
+    """Registers the pandas frames with an in-memory DuckDB; term parts are unioned in views."""
+
+    name = "duckdb"
+
+    def __init__(self):
+        super().__init__()
+        self._connection = duckdb.connect(":memory:")
+        self._connection.execute("SET TimeZone = 'UTC'")
+        self._term_parts = {}  # term -> {table name: (registered name, columns)}
+        self._chunks = {}  # term -> {table name: {category_id: (partition, Arrow table)}}
+        self._next_part = 0
+        self._terms_changed()
+
+    def _load_term(self, term, term_table):
+        loaded = self._chunks.get(term, {})
+        self._drop_term(term)
+        parts, chunks = {}, {}
+        for table_name in TERM_TABLES:
+            previous = loaded.get(table_name, {})
+            chunks[table_name] = {}
+            for category_id, df in term_table.parts(table_name).items():
+                chunk = previous.get(category_id)
+                if chunk is None or chunk[0] is not df:  # Partitions are replaced, never mutated in place, when they change
+                    chunk = (df, pa.Table.from_pandas(df, preserve_index=False))
+                chunks[table_name][category_id] = chunk
+            if not chunks[table_name]:
+                continue
+            table = pa.concat_tables([arrow_table for _df, arrow_table in chunks[table_name].values()], promote_options="permissive")  # Chunks are kept, no copy
+            part_name = f"{table_name}_{self._next_part}"
+            self._connection.register(part_name, table)
+            parts[table_name] = (part_name, set(table.column_names))
+        self._next_part += 1
+        self._term_parts[term] = parts
+        self._chunks[term] = chunks
+
+    def _drop_term(self, term):
+        self._chunks.pop(term, None)
+        for part_name, _columns in self._term_parts.pop(term, {}).values():
+            self._connection.unregister(part_name)
+
+    def _terms_changed(self):
+        for table_name in TERM_TABLES:
+            columns = TABLES[table_name]
+            selects = []
+            for term, parts in self._term_parts.items():
+                if table_name not in parts:
+                    continue
+                part_name, part_columns = parts[table_name]
+                select_list = ", ".join(
+                    f'{_quote(term)} AS term' if column == "term"
+                    else f'CAST("{column}" AS {column_type}) AS "{column}"' if column in part_columns
+                    else f'CAST(NULL AS {column_type}) AS "{column}"'
+                    for column, column_type in columns.items()
+                )
+                selects.append(f"SELECT {select_list} FROM {part_name}")
+            if not selects:
+                selects.append("SELECT " + ", ".join(f'CAST(NULL AS {column_type}) AS "{column}"' for column, column_type in columns.items()) + " WHERE false")
+            self._connection.execute(f"CREATE OR REPLACE VIEW {table_name} AS " + " UNION ALL ".join(selects))
+
+    def _load_frame(self, table_name, df):
+        self._connection.register(table_name, df)
+        self._frames[table_name] = df
+
+    def _execute(self, sql, params):
+        return self._connection.execute(sql, params).df()
+
+    def _param(self, value):
+        if isinstance(value, pd.Timestamp):
+            return value.to_pydatetime()
+        return super()._param(value)
+
+
+class SQLiteEngine(_Engine):
+    """Copies the tables into an in-memory SQLite database (timestamps as UTC text)."""
+
+    name = "sqlite"
+
+    def __init__(self):
+        super().__init__()
+        self._term_parts = {}  # term -> {table name: {category_id: partition}} currently loaded
+        self._connection = sqlite3.connect(":memory:", check_same_thread=False)  # Queries are serialized by the engine lock
+        for table_name, columns in TABLES.items():
+            column_list = ", ".join(f'"{column}" ' + ("TEXT" if column_type in ("VARCHAR", "TIMESTAMPTZ") else "INTEGER") for column, column_type in columns.items())
+            self._connection.execute(f"CREATE TABLE {table_name} ({column_list})")
+        for statement in SQLITE_INDEXES:
+            self._connection.execute(statement)
+
+    def _rows(self, table_name, df, term=None):
+        """df as a frame with the table's columns, timestamps formatted as UTC text."""
+        columns = {}
+        for column in TABLES[table_name]:
+            if column == "term" and term is not None:
+                columns[column] = term
+            elif column not in df.columns:
+                columns[column] = None
+            elif TABLES[table_name][column] == "TIMESTAMPTZ":
+                values = pd.to_datetime(df[column], utc=True)
+                columns[column] = values.dt.tz_localize(None).dt.strftime(SQLITE_TIMESTAMP_FORMAT).astype(object).where(values.notna(), None)
+            elif TABLES[table_name][column] == "VARCHAR":
+                columns[column] = df[column].astype(object)
+            else:
+                columns[column] = df[column]
+        return pd.DataFrame(columns, index=df.index)
+
+    def _load_term(self, term, term_table):
+        loaded = self._term_parts.get(term, {})
+        parts = {table_name: term_table.parts(table_name) for table_name in TERM_TABLES}
+        with self._connection:
+            for table_name in TERM_TABLES:
+                previous, current = loaded.get(table_name, {}), parts[table_name]
+                changed = [category_id for category_id in previous.keys() | current.keys() if previous.get(category_id) is not current.get(category_id)]
+                for category_id in changed:
+                    if category_id in previous:
+                        self._connection.execute(f"DELETE FROM {table_name} WHERE term = ? AND category_id = ?", (term, int(category_id)))
+                    if category_id in current:
+                        self._rows(table_name, current[category_id], term).to_sql(table_name, self._connection, if_exists="append", index=False, chunksize=50_000)
+        self._term_parts[term] = parts
+
+    def _drop_term(self, term):
+        with self._connection:
+            for table_name in TERM_TABLES:
+                self._connection.execute(f"DELETE FROM {table_name} WHERE term = ?", (term,))
+        self._term_parts.pop(term, None)
+
+    def _terms_changed(self):
+        pass
+
+    def _load_frame(self, table_name, df):
+        with self._connection:
+            self._connection.execute(f"DELETE FROM {table_name}")
+            if not df.empty:
+                self._rows(table_name, df).to_sql(table_name, self._connection, if_exists="append", index=False, chunksize=50_000)
+        self._frames[table_name] = df
+
+    def _execute(self, sql, params):
+        return pd.read_sql_query(sql, self._connection, params=params)
+
+    def _param(self, value):
+        if isinstance(value, pd.Timestamp):
+            return value.tz_convert("UTC").tz_localize(None).strftime(SQLITE_TIMESTAMP_FORMAT) if value.tzinfo else value.strftime(SQLITE_TIMESTAMP_FORMAT)
+        return super()._param(value)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def engine_name():
+    """The engine SQL_ENGINE resolves to in this process: "duckdb", "sqlite" or None (off)."""
+    if SQL_ENGINE == "off":
+        return None
+    if SQL_ENGINE == "duckdb" or (SQL_ENGINE == "auto" and duckdb is not None):
+        return "duckdb"
+    return "sqlite"
+
+
+def enabled():
+    """Whether helpers should push their work into the SQL engine (False: keep the pandas paths)."""
+    return engine_name() is not None
+
+
+def get_engine():
+    """The process's engine (created on first use)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            name = engine_name()
+            if name is None:
+                raise RuntimeError("the SQL engine is disabled (SQL_ENGINE=off)")
+            _engine = DuckDBEngine() if name == "duckdb" else SQLiteEngine()
+            logger.info(f"SQL engine started | function: get_engine | engine: {name}")
+        return _engine
+
+
+def query(sql, params=(), parse_dates=(), generation=None):
+    """
+    Run a read-only SQL query over the loaded data.
+
+    Args:
+        sql (str): Query over the tables in the module docstring, with `?` placeholders.
+        params (sequence): Values of the placeholders; pandas Timestamps for timestamp columns.
+        parse_dates (sequence): Result columns to return as datetime64[UTC].
+        generation (optional): Data generation to query; defaults to the caller's
+            (core.data_loader.get_data_generation, pinned per request).
+
+    Returns:
+        pd.DataFrame: The result rows.
+    """
+    if generation is None:
+        from core.data_loader import get_data_generation
+
+        generation = get_data_generation()
+    return get_engine().query(generation, sql, params, parse_dates)
@@ -0,0 +1,342 @@
+"""One term of the loaded data as partitioned long tables.
+
+A term used to be a {course: {frame_name: DataFrame}} dict, i.e. hundreds of small
+frames, and every cross-course question looped over its keys. A TermTable holds
+each term as two long tables instead, both partitioned by category_id:
+
+    user_actions   the fact tables (core/dimensions.py) of every course;
+                   a row's category_id is the course it was fetched for
+    action_counts  category_id, user_key, action_name, count: count_user_actions of
+                   every course, in long format (zero counts left out)
+
+plus the term's overall slot (query 102), which is a single slot anyway.
+
+Each course's partition is kept as its own frame (a slice, when the table was
+read as one long table from a snapshot), and `user_actions`/`action_counts` are
+the partitions concatenated in category_id order on first use, for the consumers
+that want the whole term at once (snapshots, benchmarks). The SQL engine and the
+Arrow store work partition by partition, so a change to a few courses only copies
+those. A course's user_actions_df is its partition (no copy). Its raw_metrics
+and score frames are small per-user frames derived from its action counts on
+first use and cached with the table; slots that already hold them keep theirs.
+
+A TermTable is immutable, like the generation holding it: `with_slots` returns a
+new table that shares every untouched partition (and its cached frames and merge
+state) and swaps in the replaced ones. For compatibility a TermTable is also a
+read-only Mapping {course: slot, "overall": slot}, so
+user_actions_dictionaries[term][course][frame_name] keeps working.
+"""
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from core.action_merge import MERGE_STATE_KEY
+from core.query_schemas import concat_frames
+
+OVERALL = "overall"
+PARTITION_KEY = "category_id"
+COUNT_COLUMNS = ["category_id", "user_key", "action_name", "count"]
+SCORE_FRAMES = ("raw_metrics", "unnormalized_scores", "log_normalized_scores")
+COURSE_FRAMES = ("user_actions_df",) + SCORE_FRAMES
+ACTION_COUNTS_KEY = "action_counts"  # Course slot key: (user_actions_df the counts describe, count_user_actions crosstab)
+MERGE_KEYS = ("user_actions_df", MERGE_STATE_KEY, ACTION_COUNTS_KEY)  # What merging rows into a course reads
+
+
+def _empty_counts():
+    return pd.DataFrame({
+        "category_id": np.empty(0, dtype=np.int32),
+        "user_key": np.empty(0, dtype=np.int32),
+        "action_name": pd.Categorical([]),
+        "count": np.empty(0, dtype=np.int32),
+    })
+
+
+def _compact_counts(counts):
+    """Long action counts with the dtypes of the stored table."""
+    return counts.astype({"category_id": "int32", "user_key": "int32", "action_name": "category", "count": "int32"})
+
+
+def counts_from_crosstab(crosstab, category_id):
+    """Long action counts (COUNT_COLUMNS) of one course from its count_user_actions crosstab."""
+    if crosstab is None or crosstab.empty:
+        return _empty_counts()
+    values = crosstab.to_numpy()
+    rows, columns = np.nonzero(values)
+    return _compact_counts(pd.DataFrame({
+        "category_id": category_id,
+        "user_key": crosstab.index.to_numpy()[rows],
+        "action_name": crosstab.columns.to_numpy(dtype=object)[columns],
+        "count": values[rows, columns],
+    }))
+
+
+def crosstab_from_counts(counts):
+    """The count_user_actions crosstab (user_key x action_name) of one course's long action counts, or None."""
+    if counts is None or counts.empty:
+        return None
+    index = pd.MultiIndex.from_arrays([counts["user_key"].to_numpy(), counts["action_name"].to_numpy(dtype=object)], names=["user_key", "action_name"])
+    crosstab = pd.Series(counts["count"].to_numpy(dtype=np.int64), index=index).unstack(fill_value=0)
+    return crosstab.sort_index().sort_index(axis=1)
+
+
+def merge_copy(slot):
+    """
+    Mutable copy of a course slot for merging rows into it (MERGE_KEYS only). Unlike dict(slot)
+    it does not derive the score frames, which the merge recomputes anyway.
+    """
+    return {key: slot[key] for key in MERGE_KEYS if key in slot}
+
+
+def _with_partition_key(user_actions_df, category_id):
+    """The course's rows with category_id set to the course's category (a no-op for rows fetched for it)."""
+    if user_actions_df is None or user_actions_df.empty:
+        return pd.DataFrame()
+    if PARTITION_KEY in user_actions_df.columns and (user_actions_df[PARTITION_KEY] == category_id).all():
+        return user_actions_df
+    return user_actions_df.assign(**{PARTITION_KEY: np.int32(category_id)})
+
+
+def _as_partition(df):
+    """`df` with a 0..n-1 RangeIndex, like a course's own frame (no copy when it has one already)."""
+    if isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1:
+        return df
+    return df.reset_index(drop=True)
+
+
+def _partition_bounds(table, category_ids):
+    """(start, stop) row range of every category in a table sorted by category_id."""
+    if table.empty:
+        return [(0, 0)] * len(category_ids)
+    keys = table[PARTITION_KEY].to_numpy()
+    starts = np.searchsorted(keys, category_ids, side="left")
+    stops = np.searchsorted(keys, category_ids, side="right")
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def _split_table(table, categories):
+    """{course: its rows} of a long table sorted by category_id (slices, no copy); courses without rows are left out."""
+    if table is None or table.empty:
+        return {}
+    category_ids = np.fromiter(categories.values(), dtype=np.int64, count=len(categories))
+    parts = {}
+    for course, (start, stop) in zip(categories, _partition_bounds(table, category_ids)):
+        if start < stop:
+            rows = table.iloc[start:stop]
+            rows.index = pd.RangeIndex(stop - start)  # Same index as the course's own frame had
+            parts[course] = rows
+    return parts
+
+
+class TermTable(Mapping):
+    """
+    The user actions and metrics of one term (see the module docstring).
+
+    Args:
+        categories (dict): {course: category_id} of every course of the term.
+        user_actions (pd.DataFrame, optional): Fact table of every course, sorted by category_id.
+        action_counts (pd.DataFrame, optional): Long action counts (COUNT_COLUMNS), sorted by category_id.
+        overall (Mapping, optional): The term's overall slot.
+        user_dimension (UserDimension, optional): Joins usernames into derived raw_metrics; defaults to the
+            process's (core/dimensions.py). Reader processes pass the one of their generation.
+        fact_parts, count_parts (Mapping, optional): {course: partition} instead of the long tables; courses
+            without rows are left out. May open partitions lazily (core/arrow_store.py).
+    """
+
+    def __init__(self, categories, user_actions=None, action_counts=None, overall=None, user_dimension=None, merge_states=None, score_frames=None, fact_parts=None, count_parts=None):
+        self.categories = dict(sorted(categories.items(), key=lambda item: item[1]))  # In partition order
+        self.overall = overall if overall is not None else {}
+        self._fact_parts = fact_parts if fact_parts is not None else _split_table(user_actions, self.categories)
+        self._count_parts = count_parts if count_parts is not None else _split_table(action_counts, self.categories)
+        self._user_actions = user_actions if user_actions is not None and not user_actions.empty else None  # Concatenated on first use otherwise
+        self._action_counts = action_counts if action_counts is not None and not action_counts.empty else None
+        self._user_dimension = user_dimension
+        self._merge_states = merge_states or {}  # course -> MergeState (frame=None) of its partition's rows
+        self._score_frames = score_frames or {}  # course -> {frame_name: DataFrame}, filled on first use
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_slots(cls, slots, categories, user_dimension=None):
+        """TermTable of a {course: slot, "overall": slot} dict (the layout the loaders build)."""
+        return cls({}, user_dimension=user_dimension).with_slots(slots, categories)
+
+    # Mapping of the slots (compatibility view)
+
+    def __getitem__(self, name):
+        if name == OVERALL:
+            return self.overall
+        with self._lock:
+            slot = self._slots.get(name)
+            if slot is None:
+                if name not in self.categories:
+                    raise KeyError(name)
+                slot = self._slots[name] = CourseSlot(self, name)
+            return slot
+
+    def __iter__(self):
+        yield OVERALL
+        yield from self.categories
+
+    def __len__(self):
+        return len(self.categories) + 1
+
+    def __contains__(self, name):
+        return name == OVERALL or name in self.categories
+
+    # Partitions
+
+    def partition(self, course):
+        """The rows of one course in user_actions (the same frame on every call), or an empty frame for a course without rows."""
+        if course not in self.categories:
+            raise KeyError(course)
+        rows = self._fact_parts.get(course)
+        return rows if rows is not None else pd.DataFrame()
+
+    def course_counts(self, course):
+        """The long action counts of one course."""
+        if course not in self.categories:
+            raise KeyError(course)
+        counts = self._count_parts.get(course)
+        return counts if counts is not None else _empty_counts()
+
+    def partition_rows(self):
+        """{course: number of user action rows}"""
+        return {course: len(self._fact_parts[course]) if course in self._fact_parts else 0 for course in self.categories}
+
+    def parts(self, table_name):
+        """{category_id: partition} of "user_actions" or "action_counts", in category_id order; courses without rows are left out."""
+        parts = self._fact_parts if table_name == "user_actions" else self._count_parts
+        return {category_id: parts[course] for course, category_id in self.categories.items() if course in parts}
+
+    @property
+    def user_actions(self):
+        """Fact table of every course, sorted by category_id (the partitions concatenated on first use)."""
+        if self._user_actions is None:
+            self._user_actions = concat_frames(self.parts("user_actions").values())
+        return self._user_actions
+
+    @property
+    def action_counts(self):
+        """Long action counts (COUNT_COLUMNS) of every course, sorted by category_id (concatenated on first use)."""
+        if self._action_counts is None:
+            counts = concat_frames(self.parts("action_counts").values())
+            self._action_counts = counts if not counts.empty else _empty_counts()
+        return self._action_counts
+
+    def _is_partition(self, course, user_actions_df):
+        """True if `user_actions_df` is the partition of `course` this table holds."""
+        return course in self._fact_parts and self._fact_parts[course] is user_actions_df
+
+    def merge_states(self):
+        """{course: MergeState} (frame=None) of the partitions whose merge state is known."""
+        return dict(self._merge_states)
+
+    def _scores(self, course):
+        frames = self._score_frames.get(course)
+        if frames is None:
+            from processors.course_data_processors import score_frames_from_counts
+
+            frames = dict(zip(SCORE_FRAMES, score_frames_from_counts(crosstab_from_counts(self.course_counts(course)), self._user_dimension)))
+            with self._lock:
+                frames = self._score_frames.setdefault(course, frames)
+        return frames
+
+    # Updates
+
+    def with_slots(self, slots, categories=None):
+        """
+        New TermTable with the partitions of `slots` ({course: slot}, "overall" for the overall slot) replaced.
+
+        Only the partitions of `slots` are built; the new table shares all others with this one.
+        A slot is a dict like the ones this table's Mapping returns. Its action counts
+        (ACTION_COUNTS_KEY), merge state and score frames are kept when they describe its
+        user_actions_df; otherwise the counts of all such slots are recounted in one grouped
+        pass and the score frames are derived again on first use.
+
+        Args:
+            slots (dict): {course: slot} of the courses to replace.
+            categories (dict, optional): {course: category_id} of courses new to the term.
+        """
+        from processors.course_data_processors import count_user_actions_by_category
+
+        categories = {**self.categories, **(categories or {})}
+        unknown = [course for course in slots if course != OVERALL and course not in categories]
+        if unknown:
+            raise KeyError(f"courses without a category_id: {unknown}")
+
+        fact_parts, count_parts = dict(self._fact_parts), dict(self._count_parts)  # Untouched partitions are shared
+        merge_states = {course: state for course, state in self._merge_states.items() if course not in slots}
+        score_frames = {course: frames for course, frames in self._score_frames.items() if course not in slots}
+        recount_parts = []
+        for course, slot in slots.items():
+            if course == OVERALL:
+                continue
+            category_id = categories[course]
+            user_actions_df = slot.get("user_actions_df")
+            course_rows = _with_partition_key(user_actions_df, category_id)
+            fact_parts.pop(course, None)
+            count_parts.pop(course, None)
+            if not course_rows.empty:
+                fact_parts[course] = _as_partition(course_rows)
+            stored_counts = slot.get(ACTION_COUNTS_KEY)
+            if stored_counts is not None and stored_counts[0] is user_actions_df:
+                counts = counts_from_crosstab(stored_counts[1], category_id)
+                if not counts.empty:
+                    count_parts[course] = counts
+            elif not course_rows.empty:
+                recount_parts.append(course_rows)
+            state = slot.get(MERGE_STATE_KEY)
+            if state is not None and state.frame is user_actions_df:
+                merge_states[course] = state._replace(frame=None)  # The table holds the rows; the state must not keep the old frame alive
+            if all(frame_name in slot for frame_name in SCORE_FRAMES):
+                score_frames[course] = {frame_name: slot[frame_name] for frame_name in SCORE_FRAMES}
+            elif course in self._score_frames and self._is_partition(course, user_actions_df):
+                score_frames[course] = self._score_frames[course]  # A merge_copy whose rows did not change
+
+        if recount_parts:
+            courses_by_category_id = {category_id: course for course, category_id in categories.items()}
+            recounted = _compact_counts(count_user_actions_by_category(concat_frames(recount_parts)))
+            for category_id, counts in recounted.groupby(PARTITION_KEY, sort=False):
+                count_parts[courses_by_category_id[category_id]] = counts.reset_index(drop=True)
+        return TermTable(
+            categories,
+            overall=slots.get(OVERALL, self.overall),
+            user_dimension=self._user_dimension,
+            merge_states=merge_states,
+            score_frames=score_frames,
+            fact_parts=fact_parts,
+            count_parts=count_parts,
+        )
+
+
+class CourseSlot(Mapping):
+    """Read-only slot of one course of a TermTable: {frame_name: DataFrame} plus its action counts and merge state."""
+
+    def __init__(self, table, course):
+        self._table = table
+        self._course = course
+        self._keys = COURSE_FRAMES + (ACTION_COUNTS_KEY,) + ((MERGE_STATE_KEY,) if course in table._merge_states else ())
+        self._values = {}
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        if key == "user_actions_df":
+            value = self._table.partition(self._course)
+        elif key in SCORE_FRAMES:
+            value = self._table._scores(self._course)[key]
+        elif key == ACTION_COUNTS_KEY:
+            value = (self["user_actions_df"], crosstab_from_counts(self._table.course_counts(self._course)))
+        elif key == MERGE_STATE_KEY and key in self._keys:
+            value = self._table._merge_states[self._course]._replace(frame=self["user_actions_df"])
+        else:
+            raise KeyError(key)
+        return self._values.setdefault(key, value)  # One object per key, so identity checks against user_actions_df hold
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
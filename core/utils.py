@@ -1,8 +1,8 @@
 import os
-import requests
 import re
 from datetime import date, datetime, timedelta
 from core.logging_config import get_logger
+from core import http_client
 
 logger = get_logger("utils")
 
@@ -121,7 +121,10 @@ def _alert_developer_of_reset_failure(alert_reason, error_message):
                 f'Full Error: {error_message}\n\n'
                 f'Action: Check logs at discourse-viz server'
     }
-    requests.post(webhook_url, json=message)
+    if webhook_url:
+        http_client.post(webhook_url, json=message)
+    else:
+        logger.warning("GOOGLE_CHAT_WEBHOOK_URL is not set; alert only logged | function: _alert_developer_of_reset_failure")
     
     logger.warning(f"DEVELOPER ALERT: Full system reset failed | error: {error_message} | function: _alert_developer_of_reset_failure")
     logger.warning("TODO: Implement email/g-chat alerting in _alert_developer_of_reset_failure()")
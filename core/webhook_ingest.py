@@ -0,0 +1,275 @@
+"""Near-real-time ingestion of Discourse webhook events.
+
+Discourse posts an event to /webhooks/discourse (routes/webhooks.py) as soon as a
+post, like, topic or accepted solution happens. Each event is mapped to rows in
+the layout of query 103 (one row per credited user and `action_type`, see
+application.constants.action_to_description) and buffered. The buffer is merged
+into the current term's per-course frames in micro-batches: when it reaches
+WEBHOOK_FLUSH_MAX_EVENTS rows (on the "webhook-flush" thread, so the request only
+buffers and returns), or on the WEBHOOK_FLUSH_INTERVAL_SECONDS job of
+core.loader_worker.create_scheduler. Metrics and scores are recomputed once per touched course per flush.
+
+The nightly refresh stays the source of truth: before it merges the 103 delta
+for a course it calls `take_ingested_rows`, drops the rows that came in
+through webhooks (by fingerprint, see core/action_merge.py) and lets the 103 rows
+take their place. Likes that were
+removed, deleted posts and events whose fields differ slightly from 103 are
+therefore corrected within a day.
+
+With several worker processes (DATA_ROLE = "reader", see core/arrow_store.py) the
+worker that receives a delivery spools its rows to disk; the loader process merges
+them on its next flush and publishes a new generation.
+"""
+import hashlib
+import hmac
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+
+from application.constants import (
+    DATA_ROLE,
+    DISCOURSE_WEBHOOK_SECRET,
+    WEBHOOK_FLUSH_MAX_EVENTS,
+    WEBHOOK_SEEN_EVENT_IDS,
+)
+from core.logging_config import get_logger
+from core.query_schemas import decode_page, concat_frames
+from core.utils import sanitize_filepath, get_current_trimester
+from core.arrow_store import spool_webhook_rows, drain_webhook_spool
+from core.dimensions import encode_user_actions
+from core.term_table import merge_copy
+
+logger = get_logger("core.webhook_ingest")
+
+# Same layout as the rows of query 103
+ACTION_COLUMNS = ["acting_username", "action_type", "action_name", "target_topic_id", "target_post_id", "topic_title", "created_at", "category_id"]
+
+# Discourse user_actions codes for the events we ingest (names as returned by query 103)
+LIKE, WAS_LIKED, NEW_TOPIC, REPLY, SOLVED = 1, 2, 4, 5, 15
+ACTION_NAMES = {LIKE: "like", WAS_LIKED: "was_liked", NEW_TOPIC: "new_topic", REPLY: "reply", SOLVED: "solved"}
+
+ingest_lock = threading.RLock()  # Held while a flush, refresh or reset builds the next data generation from the current one
+_buffer = []  # Pending rows (lists in ACTION_COLUMNS order)
+_buffer_lock = threading.Lock()
+_seen_event_ids = OrderedDict()  # Discourse retries deliveries; remember recent X-Discourse-Event-Id values
+_ingested = defaultdict(list)  # (term, course) -> frames merged from webhooks since the last nightly reconciliation
+_stats = {"events": 0, "duplicates": 0, "ignored": 0, "rows_flushed": 0, "flushes": 0}
+_flush_wanted = threading.Event()  # Set when a delivery filled the buffer
+_flusher = None  # (pid, thread) running the flushes asked for by full buffers
+
+
+def verify_signature(body, signature_header):
+    """
+    Check the `X-Discourse-Event-Signature` header (`sha256=<hex hmac of the raw body>`).
+
+    Returns False when no DISCOURSE_WEBHOOK_SECRET is configured, so the endpoint is closed by default.
+    """
+    if not DISCOURSE_WEBHOOK_SECRET or not signature_header:
+        return False
+    expected = "sha256=" + hmac.new(DISCOURSE_WEBHOOK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header)
+
+
+def _utc_now():
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _action_row(username, action_type, topic_id, post_id, topic_title, created_at, category_id):
+    return [username, action_type, ACTION_NAMES[action_type], topic_id, post_id, topic_title, created_at or _utc_now(), category_id]
+
+
+def event_to_rows(event_name, payload):
+    """
+    Map one webhook event to query-103 rows.
+
+    Args:
+        event_name (str): The `X-Discourse-Event` header, e.g. 'post_created'.
+        payload (dict): The JSON body of the webhook.
+
+    Returns:
+        list[list]: Rows in ACTION_COLUMNS order; empty for events that do not create user actions.
+    """
+    match event_name:
+        case "post_created":
+            post = payload.get("post", {})
+            if post.get("post_number", 1) <= 1 or post.get("post_type", 1) != 1:
+                return []  # The first post is covered by topic_created; whispers and small actions are not replies
+            return [_action_row(post.get("username"), REPLY, post.get("topic_id"), post.get("id"), post.get("topic_title"), post.get("created_at"), post.get("category_id"))]
+        case "topic_created":
+            topic = payload.get("topic", {})
+            username = (topic.get("created_by") or {}).get("username")
+            return [_action_row(username, NEW_TOPIC, topic.get("id"), None, topic.get("title"), topic.get("created_at"), topic.get("category_id"))]
+        case "post_liked":
+            like = payload.get("like", {})
+            post, liker = like.get("post", {}), like.get("user", {})
+            topic_args = (post.get("topic_id"), post.get("id"), post.get("topic_title"), None, post.get("category_id"))
+            return [
+                _action_row(liker.get("username"), LIKE, *topic_args),
+                _action_row(post.get("username"), WAS_LIKED, *topic_args),
+            ]
+        case "accepted_solution":
+            post = payload.get("solved", {})
+            return [_action_row(post.get("username"), SOLVED, post.get("topic_id"), post.get("id"), post.get("topic_title"), None, post.get("category_id"))]
+        case _:
+            return []
+
+
+def ingest_event(event_id, event_name, payload):
+    """
+    Buffer the rows of one webhook event; a full buffer is flushed in the background.
+
+    Returns:
+        int: Number of rows buffered (0 for duplicate deliveries and ignored events).
+    """
+    rows = [row for row in event_to_rows(event_name, payload) if row[0] and row[-1] is not None]
+    if DATA_ROLE == "reader":
+        # This worker holds no data; the loader picks the rows up (and drops redeliveries) on its next flush
+        with _buffer_lock:
+            _stats["events"] += 1
+            if not rows:
+                _stats["ignored"] += 1
+                return 0
+        spool_webhook_rows(event_id, rows)
+        return len(rows)
+
+    rows_buffered, buffer_full = _buffer_rows(event_id, rows)
+    logger.debug(f"Webhook event buffered | function: ingest_event | event: {event_name} | event_id: {event_id} | rows: {rows_buffered}")
+    if buffer_full:
+        _request_flush()
+    return rows_buffered
+
+
+def _buffer_rows(event_id, rows):
+    """Add the rows of one delivery to the buffer unless it is a redelivery; returns (rows buffered, buffer full)."""
+    with _buffer_lock:
+        _stats["events"] += 1
+        if event_id:
+            if event_id in _seen_event_ids:
+                _stats["duplicates"] += 1
+                return 0, False
+            _seen_event_ids[event_id] = True
+            while len(_seen_event_ids) > WEBHOOK_SEEN_EVENT_IDS:
+                _seen_event_ids.popitem(last=False)
+
+        if not rows:
+            _stats["ignored"] += 1
+            return 0, False
+        _buffer.extend(rows)
+        return len(rows), len(_buffer) >= WEBHOOK_FLUSH_MAX_EVENTS
+
+
+def _request_flush():
+    """Wake the flusher thread (started on first use in this process) to merge the full buffer."""
+    global _flusher
+    with _buffer_lock:
+        if _flusher is None or _flusher[0] != os.getpid() or not _flusher[1].is_alive():
+            thread = threading.Thread(target=_flush_when_asked, daemon=True, name="webhook-flush")
+            _flusher = (os.getpid(), thread)
+            thread.start()
+    _flush_wanted.set()
+
+
+def _flush_when_asked():
+    while True:
+        _flush_wanted.wait()
+        _flush_wanted.clear()  # Deliveries that fill the buffer again during the flush ask for the next one
+        try:
+            flush_buffer()
+        except Exception:
+            logger.exception("Webhook flush failed, rows are retried by the scheduled flush | function: _flush_when_asked")
+
+
+def flush_buffer():
+    """
+    Merge buffered rows into the current term's course frames and recompute their scores.
+
+    Rows stay buffered until the background load has finished, since the frames they
+    would be merged into are still being replaced, and while a refresh or reset is building
+    the next generation. The merged courses are published as a new generation.
+    """
+    import core.data_loader as data_loader
+
+    if DATA_ROLE == "reader" or not data_loader.get_live_generation().user_actions_loaded:
+        return 0  # Readers serve published generations, which are never modified in place
+    if not ingest_lock.acquire(blocking=False):
+        return 0  # Picked up by the next flush after the refresh/reset has published
+    try:
+        if DATA_ROLE == "loader":
+            for event_id, spooled_rows in drain_webhook_spool():  # Deliveries received by the reader processes
+                _buffer_rows(event_id, spooled_rows)
+        with _buffer_lock:
+            if not _buffer:
+                return 0
+            rows = _buffer[:]
+            _buffer.clear()
+
+        term = get_current_trimester()
+        generation = data_loader.get_live_generation()
+        course_by_category_id = {int(row.category_id): sanitize_filepath(row.name).lower() for row in generation.df_map_category_to_id.itertuples()}
+        new_rows_df = encode_user_actions(decode_page(103, ACTION_COLUMNS, rows))  # Same dtypes and encoding as the rows fetched by query 103
+
+        user_actions_dictionaries = data_loader._shadow_copy(generation.user_actions_dictionaries)
+        term_table = user_actions_dictionaries.get(term)
+        if term_table is None:
+            logger.warning(f"Current term not loaded, dropping webhook rows | function: flush_buffer | term: {term} | rows: {len(rows)}")
+            return 0
+        updated_slots = {}
+        for category_id, course_rows_df in new_rows_df.groupby("category_id", observed=True):
+            course = course_by_category_id.get(int(category_id))
+            if course is None or course not in term_table:
+                continue  # Irrelevant or unknown category
+            course_rows_df = course_rows_df.reset_index(drop=True)
+            course_slot = merge_copy(term_table[course])
+            appended_rows_df = data_loader._merge_course_delta(course_slot, course_rows_df, from_query_103=False)
+            if appended_rows_df.empty:
+                continue  # Every row is held already (e.g. fetched by query 103 before the delivery came in)
+            updated_slots[course] = course_slot
+            _ingested[(term, course)].append(appended_rows_df)  # Only these are dropped again at reconciliation
+        courses_updated = len(updated_slots)
+        if courses_updated:
+            user_actions_dictionaries[term] = term_table.with_slots(updated_slots)
+            data_loader.publish_data_generation(user_actions_dictionaries=user_actions_dictionaries)
+    finally:
+        ingest_lock.release()
+
+    with _buffer_lock:
+        _stats["rows_flushed"] += len(rows)
+        _stats["flushes"] += 1
+    logger.info(f"Webhook rows merged | function: flush_buffer | term: {term} | rows: {len(rows)} | courses_updated: {courses_updated}")
+    return len(rows)
+
+
+def take_ingested_rows(term, course):
+    """Return (and forget) the rows merged from webhooks into one course since the last reconciliation."""
+    with ingest_lock:
+        return concat_frames(_ingested.pop((term, course), []))
+
+
+def export_ingested_rows():
+    """Webhook rows still awaiting reconciliation, as {(term, course): df} (saved with snapshots)."""
+    with ingest_lock:
+        return {unit: concat_frames(frames) for unit, frames in _ingested.items() if frames}
+
+
+def import_ingested_rows(rows_by_unit):
+    """Restore webhook rows awaiting reconciliation after a warm start from a snapshot."""
+    with ingest_lock:
+        _ingested.clear()
+        for unit, df in rows_by_unit.items():
+            _ingested[unit].append(df)
+
+
+def clear_ingested_rows():
+    """Forget every webhook row awaiting reconciliation (the frames were just rebuilt from query 103)."""
+    with ingest_lock:
+        _ingested.clear()
+
+
+def get_ingest_stats():
+    """
+    Webhook counters of this process. With several workers each process counts only what it
+    saw (readers receive and spool deliveries, the loader flushes), so they carry its pid and role.
+    """
+    with _buffer_lock:
+        return dict(_stats, buffered_rows=len(_buffer), pid=os.getpid(), data_role=DATA_ROLE)
@@ -9,38 +9,84 @@ from datetime import datetime, timedelta
 import logging
 
 
-from application.constants import action_to_description, weights_dict_for_course_specific_engagement, weights_dict_for_overall_engagement
+from application.constants import action_to_description, action_name_to_type, weights_dict_for_course_specific_engagement, weights_dict_for_overall_engagement, QUERY_103_BATCH_PARAM
 import core.data_loader as data_loader
+import core.dimensions as dimensions
 from core.utils import get_current_trimester
-from core.execute_query import execute_discourse_query
+from core.execute_query import iter_discourse_query_pages
+from core.query_schemas import concat_frames
+import core.sql_engine as sql_engine
 from core.logging_config import get_logger
 
 logger_course = get_logger("viz.course_top10")
 logger_trending = get_logger("viz.trending_topics")
 
 
-def create_raw_metrics_dataframe(df):
+def ensure_utc_datetime(created_at):
+    """Returns `created_at` as tz-aware UTC datetimes, parsing only if the column is not datetime64 already."""
+    if isinstance(created_at.dtype, pd.DatetimeTZDtype):
+        return created_at
+    return pd.to_datetime(created_at, format='mixed', utc=True)  # Handles UTC & IST
+
+
+def count_user_actions(df):
+    """
+    Counts the occurrences of each action type (action_name) per user (user_key) of an encoded
+    user actions frame (core/dimensions.py). `action_type` values are mapped to the descriptive
+    names in action_to_description first.
+    Returns a crosstab with one row per user_key and one column per action name; counts from
+    several pages can be combined with `add_user_action_counts`.
+    """
+    action_names = df['action_type'].astype(str).map(action_to_description)
+    return pd.crosstab(df["user_key"], action_names.rename("action_name")) # Builds a crosstab (pivot table) where: Rows = user_key (users performing actions; Columns = action_name (types of actions); Values = count of occurrences for each (user, action) combination.
+
+
+def add_user_action_counts(counts, more_counts):
+    """Adds two crosstabs from `count_user_actions`, aligning users and action names."""
+    if counts is None:
+        return more_counts
+    combined = counts.add(more_counts, fill_value=0).fillna(0).astype("int64")  # Cells missing on both sides (new user, new action) are NaN
+    return combined.sort_index().sort_index(axis=1)
+
+
+def subtract_user_action_counts(counts, removed_counts):
+    """
+    Subtracts a crosstab from `count_user_actions` (e.g. of removed rows) from another.
+    Users and action names left without any action are dropped, as a fresh crosstab would not have them.
+    """
+    if removed_counts is None or removed_counts.empty:
+        return counts
+    remaining = counts.sub(removed_counts, fill_value=0).fillna(0).clip(lower=0).astype("int64")
+    remaining = remaining.loc[remaining.sum(axis=1) > 0, remaining.sum(axis=0) > 0]
+    return remaining.sort_index().sort_index(axis=1)
+
+
+def count_user_actions_by_category(df):
     """
-    This function creates a raw metrics dataframe.
-    Steps:
-    1. Maps `action_type` values to more descriptive `action_name` values (via action_to_description).
-    2. Counts the occurrences of each action type (action_name) per user (acting_username).
-    3. Drops certain action types that are not required for analysis.
-    4. Returns a dataframe with one row per user and one column per action count.
+    Grouped count_user_actions over the user actions of many courses at once (e.g. a whole
+    term, see core/term_table.py): one row per (category_id, user_key, action_name) that occurs,
+    with its `count`, sorted by category_id. Zero counts are left out.
     """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["category_id", "user_key", "action_name", "count"])
+    action_names = df['action_type'].astype(str).map(action_to_description).rename("action_name")
+    counts = df.groupby([df["category_id"], df["user_key"], action_names], observed=True).size()  # Unmapped action types (NaN) are dropped, as by the crosstab
+    return counts.rename("count").reset_index()
 
-    # Change the values in action_name column based on values of action_type and map it via the action_to_description dictionary. This is done to make the column_names more intuitive to understand.
-    subject_dataframe = df.copy()
-    subject_dataframe['action_type'] = subject_dataframe['action_type'].astype(str)
-    subject_dataframe['action_name'] = subject_dataframe['action_type'].map(action_to_description)
-    subject_dataframe = pd.crosstab(subject_dataframe["acting_username"], subject_dataframe["action_name"]) # Builds a crosstab (pivot table) where: Rows = acting_username (users performing actions; Columns = action_name (types of actions); Values = count of occurrences for each (user, action) combination.
 
+def raw_metrics_from_counts(counts, user_dimension=None):
+    """
+    Turns a crosstab from `count_user_actions` into the raw metrics dataframe:
+    drops the action types that are not required for analysis and joins the username (from the user dimension) in as a column.
+    `user_dimension` defaults to the process's (core/dimensions.py); reader processes pass the one of their generation.
+    """
+    subject_dataframe = counts.copy()
     columns_to_be_dropped = ['linked','received_response', "user's_post_quoted",
         'user_edited_post', 'user_was_mentioned'] # dropping columns which are not required for analysis
 
     subject_dataframe.drop(columns_to_be_dropped, axis=1, inplace=True, errors='ignore')
 
-    subject_dataframe['acting_username'] = subject_dataframe.index # Changing the index to a column
+    subject_dataframe['acting_username'] = (user_dimension or dimensions.users).decode(subject_dataframe.index) # Changing the index (user_key) to a username column
     subject_dataframe = subject_dataframe[["acting_username"]+[col for col in subject_dataframe.columns if col != 'acting_username']]  # Reordering the columns
     subject_dataframe.index = range(0, len(subject_dataframe))
     subject_dataframe.columns.name = None
@@ -86,6 +132,25 @@ def create_log_normalized_scores_dataframe(raw_metrics_df):
     out["z_score"] = out["z_score"].round(2)
     return out
 
+def score_frames_from_counts(counts, user_dimension=None):
+    """(raw_metrics_df, unnormalized_scores_df, log_normalized_scores_df) of one course from its `count_user_actions` crosstab."""
+    if counts is None or counts.empty:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    raw_metrics_df = raw_metrics_from_counts(counts, user_dimension)
+    return raw_metrics_df, create_unnormalized_scores_dataframe(raw_metrics_df), create_log_normalized_scores_dataframe(raw_metrics_df)
+
+
+def _course_dataframes_from_pages(user_action_pages, action_counts):
+    """
+    Builds (user_actions_df, raw_metrics_df, unnormalized_scores_df, log_normalized_scores_df) for one course
+    from its query-103 page frames and their accumulated `count_user_actions` crosstab.
+    """
+    if not user_action_pages:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame() # Course had no activity in this window
+
+    return (concat_frames(user_action_pages), *score_frames_from_counts(action_counts))
+
+
 def get_course_specific_dataframes(query_params):
     """
     Calls the query_103 using parameters {category_id, start_date, end_date} to get user_actions_df which is then used to create and return 3 dataframes:
@@ -94,36 +159,98 @@ def get_course_specific_dataframes(query_params):
     2. UNNORMALIZED_SCORES DF: Sum of [ raw_metric*weightage ]
     3. LOG-NORMALIZED SCORE: Sum of [ log1p(raw_metric) * weightage ]
     """
-    query_params = dict(query_params)
     logger_course.info("Fetching course-specific data", extra={"params_provided": bool(query_params)})
-    user_actions_df = execute_discourse_query(103, query_params)
-    if user_actions_df.empty:
+
+    # Pages are counted as they arrive, so only the compact page frames are held (no full-result copy for the crosstab)
+    user_action_pages = []
+    action_counts = None
+    for page_df in iter_discourse_query_pages(103, query_params):
+        page_df = dimensions.encode_user_actions(page_df)  # Usernames and titles go to the shared dimensions right away
+        action_counts = add_user_action_counts(action_counts, count_user_actions(page_df))
+        user_action_pages.append(page_df)
+
+    if not user_action_pages:
         logger_course.warning(f"No user actions returned for course query | function: get_course_specific_dataframes | params: {query_params}", extra={"params_provided": bool(query_params)})
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), ["no topics as of because of very low discourse activity"] # Return 3 empty DFs + one list
-    
-    raw_metrics_df = create_raw_metrics_dataframe(user_actions_df)
-    unnormalized_scores_df = create_unnormalized_scores_dataframe(raw_metrics_df)
-    log_normalized_scores_df = create_log_normalized_scores_dataframe(raw_metrics_df)
-    return user_actions_df, raw_metrics_df, unnormalized_scores_df, log_normalized_scores_df
+    return _course_dataframes_from_pages(user_action_pages, action_counts)
 
 
-def get_top_10_first_responders(course):
+def iter_user_actions_by_category(category_ids, start_date, end_date):
     """
-    Get top respondents from user actions dataframe for a specific course.
-    Put this function in processors.py file in new structure
+    Batched query 103: crawls the actions of several categories in one paginated query
+    (QUERY_103_BATCH_PARAM) and splits every page locally by its `category_id` column.
+    Yields (category_id, page_part) pairs of encoded rows (core/dimensions.py) as pages arrive; rows of categories that were not requested are skipped.
     """
-    term = get_current_trimester()
-    user_actions_dictionaries = data_loader.get_user_actions_dictionaries()
-    df = (user_actions_dictionaries[term][course]["user_actions_df"]).copy(deep=True)  # Make a copy to avoid modifying the original dataframe
-    
-    if df.empty:
-        logger_course.warning(f"Cannot compute first responders; dataframe empty | function: get_top_10_first_responders | course: {course}", extra={"course": course, "term": term})
-        raise ValueError("The user actions dataframe is empty, cannot compute top respondents.")
-    
-    df['created_at'] = pd.to_datetime(df['created_at'])  # Convert created_at to datetime for sorting
+    requested = {int(category_id) for category_id in category_ids}
+    query_params = {
+        QUERY_103_BATCH_PARAM: ",".join(str(category_id) for category_id in sorted(requested)),
+        "start_date": start_date,
+        "end_date": end_date,
+    }
+    for page_df in iter_discourse_query_pages(103, query_params):
+        page_df = dimensions.encode_user_actions(page_df)
+        for category_id, page_part in page_df.groupby("category_id", sort=False):
+            if int(category_id) in requested:
+                yield int(category_id), page_part.reset_index(drop=True)
+
+
+def get_course_specific_dataframes_for_categories(category_ids, start_date, end_date):
+    """
+    Batched version of get_course_specific_dataframes: one query-103 crawl for a list of categories.
+    Returns {category_id: (user_actions_df, raw_metrics_df, unnormalized_scores_df, log_normalized_scores_df)};
+    categories without any action in the window get empty dataframes.
+    """
+    logger_course.info(f"Fetching course-specific data in batch | function: get_course_specific_dataframes_for_categories | categories: {len(category_ids)} | start_date: {start_date} | end_date: {end_date}")
+    user_action_pages = {int(category_id): [] for category_id in category_ids}
+    action_counts = {int(category_id): None for category_id in category_ids}
+    for category_id, page_part in iter_user_actions_by_category(category_ids, start_date, end_date):
+        action_counts[category_id] = add_user_action_counts(action_counts[category_id], count_user_actions(page_part))
+        user_action_pages[category_id].append(page_part)
+
+    return {
+        category_id: _course_dataframes_from_pages(user_action_pages.pop(category_id), action_counts[category_id])
+        for category_id in list(user_action_pages)
+    }
+
+
+FIRST_RESPONDERS_SQL = """
+WITH new_topics AS (
+    SELECT target_topic_id, created_at FROM user_actions
+    WHERE term = ? AND category_id = ? AND action_type = ?
+),
+replies AS (
+    SELECT r.user_key, ROW_NUMBER() OVER (PARTITION BY t.target_topic_id, t.created_at ORDER BY r.created_at) AS position
+    FROM new_topics t
+    JOIN user_actions r ON r.target_topic_id = t.target_topic_id AND r.created_at > t.created_at
+    WHERE r.term = ? AND r.category_id = ? AND r.action_type IN (?, ?)
+)
+SELECT user_key, COUNT(*) AS first_responses FROM replies
+WHERE position = 1
+GROUP BY user_key
+ORDER BY first_responses DESC, user_key
+LIMIT ?
+"""
+
+
+def _first_responder_counts_sql(term, course, limit=10):
+    """Top `limit` first responders of a course ({user_key: count} Series), computed in the SQL engine (core/sql_engine.py)."""
+    category_id = int(data_loader.get_term_table(term).categories[course])
+    course_filter = (term, category_id)
+    df = sql_engine.query(FIRST_RESPONDERS_SQL, (
+        *course_filter, action_name_to_type['new_topic'],
+        *course_filter, action_name_to_type['reply'], action_name_to_type['response'],
+        limit,
+    ))
+    return pd.Series(df['first_responses'].to_numpy(), index=df['user_key'].to_numpy(), name='count')
+
+
+def _first_responder_counts_pandas(df, limit=10):
+    """Top `limit` first responders ({user_key: count} Series) of a course's user actions frame."""
+    df = df.copy(deep=True)  # Make a copy to avoid modifying the original dataframe
+    df['created_at'] = ensure_utc_datetime(df['created_at'])  # Already datetime64[UTC] when decoded via query_schemas
 
     # Step 1: Get all new topics
-    new_topics = df[df['action_name'] == 'new_topic'][['target_topic_id', 'topic_title', 'created_at']]
+    new_topics = df[df['action_type'] == action_name_to_type['new_topic']][['target_topic_id', 'created_at']]
+    replies_and_responses = df[df['action_type'].isin([action_name_to_type['reply'], action_name_to_type['response']])]
 
     # Step 2: For each topic, find the first reply/response after the new_topic timestamp
     first_responders = []
@@ -131,27 +258,96 @@ def get_top_10_first_responders(course):
     for _, row in new_topics.iterrows():
         topic_id = row['target_topic_id']
         topic_time = row['created_at']
-        topic_title = row['topic_title']
         
         # Get replies/responses for this topic AFTER the topic creation time
-        replies = df[(df['target_topic_id'] == topic_id) & 
-                    (df['action_name'].isin(['reply', 'response'])) &
-                    (df['created_at'] > topic_time)]
+        replies = replies_and_responses[(replies_and_responses['target_topic_id'] == topic_id) &
+                    (replies_and_responses['created_at'] > topic_time)]
         
         if not replies.empty:
             first_reply = replies.sort_values('created_at').iloc[0]
-            first_responders.append((topic_title, first_reply['acting_username'], first_reply['created_at']))
+            first_responders.append((topic_id, first_reply['user_key'], first_reply['created_at']))
 
     # Convert to DataFrame
-    first_responders_df = pd.DataFrame(first_responders, columns=['topic_title', 'first_responder', 'response_time'])
+    first_responders_df = pd.DataFrame(first_responders, columns=['topic_id', 'first_responder', 'response_time'])
 
     # Count most frequent first responders
-    most_freq_first_responders = first_responders_df['first_responder'].value_counts().head(10)
-    most_freq_first_responders_list = list(most_freq_first_responders.items())
+    return first_responders_df['first_responder'].value_counts().head(limit)
+
+
+def get_top_10_first_responders(course):
+    """
+    Get top respondents from user actions dataframe for a specific course.
+    Put this function in processors.py file in new structure
+    """
+    term = get_current_trimester()
+    user_actions_dictionaries = data_loader.get_user_actions_dictionaries()
+    df = user_actions_dictionaries[term][course]["user_actions_df"]
+    
+    if df.empty:
+        logger_course.warning(f"Cannot compute first responders; dataframe empty | function: get_top_10_first_responders | course: {course}", extra={"course": course, "term": term})
+        raise ValueError("The user actions dataframe is empty, cannot compute top respondents.")
+
+    # The SQL engine joins topics to their replies in one pass; the pandas path scans the replies once per topic
+    most_freq_first_responders = _first_responder_counts_sql(term, course) if sql_engine.enabled() else _first_responder_counts_pandas(df)
+    user_dimension, _topic_dimension = data_loader.get_dimensions()
+    most_freq_first_responders_list = list(zip(user_dimension.decode(most_freq_first_responders.index), most_freq_first_responders.tolist()))  # Usernames joined in only for the top 10
     logger_course.info(f"Computed first responders | function: get_top_10_first_responders | course: {course} | term: {term} | count: {len(most_freq_first_responders_list)}", extra={"course": course, "term": term, "count": len(most_freq_first_responders_list)})
     return most_freq_first_responders_list
 
 
+TRENDING_ACTION_WEIGHTS = {
+    'response': 0.5,
+    'like': 0.35,
+    'quote': 3,
+}
+RECENT_TOPIC_ACTIONS_SQL = """
+WITH recent_topics AS (
+    SELECT target_topic_id, MIN(created_at) AS created_at FROM user_actions
+    WHERE term = ? AND category_id = ? AND action_type = ? AND created_at >= ?
+    GROUP BY target_topic_id
+)
+SELECT t.target_topic_id, t.created_at, {action_counts}
+FROM recent_topics t
+LEFT JOIN user_actions a ON a.target_topic_id = t.target_topic_id AND a.term = ? AND a.category_id = ? AND a.action_type IN ({action_types})
+GROUP BY t.target_topic_id, t.created_at
+"""
+
+
+def _recent_topic_action_counts_sql(term, course, since):
+    """
+    (topic x action name counts of the weighted actions, created_at of the topics) for the topics of a
+    course created since `since`, computed in the SQL engine (core/sql_engine.py).
+    """
+    category_id = int(data_loader.get_term_table(term).categories[course])
+    action_types = [action_name_to_type[action] for action in TRENDING_ACTION_WEIGHTS]
+    sql = RECENT_TOPIC_ACTIONS_SQL.format(
+        action_counts=", ".join(f'COUNT(CASE WHEN a.action_type = {action_type} THEN 1 END) AS "{action}"' for action, action_type in zip(TRENDING_ACTION_WEIGHTS, action_types)),
+        action_types=", ".join("?" * len(action_types)),
+    )
+    df = sql_engine.query(sql, (term, category_id, action_name_to_type['new_topic'], since, term, category_id, *action_types), parse_dates=['created_at'])
+    df = df.set_index('target_topic_id')
+    counts = df[list(TRENDING_ACTION_WEIGHTS)].astype('int64')
+    return counts[counts.sum(axis=1) > 0].copy(), df[['created_at']]
+
+
+def _recent_topic_action_counts_pandas(df, since):
+    """Same as _recent_topic_action_counts_sql, from a course's user actions frame."""
+    df = df.copy()  # Make a copy to avoid modifying the original dataframe
+    # created_at is parsed once at decode time (core/query_schemas.py); only legacy string columns are parsed here
+    df['created_at'] = ensure_utc_datetime(df['created_at'])
+    assert df['created_at'].dt.tz is not None, "created_at column must be timezone-aware"
+    action_names = {action_name_to_type[action]: action for action in TRENDING_ACTION_WEIGHTS}
+
+    recent_topics = df[(df['action_type'] == action_name_to_type['new_topic']) & (df['created_at'] >= since)]
+    recent_topic_ids = set(recent_topics['target_topic_id'])
+
+    # Filter actions for these topics (excluding 'new_topic'), then group by topic and count actions
+    recent_actions = df[(df['target_topic_id'].isin(recent_topic_ids)) &
+                        (df['action_type'].isin(action_names.keys()))]
+    topic_action_counts = recent_actions.groupby(['target_topic_id', 'action_type'], observed=True).size().unstack(fill_value=0).rename(columns=action_names)
+    return topic_action_counts, recent_topics.set_index('target_topic_id')[['created_at']]
+
+
 def get_trending_topics_from_useractions_df(course):
     """
     Get trending topics from user actions dataframe for a specific course.
@@ -159,36 +355,23 @@ def get_trending_topics_from_useractions_df(course):
     """
     term = get_current_trimester()
     user_actions_dictionaries = data_loader.get_user_actions_dictionaries()
-    df = (user_actions_dictionaries[term][course]["user_actions_df"]).copy()  # Make a copy to avoid modifying the original dataframe
+    df = user_actions_dictionaries[term][course]["user_actions_df"]
     
     if df.empty:
         logger_trending.warning(f"Cannot compute trending topics; dataframe empty | function: get_trending_topics_from_useractions_df | course: {course} | term: {term}", extra={"course": course, "term": term})
         raise ValueError("The user actions dataframe is empty, cannot compute trending topics.")
     
-    # Convert created_at to datetime for sorting
-    df['created_at'] = pd.to_datetime(df['created_at'], format='mixed', utc=True)  # Handles UTC & IST
-    assert df['created_at'].dt.tz is not None, "created_at column must be timezone-aware"
-    # Define weights for actions
-    weights = {
-        'response': 0.5,
-        'like': 0.35,
-        'quote': 3,
-    }
+    weights = TRENDING_ACTION_WEIGHTS
 
-    # 1. Find topics created in the last 7 days
+    # 1-3. Find topics created in the last 7 days and count the weighted actions on them
     now = datetime.now()
     seven_days_ago = now - timedelta(days=7)
     seven_days_ago_utc = pd.Timestamp(seven_days_ago, tz='UTC')  # Convert to UTC
-    recent_topics = df[(df['action_name'] == 'new_topic') & (df['created_at'] >= seven_days_ago_utc)]
-    logger_trending.info(f"Recent topics fetched | function: get_trending_topics_from_useractions_df | course: {course} | term: {term} | count: {len(recent_topics)}")
-    recent_topic_ids = set(recent_topics['target_topic_id'])
-
-    # 2. Filter actions for these topics (excluding 'new_topic')
-    recent_actions = df[(df['target_topic_id'].isin(recent_topic_ids)) &
-                        (df['action_name'].isin(weights.keys()))]
-
-    # 3. Group by topic and count actions
-    topic_action_counts = recent_actions.groupby(['target_topic_id', 'action_name']).size().unstack(fill_value=0)
+    if sql_engine.enabled():
+        topic_action_counts, topic_info = _recent_topic_action_counts_sql(term, course, seven_days_ago_utc)
+    else:
+        topic_action_counts, topic_info = _recent_topic_action_counts_pandas(df, seven_days_ago_utc)
+    logger_trending.info(f"Recent topics fetched | function: get_trending_topics_from_useractions_df | course: {course} | term: {term} | count: {len(topic_info)}")
 
     # Preserve original counts before applying weights
     counts_df = topic_action_counts.copy()
@@ -200,8 +383,7 @@ def get_trending_topics_from_useractions_df(course):
 
     topic_action_counts['raw_score'] = topic_action_counts.sum(axis=1)
 
-    # 5. Add topic creation time and title
-    topic_info = recent_topics.set_index('target_topic_id')[['topic_title', 'created_at']]
+    # 5. Add topic creation time (titles are joined in for the top 10 only)
     merged = topic_action_counts.merge(topic_info, left_index=True, right_index=True)
 
     # 6. Normalize by age (in hours)
@@ -214,6 +396,8 @@ def get_trending_topics_from_useractions_df(course):
 
     # 7. Sort and get top 10
     top_trending = merged.sort_values('normalized_score', ascending=False).head(10)
+    _user_dimension, topic_dimension = data_loader.get_dimensions()
+    top_trending['topic_title'] = topic_dimension.titles(top_trending.index)
 
     # Build final output list: (topic_id, topic_url, topic_title, response_count, like_count, quote_count)
     top_trending_list = []
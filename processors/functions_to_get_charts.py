@@ -127,12 +127,18 @@ def create_weekwise_engagement(user_actions_df):
     It takes the user_actions_df as input and returns the weekwise engagement dataframe.
     The weekwise engagement dataframe is created by grouping the user_actions_df by week_number and then counting the number of actions for each week.
     """
-    user_actions_df["created_at"] = user_actions_df["created_at"].map(lambda x: x.split("T")[0]) # Convert datetime to date string
-    user_actions_df["week_number"] = user_actions_df["created_at"].map(lambda x: get_trimester_week(x)) # Get trimester week for each date, for example "t1-w1;  (01-01-2025, 07-01-2025)"
-
+    # Work on new columns only: user_actions_df is the stored frame and must not be modified
+    created_at = user_actions_df["created_at"]
+    if isinstance(created_at.dtype, pd.DatetimeTZDtype):
+        created_dates = created_at.dt.strftime("%Y-%m-%d") # created_at is decoded as datetime64[UTC]
+    else:
+        created_dates = created_at.map(lambda x: x.split("T")[0]) # Legacy string column
+    week_of_date = {date_str: get_trimester_week(date_str) for date_str in created_dates.dropna().unique()} # Each distinct date is resolved once, for example "t1-w1;  (01-01-2025, 07-01-2025)"
 
-    user_actions_df["action_name_new"] = user_actions_df["action_type"].astype(str).map(action_to_description)
-    df2 = user_actions_df[["week_number", "action_name_new"]] # Keep only the week_number and action_name_new columns
+    df2 = pd.DataFrame({
+        "week_number": created_dates.map(week_of_date),
+        "action_name_new": user_actions_df["action_type"].astype(str).map(action_to_description),
+    }) # Keep only the week_number and action_name_new columns
 
     # Create a pivot table
     pivot_table = pd.pivot_table(
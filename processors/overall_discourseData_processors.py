@@ -1,6 +1,8 @@
 import pandas as pd
 import numpy as np
-from core.execute_query import execute_discourse_query
+from datetime import date, datetime, timedelta
+from core.execute_query import iter_discourse_query_pages
+from core.query_schemas import concat_frames
 import altair as alt
 
 from application.constants import weights_dict_for_overall_engagement
@@ -37,20 +39,83 @@ def create_log_normalized_scores_dataframe_for_all_users(raw_metrics_df):
     log_normalized_dataframe["z_score"] = round((log_normalized_dataframe["initial_score"] - log_normalized_dataframe["initial_score"].mean()) / log_normalized_dataframe["initial_score"].std(),2)
     return log_normalized_dataframe.sort_values(by="z_score",ascending=False)
 
-def get_overall_engagement_df(query_params):
+# OVERALL METRICS AS WINDOW PARTITIONS
+# Query 102 returns cumulative per-user totals for an inclusive date window, so windows that overlap
+# (e.g. consecutive refreshes sharing their boundary day) cannot simply be added up. The overall slot
+# keeps "window_metrics": one partition of per-user totals per non-overlapping window (window_start,
+# window_end). The full load writes one partition for the finished part of a term and one for today;
+# every refresh re-fetches each day since last_refresh_date as its own partition, replacing the
+# partition of that day if present. Term totals are the sum over the partitions, so re-running a
+# refresh is idempotent.
+
+WINDOW_COLUMNS = ["window_start", "window_end"]
+
+
+def parse_query_date(date_string):
+    """Date of a query parameter like '01-05-2025' (also accepts the '30/04-2025' of get_trimester_dates)."""
+    return datetime.strptime(date_string.replace("/", "-"), "%d-%m-%Y").date()
+
+
+def get_overall_window_metrics(windows, domain):
     """
-    This function is used to get the overall engagement dataframe for all users.
-    It calls the query_102 using parameters {start_date, end_date} to get the raw metrics dataframe.
-    It then creates the unnormalized and log-normalized scores dataframes.
-    Returns:
-        raw_metrics_df: Raw metrics dataframe for all users
-        unnormalized_scores_dataframe: Unnormalized scores dataframe for all users
-        log_normalized_scores_dataframe: Log-normalized scores dataframe for all users
+    Fetches query 102 once per (start, end) window (inclusive dates) and returns the per-user totals
+    of all windows as one frame, with the window in WINDOW_COLUMNS.
+    """
+    metric_columns = ["user_id"] + list(weights_dict_for_overall_engagement.keys())
+    partitions = []
+    for start, end in windows:
+        params = {"start_date": start.strftime("%d-%m-%Y"), "end_date": end.strftime("%d-%m-%Y"), "domain": domain}
+        raw_metric_pages = [page_df[metric_columns] for page_df in iter_discourse_query_pages(102, query_params=params)]
+        if raw_metric_pages:
+            partitions.append(concat_frames(raw_metric_pages).assign(window_start=pd.Timestamp(start), window_end=pd.Timestamp(end)))
+    if not partitions:
+        return pd.DataFrame(columns=WINDOW_COLUMNS + metric_columns)
+    return concat_frames(partitions)[WINDOW_COLUMNS + metric_columns]
+
+
+def replace_window_partitions(window_metrics, new_window_metrics, windows):
+    """Drops the partitions of `windows` from `window_metrics` and adds the freshly fetched ones."""
+    if window_metrics is None or window_metrics.empty:
+        return new_window_metrics.reset_index(drop=True)
+    replaced = pd.MultiIndex.from_tuples([(pd.Timestamp(start), pd.Timestamp(end)) for start, end in windows])
+    keep = ~pd.MultiIndex.from_frame(window_metrics[WINDOW_COLUMNS]).isin(replaced)
+    return concat_frames([window_metrics[keep], new_window_metrics]).reset_index(drop=True)
+
+
+def days_to_refresh(window_metrics, first_day, last_day):
+    """
+    Days in [first_day, last_day] to re-fetch as one-day partitions. Days inside a multi-day partition
+    (the finished part of the term at load time) are already complete and are skipped.
     """
-    query_params = dict(query_params)
-    raw_metrics_df = execute_discourse_query(102, query_params = query_params)
-    if raw_metrics_df.empty:
+    days = pd.date_range(first_day, last_day, freq="D")
+    if window_metrics is not None and not window_metrics.empty:
+        multi_day = window_metrics.loc[window_metrics["window_start"] != window_metrics["window_end"], WINDOW_COLUMNS].drop_duplicates()
+        for window in multi_day.itertuples(index=False):
+            days = days[(days < window.window_start) | (days > window.window_end)]
+    return [day.date() for day in days]
+
+
+def overall_dataframes_from_windows(window_metrics):
+    """(raw_metrics, unnormalized_scores, log_normalized_scores) of the term: per-user sums over the window partitions."""
+    if window_metrics is None or window_metrics.empty:
         return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-    raw_metrics_df = raw_metrics_df[["user_id"] + list(weights_dict_for_overall_engagement.keys())]
-    unnormalized_scores_dataframe, log_normalized_scores_dataframe = create_unnormalized_scores_dataframe_for_all_users(raw_metrics_df), create_log_normalized_scores_dataframe_for_all_users(raw_metrics_df)
-    return raw_metrics_df, unnormalized_scores_dataframe, log_normalized_scores_dataframe
+    metric_columns = list(weights_dict_for_overall_engagement.keys())
+    raw_metrics_df = window_metrics.groupby("user_id", as_index=False)[metric_columns].sum()
+    return raw_metrics_df, create_unnormalized_scores_dataframe_for_all_users(raw_metrics_df), create_log_normalized_scores_dataframe_for_all_users(raw_metrics_df)
+
+
+def get_overall_engagement_partitions(start_date, end_date, domain):
+    """
+    Full load of a term's overall engagement, split into window partitions: the days before today
+    as one partition and today (still incomplete, replaced by the next refresh) as another.
+
+    Returns:
+        tuple: (raw_metrics, unnormalized_scores, log_normalized_scores, window_metrics)
+    """
+    start, end, today = parse_query_date(start_date), parse_query_date(end_date), date.today()
+    if end < today:
+        windows = [(start, end)]  # Closed term
+    else:
+        windows = [(start, today - timedelta(days=1)), (today, today)] if start < today else [(today, today)]
+    window_metrics = get_overall_window_metrics(windows, domain)
+    return (*overall_dataframes_from_windows(window_metrics), window_metrics)
@@ -7,10 +7,14 @@ from .charts import charts_bp
 from .courses import courses_bp
 from .users import users_bp
 from .api import api_bp
+from .webhooks import webhooks_bp
+from .admin import admin_bp
 
 def register_all_routes(app):
     """Register all blueprint routes with the Flask application."""
     app.register_blueprint(charts_bp)
     app.register_blueprint(courses_bp)
     app.register_blueprint(users_bp)
-    app.register_blueprint(api_bp)
\ No newline at end of file
+    app.register_blueprint(api_bp)
+    app.register_blueprint(webhooks_bp)
+    app.register_blueprint(admin_bp)
\ No newline at end of file
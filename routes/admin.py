@@ -0,0 +1,38 @@
+"""
+Admin endpoints for the Flask application.
+Operational triggers for the data loader (resuming a failed full system reset).
+"""
+
+from flask import Blueprint, jsonify
+import core.data_loader as data_loader
+import core.loader_worker as loader_worker
+from core.auth import admin_required
+from core.logging_config import get_logger
+from application.constants import DATA_ROLE
+
+logger_admin = get_logger("viz.admin")
+
+admin_bp = Blueprint('admin', __name__)
+
+
+@admin_bp.route('/admin/reset/resume', methods=['POST'])
+@admin_required
+def resume_reset():
+    """Resume the last failed or interrupted full system reset from its checkpoint"""
+    if DATA_ROLE == "reader":
+        loader_worker.request_reset_resume()  # The reset runs in the loader process
+        logger_admin.info("Full system reset resume requested from the loader | function: resume_reset")
+        return jsonify({"status": "requested"}), 202
+    started = data_loader.resume_full_system_reset()
+    if not started:
+        return jsonify({"status": "already_running"}), 409
+    logger_admin.info("Full system reset resume triggered | function: resume_reset")
+    return jsonify({"status": "started"}), 202
+
+
+@admin_bp.route('/admin/reset/status')
+@admin_required
+def reset_status():
+    """Reset status plus the units finished in the current checkpoint"""
+    completed_units = data_loader.open_reset_checkpoint().completed_units()
+    return jsonify(dict(data_loader.get_system_reset_status(), checkpointed_units=len(completed_units)))
@@ -3,9 +3,13 @@ API endpoints for the Flask application.
 Handles API-specific routes and data endpoints.
 """
 
+import os
+
 from flask import Blueprint, render_template, jsonify
 import core.data_loader as data_loader
+from core.leader_election import is_leader
 from application.constants import (
+    DATA_ROLE,
     foundation_courses, 
     diploma_programming_courses, 
     diploma_data_science_courses,
@@ -43,6 +47,7 @@ def index():
 
 @api_bp.route('/loading-status')
 def loading_status():
-    """API endpoint to check if user actions data is loaded"""
-    user_actions_loaded = data_loader.get_user_actions_loaded()
-    return jsonify({"loaded": user_actions_loaded})
\ No newline at end of file
+    """API endpoint to check if user actions data is loaded, with the progress and ETA of the first load, and which worker answered"""
+    # refresh_leader: this worker is the elected one that runs the loader (wsgi.py, core/leader_election.py)
+    worker = {"pid": os.getpid(), "data_role": DATA_ROLE, "refresh_leader": is_leader()}
+    return jsonify(dict(data_loader.get_loading_status(), worker=worker))
\ No newline at end of file
@@ -19,6 +19,7 @@ from processors.functions_to_get_charts import (
 from processors.functions_to_get_charts import create_weekwise_engagement
 
 charts_bp = Blueprint('charts', __name__)
+DATA_LOADING_MESSAGE = "<h3 style='color:violet'>Data is still loading. Once the background data fetching is completed, the chart will automatically be rendered.<br>Kindly wait for a few minutes!</h3>"
 logger_overall = get_logger("viz.overall")
 logger_course = get_logger("viz.course_top10")
 logger_weekly = get_logger("viz.weekly")
@@ -92,11 +93,9 @@ def get_top_10_users_chart(term, subject):
 @charts_bp.route('/get_chart')
 def get_overall_discourse_chart():
     """Used to get the Overall Discourse Charts on the home page"""
-    user_actions_loaded = data_loader.get_user_actions_loaded()
-    if not user_actions_loaded:
-        return "<h3 style='color:violet'>Data is still loading. Once the background data fetching is completed, the chart will automatically be rendered.<br>Kindly wait for a few minutes!</h3>"
-    
     term = request.args.get('chart')
+    if term and not data_loader.is_unit_ready(term, "overall"):  # Served as soon as this term's overall unit has loaded
+        return DATA_LOADING_MESSAGE
     if term:
         chart_html = generate_chart_for_overall_engagement(term).to_html()
         return chart_html
@@ -109,6 +108,8 @@ def top_users_chart(course_name, term):
     """Endpoint that returns only the top users chart"""
     try:
         course_name = course_name.replace("-", "_").replace(":", "_").lower()
+        if not data_loader.is_unit_ready(term, course_name):
+            return DATA_LOADING_MESSAGE
         top_10_users_chart = get_top_10_users_chart(term=term, subject=course_name)
         return top_10_users_chart.to_html()
     except Exception as e:
@@ -124,6 +125,8 @@ def weekwise_chart(course_name, term):
     """Endpoint that returns only the weekwise engagement chart"""
     try:
         course_name = course_name.replace("-", "_").replace(":", "_").lower()
+        if not data_loader.is_unit_ready(term, course_name):
+            return DATA_LOADING_MESSAGE
         user_actions_dictionaries = data_loader.get_user_actions_dictionaries()
         user_actions_df = user_actions_dictionaries[term][course_name]["user_actions_df"]
         logger_weekly.info("Rendering weekwise chart", extra={"course": course_name, "term": term, "rows": len(user_actions_df)})
@@ -148,6 +151,8 @@ def specific_users_stat(course_name):
         if not user_list:
             return jsonify({"error": "No usernames provided."}), 400
 
+        if not data_loader.is_unit_ready(selected_term, course_name):
+            return DATA_LOADING_MESSAGE
         user_list = tuple(user_list.split(","))
         chart = get_users_engagement_chart(course_name, user_list, term=selected_term)
         return chart.to_html()
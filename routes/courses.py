@@ -8,6 +8,7 @@ from flask import Blueprint, render_template
 from core.utils import get_current_trimester, get_previous_trimesters
 from processors.course_data_processors import get_top_10_first_responders, get_top_10_first_responders, get_trending_topics_from_useractions_df
 from core.logging_config import get_logger
+import core.data_loader as data_loader
 
 logger_trending = get_logger("viz.trending")
 logger_course = get_logger("viz.course_top10")
@@ -46,6 +47,8 @@ def most_frequent_first_responders(course_name):
     try:
         current_term = get_current_trimester()
         course_name = course_name.replace("-", "_").replace(":", "_").lower()
+        if not data_loader.is_unit_ready(current_term, course_name):
+            return render_template("partials/first_responders_table.html", most_freq_first_responders=[], current_term=current_term, loading=True)
         logger_course.info(f"Fetching top first responders | function: most_frequent_first_responders | course: {course_name} | term: {current_term}", extra={"course": course_name, "term": current_term})
         most_freq_first_responders_list = get_top_10_first_responders(course_name)
     except Exception as e:
@@ -66,6 +69,8 @@ def most_trending_topics(course_name):
     Fetch the most trending topics for a given course.
     """
     try:
+        if not data_loader.is_unit_ready(get_current_trimester(), course_name.replace("-", "_").replace(":", "_").lower()):
+            return render_template("partials/trending_topics_table.html", trending_scores=[], loading=True)
         logger_trending.info(f"Fetching trending topics | function: most_trending_topics | course: {course_name}", extra={"course": course_name})
         trending_scores = get_trending_topics_from_useractions_df(course_name)
         return render_template("partials/trending_topics_table.html", trending_scores=trending_scores)
@@ -31,6 +31,14 @@ def get_user_details(user_name):
     try:
         logger_user_stats.info(f"Fetching user details | function: get_user_details | user_name: {user_name}", extra={"user_name": user_name})
         summary_data = get_user_summary(user_name)
+        if summary_data.get("status_code") == 503:  # The Discourse quota is busy (e.g. a reset is crawling)
+            logger_user_stats.warning(f"User details deferred, rate limiter busy | function: get_user_details | user_name: {user_name}", extra={"user_name": user_name})
+            return jsonify({
+                'error': 'Discourse is busy, please try again in a moment',
+                'basic_metrics': [],
+                'top_categories': [],
+                'most_liked_by': []
+            }), 503
         basic_metrics = get_basic_metrics(summary_data)
         top_categories = get_top_categories(summary_data)
         most_liked_by = get_liked_by_users(summary_data)
@@ -0,0 +1,44 @@
+"""
+Webhook endpoints for the Flask application.
+Receives Discourse webhook events for near-real-time course engagement updates.
+"""
+
+from flask import Blueprint, request, jsonify
+from core.auth import admin_required
+from core.logging_config import get_logger
+from core.webhook_ingest import verify_signature, ingest_event, get_ingest_stats
+
+logger_webhooks = get_logger("viz.webhooks")
+
+webhooks_bp = Blueprint('webhooks', __name__)
+
+
+@webhooks_bp.route('/webhooks/discourse', methods=['POST'])
+def discourse_webhook():
+    """
+    Receives one Discourse webhook delivery (post, like, topic and solved events).
+    Authenticated with the HMAC signature Discourse sends in X-Discourse-Event-Signature.
+    """
+    body = request.get_data()  # Raw bytes; the signature is computed over the exact body
+    if not verify_signature(body, request.headers.get("X-Discourse-Event-Signature")):
+        logger_webhooks.warning(f"Rejected webhook with invalid signature | function: discourse_webhook | remote_addr: {request.remote_addr}")
+        return jsonify({"error": "invalid signature"}), 401
+
+    event_name = request.headers.get("X-Discourse-Event", "")
+    event_id = request.headers.get("X-Discourse-Event-Id")
+    if event_name == "ping":
+        return jsonify({"status": "ok"}), 200
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "invalid JSON body"}), 400
+
+    rows_buffered = ingest_event(event_id, event_name, payload)
+    return jsonify({"status": "accepted", "rows": rows_buffered}), 202
+
+
+@webhooks_bp.route('/webhooks/discourse/stats')
+@admin_required
+def discourse_webhook_stats():
+    """Counters of received, duplicate, ignored and merged webhook events of the process serving the request"""
+    return jsonify(get_ingest_stats())
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.action_merge import MERGE_STATE_KEY, append_unseen_rows, drop_rows, fetch_start_date, get_merge_state, row_fingerprints
+
+
+def actions(*rows):
+    """Encoded user actions from (user_key, action_type, topic_id, post_id, created_at) tuples."""
+    user_keys, action_types, topic_ids, post_ids, created_at = zip(*rows) if rows else ((),) * 5
+    return pd.DataFrame({
+        "user_key": np.array(user_keys, dtype=np.int32),
+        "action_type": np.array(action_types, dtype=np.int16),
+        "target_topic_id": np.array(topic_ids, dtype=np.int32),
+        "target_post_id": np.array(post_ids, dtype=np.int32),
+        "created_at": pd.to_datetime(list(created_at), utc=True),
+        "category_id": np.full(len(user_keys), 18, dtype=np.int32),
+    })
+
+
+DAY_1 = [(1, 5, 10, 100, "2026-10-01T09:00:00Z"), (2, 1, 10, 100, "2026-10-01T10:00:00Z")]
+DAY_2 = [(1, 5, 11, 110, "2026-10-02T09:00:00Z"), (3, 4, 12, 120, "2026-10-02T18:30:00Z")]
+
+
+def assert_state_matches_frame(slot):
+    state = slot[MERGE_STATE_KEY]
+    assert state.frame is slot["user_actions_df"]
+    assert np.array_equal(state.fingerprints, row_fingerprints(slot["user_actions_df"]))
+    assert np.array_equal(state.index, np.sort(state.fingerprints))
+
+
+def test_append_skips_rows_already_held_and_duplicates_within_the_delta():
+    slot = {"user_actions_df": actions(*DAY_1)}
+    appended = append_unseen_rows(slot, actions(DAY_1[0], *DAY_2, DAY_2[0]))
+    assert len(appended) == 2
+    assert len(slot["user_actions_df"]) == 4
+    assert_state_matches_frame(slot)
+
+
+def test_overlapping_windows_append_only_the_new_days():
+    slot = {"user_actions_df": actions()}
+    append_unseen_rows(slot, actions(*DAY_1))
+    appended = append_unseen_rows(slot, actions(*DAY_1, *DAY_2))  # The next fetch starts on the watermark's day again
+    assert len(appended) == len(DAY_2)
+    assert len(slot["user_actions_df"]) == len(DAY_1) + len(DAY_2)
+    assert slot[MERGE_STATE_KEY].watermark == pd.Timestamp("2026-10-02T18:30:00Z")
+    assert_state_matches_frame(slot)
+
+
+def test_rerunning_a_merge_is_a_no_op():
+    slot = {"user_actions_df": actions(*DAY_1)}
+    append_unseen_rows(slot, actions(*DAY_2))
+    frame, state = slot["user_actions_df"], slot[MERGE_STATE_KEY]
+    assert append_unseen_rows(slot, actions(*DAY_1, *DAY_2)).empty
+    assert slot["user_actions_df"] is frame
+    assert np.array_equal(slot[MERGE_STATE_KEY].fingerprints, state.fingerprints)
+
+
+def test_webhook_rows_do_not_advance_the_watermark():
+    slot = {"user_actions_df": actions(*DAY_1)}
+    append_unseen_rows(slot, actions(*DAY_2), advance_watermark=False)
+    assert len(slot["user_actions_df"]) == 4
+    assert slot[MERGE_STATE_KEY].watermark == pd.Timestamp("2026-10-01T10:00:00Z")
+    assert fetch_start_date(slot, "05-10-2026") == "01-10-2026"
+
+
+def test_rebuilt_watermark_is_capped_by_the_fallback():
+    slot = {"user_actions_df": actions(*DAY_1, *DAY_2)}
+    assert fetch_start_date(slot, "02-10-2026") == "02-10-2026"
+    assert slot[MERGE_STATE_KEY].watermark == pd.Timestamp("2026-10-02T00:00:00Z")
+
+
+def test_drop_rows_removes_matching_rows_and_is_idempotent():
+    slot = {"user_actions_df": actions(*DAY_1, *DAY_2)}
+    dropped = drop_rows(slot, actions(DAY_2[1], (9, 1, 99, 990, "2026-10-03T00:00:00Z")))
+    assert len(dropped) == 1
+    assert len(slot["user_actions_df"]) == 3
+    assert_state_matches_frame(slot)
+
+    frame = slot["user_actions_df"]
+    assert drop_rows(slot, actions(DAY_2[1])).empty
+    assert slot["user_actions_df"] is frame
+
+
+def test_drop_then_append_replaces_webhook_rows_with_fetched_ones():
+    slot = {"user_actions_df": actions(*DAY_1)}
+    webhook_rows = actions(*DAY_2)
+    append_unseen_rows(slot, webhook_rows, advance_watermark=False)
+    drop_rows(slot, webhook_rows)
+    appended = append_unseen_rows(slot, actions(*DAY_2))
+    assert len(appended) == len(DAY_2)
+    assert len(slot["user_actions_df"]) == len(DAY_1) + len(DAY_2)
+    assert_state_matches_frame(slot)
+
+
+@pytest.mark.parametrize("delta", [None, actions()])
+def test_empty_delta_keeps_the_slot(delta):
+    slot = {"user_actions_df": actions(*DAY_1)}
+    frame = slot["user_actions_df"]
+    assert append_unseen_rows(slot, delta).empty
+    assert drop_rows(slot, delta).empty
+    assert slot["user_actions_df"] is frame
+    assert get_merge_state(slot).frame is frame
@@ -0,0 +1,100 @@
+import http.server
+import json
+import threading
+
+import pytest
+
+import core.async_client as async_client
+from core import execute_query
+from core.rate_limiter import TokenBucket
+from user_summary.user_summary_functions import get_user_summary
+
+TOTAL_ROWS = 23
+PAGE_SIZE = 5
+
+
+class FakeDiscourse(http.server.BaseHTTPRequestHandler):
+    """Query 108 in pages of PAGE_SIZE rows, plus summary.json; `script` holds the status codes to answer first."""
+    protocol_version = "HTTP/1.1"
+    script = []
+    pages_requested = []
+
+    def _send(self, status, payload, headers=()):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"])).decode()
+        page = int(json.loads(body[len("params="):])["page"])
+        self.pages_requested.append(page)
+        if self.script:
+            return self._send(self.script.pop(0), {}, [("Retry-After", "0")])
+        rows = [[user_id, f"user{user_id}"] for user_id in range(page * PAGE_SIZE, min(TOTAL_ROWS, (page + 1) * PAGE_SIZE))]
+        self._send(200, {"result_count": len(rows), "columns": ["user_id", "username"], "rows": rows})
+
+    def do_GET(self):
+        if self.script:
+            return self._send(self.script.pop(0), {})
+        self._send(200, {"user_summary": {"likes_given": 3}})
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def discourse(monkeypatch):
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeDiscourse)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    FakeDiscourse.script = []
+    FakeDiscourse.pages_requested = []
+    limiter = TokenBucket(rate=1000, burst=100)
+    monkeypatch.setattr(async_client, "DISCOURSE_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setattr(async_client, "API_KEY", "test-key")
+    monkeypatch.setattr(async_client, "env", "prod")
+    monkeypatch.setattr(async_client, "get_discourse_rate_limiter", lambda: limiter)
+    monkeypatch.setattr(async_client.query_cache, "lookup", lambda *args, **kwargs: None)
+    monkeypatch.setattr(async_client.query_cache, "store", lambda *args, **kwargs: None)
+    monkeypatch.setattr(async_client, "_alert_developer_of_reset_failure", lambda *args: None)
+    yield FakeDiscourse
+    server.shutdown()
+
+
+def test_sync_query_crawls_every_page_on_the_loop(discourse):
+    frame = execute_query.execute_discourse_query(108)
+    assert frame["user_id"].tolist() == list(range(TOTAL_ROWS))
+    assert str(frame["user_id"].dtype) == "int32"
+    assert set(discourse.pages_requested) >= {0, 1, 2, 3, 4}
+    assert max(discourse.pages_requested) < 5 + async_client.DISCOURSE_MAX_PAGES_IN_FLIGHT  # The short page 4 ends the crawl
+
+
+def test_rate_limited_page_is_retried(discourse):
+    discourse.script = [429]
+    frame = execute_query.execute_discourse_query(108)
+    assert len(frame) == TOTAL_ROWS
+    assert discourse.pages_requested.count(0) == 2
+
+
+def test_http_error_raises_unless_partial_ok(discourse):
+    discourse.script = [500]
+    with pytest.raises(execute_query.DiscourseQueryError):
+        execute_query.execute_discourse_query(108)
+    discourse.script = [500]
+    assert execute_query.execute_discourse_query(108, partial_ok=True).empty
+
+
+def test_stopping_early_cancels_the_crawl(discourse):
+    pages = execute_query.iter_discourse_query_pages(108)
+    assert len(next(pages)) == PAGE_SIZE
+    pages.close()
+    assert execute_query.execute_discourse_query(108)["user_id"].tolist() == list(range(TOTAL_ROWS))  # The loop is still usable
+
+
+def test_user_summary(discourse):
+    assert get_user_summary("alice") == {"user_summary": {"likes_given": 3}}
+    discourse.script = [404]
+    assert get_user_summary("nobody")["status_code"] == 404
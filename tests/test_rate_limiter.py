@@ -0,0 +1,97 @@
+import email.utils
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import core.rate_limiter as rate_limiter
+from core.rate_limiter import TokenBucket, parse_retry_after
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen time.monotonic for the rate limiter; advance it with clock.advance(seconds)."""
+    class Clock:
+        now = 1000.0
+
+        def advance(self, seconds):
+            self.now += seconds
+
+    fake = Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", lambda: fake.now)
+    return fake
+
+
+def test_burst_is_free_then_callers_queue_at_the_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)  # Served in arrival order
+
+
+def test_refill_is_capped_at_burst(clock):
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.reserve(), bucket.reserve()
+    clock.advance(60)
+    assert [bucket.reserve() for _ in range(2)] == [0, 0]
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_reserve_with_max_delay_takes_no_token_when_the_wait_is_too_long(clock):
+    bucket = TokenBucket(rate=1, burst=1)
+    assert bucket.reserve() == 0
+    assert bucket.reserve(max_delay=0.5) is None
+    assert bucket.reserve(max_delay=1.0) == pytest.approx(1.0)
+    clock.advance(2)
+    assert bucket.reserve(max_delay=0.5) == 0
+
+
+def test_rate_limited_halves_the_rate_and_pauses_every_caller(clock):
+    bucket = TokenBucket(rate=4, burst=4)
+    bucket.on_rate_limited(retry_after=10)
+    assert bucket.rate == 2
+    assert bucket.reserve() == pytest.approx(10.5)  # The pause, then a token at the halved rate
+    assert bucket.reserve(max_delay=5) is None
+
+
+def test_rate_never_drops_below_the_floor(clock):
+    bucket = TokenBucket(rate=8, burst=1, min_rate=3)
+    for _ in range(5):
+        bucket.on_rate_limited(retry_after=0)
+    assert bucket.rate == 3
+
+
+def test_success_recovers_the_rate_additively_up_to_the_configured_rate(clock):
+    bucket = TokenBucket(rate=10, burst=1, recovery_step=0.1)
+    bucket.on_rate_limited(retry_after=0)
+    assert bucket.rate == 5
+    bucket.on_success()
+    assert bucket.rate == pytest.approx(6)
+    for _ in range(20):
+        bucket.on_success()
+    assert bucket.rate == 10
+
+
+def test_invalid_configuration_is_rejected():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0, burst=1)
+    with pytest.raises(ValueError):
+        TokenBucket(rate=1, burst=0)
+
+
+@pytest.mark.parametrize("header, expected", [("5", 5.0), ("0.25", 0.25), ("-3", 0.0)])
+def test_parse_retry_after_seconds(header, expected):
+    assert parse_retry_after(header) == expected
+
+
+def test_parse_retry_after_http_date():
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert parse_retry_after(email.utils.format_datetime(retry_at, usegmt=True)) == pytest.approx(30, abs=2)
+
+
+def test_parse_retry_after_http_date_in_the_past_is_zero():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+@pytest.mark.parametrize("header", [None, "", "soon"])
+def test_parse_retry_after_falls_back_to_the_default(header):
+    assert parse_retry_after(header, default=7) == 7
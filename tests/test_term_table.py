@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import data_loader  # noqa: F401  Loaded first, as in the app (processors import it back)
+from core import sql_engine
+from core.action_merge import append_unseen_rows
+from core.term_table import TermTable, merge_copy
+
+CATEGORIES = {"English I": 18, "English II": 19, "Maths I": 20}
+
+
+def actions(category_id, *rows):
+    """Encoded user actions of one course from (user_key, action_type, topic_id, post_id, created_at) tuples."""
+    user_keys, action_types, topic_ids, post_ids, created_at = zip(*rows)
+    return pd.DataFrame({
+        "user_key": np.array(user_keys, dtype=np.int32),
+        "action_type": np.array(action_types, dtype=np.int8),
+        "target_topic_id": np.array(topic_ids, dtype=np.int32),
+        "target_post_id": np.array(post_ids, dtype=np.int32),
+        "created_at": pd.to_datetime(list(created_at), utc=True),
+        "category_id": np.full(len(user_keys), category_id, dtype=np.int32),
+    })
+
+
+@pytest.fixture
+def term_table():
+    slots = {
+        course: {"user_actions_df": actions(category_id, (1, 1, 10, 100, "2026-10-01T09:00:00Z"), (2, 5, 10, 101, "2026-10-02T09:00:00Z"))}
+        for course, category_id in CATEGORIES.items()
+    }
+    return TermTable.from_slots(slots, CATEGORIES)
+
+
+def flushed(term_table, course):
+    slot = merge_copy(term_table[course])
+    append_unseen_rows(slot, actions(CATEGORIES[course], (3, 1, 11, 110, "2026-10-03T09:00:00Z")), advance_watermark=False)
+    return term_table.with_slots({course: slot})
+
+
+def test_with_slots_swaps_only_the_touched_partition(term_table):
+    updated = flushed(term_table, "English II")
+    assert updated.partition_rows() == {"English I": 2, "English II": 3, "Maths I": 2}
+    assert updated.partition("English I") is term_table.partition("English I")
+    assert updated.course_counts("Maths I") is term_table.course_counts("Maths I")
+    assert updated._user_actions is None  # The long table is only concatenated on first use
+    assert updated.user_actions["category_id"].tolist() == [18, 18, 19, 19, 19, 20, 20]
+    assert updated["English II"]["user_actions_df"] is updated.partition("English II")
+
+
+@pytest.mark.parametrize("engine", ["duckdb", "sqlite"])
+def test_sql_engine_reloads_only_changed_partitions(term_table, engine):
+    if engine == "duckdb" and sql_engine.duckdb is None:
+        pytest.skip("duckdb is not installed")
+    from core.dimensions import topics, users
+
+    class Generation:
+        dimensions = (users, topics)
+
+    sql = "SELECT category_id, COUNT(*) AS n FROM user_actions GROUP BY category_id ORDER BY category_id"
+    db = sql_engine.DuckDBEngine() if engine == "duckdb" else sql_engine.SQLiteEngine()
+    for table in (term_table, flushed(term_table, "English II")):
+        generation = Generation()
+        generation.user_actions_dictionaries = {"t3-2026": table}
+        assert db.query(generation, sql)["n"].tolist() == table.user_actions.groupby("category_id").size().tolist()
@@ -1,23 +1,11 @@
-import requests
 import pandas as pd
 
-from application.constants import API_USERNAME, API_KEY, DISCOURSE_BASE_URL
+from core import async_client
 
 
 def get_user_summary(user_name):
-    url = f"{DISCOURSE_BASE_URL}/u/{user_name}/summary.json"
-
-    headers = {
-        "Api-Key": API_KEY,
-        "Api-Username": API_USERNAME
-    }
-
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        return {"error": f"Failed to fetch data for user_id: {user_name}", "status_code": response.status_code}
-
-    data = response.json()
-    return data
+    # Runs on the Discourse event loop, sharing its session and rate limiter with the loader
+    return async_client.run(async_client.get_user_summary_async(user_name))
 
 
 def get_basic_metrics(summary_data):
@@ -0,0 +1,26 @@
+"""
+Production WSGI entry point, for several web worker processes:
+
+    gunicorn -w 4 -b 0.0.0.0:5000 wsgi:application
+
+Every worker serves the Arrow generations published by the loader (DATA_ROLE=reader,
+core/arrow_store.py). With LOADER_PROCESS=elect (the default here) the workers elect one
+refresh leader through a file lock (core/leader_election.py); the leader starts the
+loader worker (core/loader_worker.py), and another worker takes over if it dies. Set
+LOADER_PROCESS=external when the loader runs as a separate service instead.
+
+Do not use gunicorn's --preload: the election has to run in the worker processes.
+"""
+import os
+
+# Before application.constants is imported: web workers only read, the loader runs in its own process
+os.environ["DATA_ROLE"] = "reader"
+os.environ.setdefault("LOADER_PROCESS", "elect")
+
+from app import app as application
+from application.constants import LOADER_PROCESS
+import core.loader_worker as loader_worker
+from core.leader_election import start_leader_election
+
+if LOADER_PROCESS == "elect":
+    start_leader_election(on_elected=loader_worker.start_loader_process)